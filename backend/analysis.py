@@ -1,13 +1,98 @@
+import os
+import math
 import pandas as pd
-import pandas_ta as ta
+from indicators import IndicatorEngine
+from timeframes import higher_timeframe_indicators
 
-def calculate_indicators(df: pd.DataFrame):
+# Per-symbol streaming indicator state (see indicators.py)
+indicator_engine = IndicatorEngine()
+
+# Higher timeframes resampled from the 1h candles for trend confirmation, e.g. "4h,1d"
+MTF_TIMEFRAMES = [tf.strip() for tf in os.getenv("MTF_TIMEFRAMES", "").split(",") if tf.strip()]
+MTF_POINTS = 10
+
+def epoch_ms(timestamps: pd.Series):
+    return timestamps.values.astype('datetime64[ms]').view('int64')
+
+def timeframe_column(column: str, timeframe: str = None):
+    """
+    Column name of an indicator on a timeframe: EMA_50 (base), EMA_50_4h, ...
+    """
+    return column if timeframe is None else f"{column}_{timeframe}"
+
+def add_higher_timeframes(df: pd.DataFrame, symbol: str = None, timeframes=None):
+    """
+    Fills the higher-timeframe indicator columns (EMA_20_4h, RSI_1d, ...) of the LAST row.
+    """
+    timeframes = MTF_TIMEFRAMES if timeframes is None else timeframes
+    if not timeframes:
+        return df
+    # Without a symbol there is no state to keep: use a throwaway engine
+    engine = indicator_engine if symbol is not None else IndicatorEngine()
+    values = higher_timeframe_indicators(
+        engine,
+        symbol or "",
+        epoch_ms(df['timestamp']),
+        df['high'].values,
+        df['low'].values,
+        df['close'].values,
+        df['volume'].values,
+        timeframes,
+    )
+    last_index = df.index[-1]
+    for timeframe, columns in values.items():
+        for column, value in columns.items():
+            df.loc[last_index, timeframe_column(column, timeframe)] = value
+    return df
+
+def score_higher_timeframes(close: float, values: dict):
+    """
+    Trend confirmation from higher timeframes.
+    `values` is {timeframe: {column: value}}; returns (points, reasons).
+    """
+    points = 0
+    reasons = []
+    for timeframe, columns in values.items():
+        ema20, ema50 = columns.get('EMA_20', math.nan), columns.get('EMA_50', math.nan)
+        if close > ema20 > ema50:
+            points += MTF_POINTS
+            reasons.append(f"{timeframe} Uptrend Confirmed (Price > EMA20 > EMA50)")
+        elif close < ema50:
+            points -= MTF_POINTS
+            reasons.append(f"Against {timeframe} Trend (Price < EMA50)")
+    return points, reasons
+
+def calculate_indicators(df: pd.DataFrame, symbol: str = None, timeframes=None):
     """
     Calculates EMA20, EMA50, EMA200, RSI(14), ADX(14), ATR(14).
+    With a symbol, the streaming engine updates that symbol's state with the
+    new candles only and fills the indicator columns of the LAST row
+    (earlier rows are NaN), which is all analyze_market_structure reads.
+    Without a symbol, pandas_ta recomputes every row.
+    The same indicators for each of `timeframes` (default MTF_TIMEFRAMES)
+    are added on the last row only, see add_higher_timeframes.
     """
     if df.empty:
         return df
-    
+
+    df = add_higher_timeframes(df, symbol, timeframes)
+
+    if symbol is not None:
+        # Same epoch-ms timestamps as candle_indicators, so both share the symbol's state
+        values = indicator_engine.latest(
+            symbol,
+            epoch_ms(df['timestamp']),
+            df['high'].values,
+            df['low'].values,
+            df['close'].values,
+        )
+        last_index = df.index[-1]
+        for column, value in values.items():
+            df.loc[last_index, column] = value
+        return df
+
+    import pandas_ta as ta # only this full-recompute path needs it
+
     # EMAs
     df['EMA_20'] = ta.ema(df['close'], length=20)
     df['EMA_50'] = ta.ema(df['close'], length=50)
@@ -27,24 +112,98 @@ def calculate_indicators(df: pd.DataFrame):
     
     return df
 
-def analyze_market_structure(df: pd.DataFrame):
+def candle_indicators(symbol: str, candles, timeframes=None):
+    """
+    calculate_indicators for the last candle of a CandleView (candles.py),
+    read straight from its arrays. Returns (indicators, higher) where
+    `higher` is {timeframe: {column: value}} for `timeframes` (default MTF_TIMEFRAMES).
+    """
+    timeframes = MTF_TIMEFRAMES if timeframes is None else timeframes
+    indicators = indicator_engine.latest(symbol, candles.timestamp, candles.high, candles.low, candles.close)
+    higher = {}
+    if timeframes:
+        higher = higher_timeframe_indicators(
+            indicator_engine, symbol, candles.timestamp,
+            candles.high, candles.low, candles.close, candles.volume, timeframes,
+        )
+    return indicators, higher
+
+def score_candles(candles, indicators: dict, higher: dict):
+    """
+    analyze_market_structure for a CandleView and its candle_indicators.
+    """
+    if len(candles) < 200:
+        return None
+    close = float(candles.close[-1])
+    return score_signal(
+        close,
+        indicators,
+        float(candles.volume[-1]),
+        float(candles.volume[-20:].mean()),
+        higher,
+        candles.last_time(),
+    )
+
+def analyze_candles(symbol: str, candles):
+    """
+    candle_indicators + score_candles: the scan's per-symbol analysis without a DataFrame.
+    """
+    if not len(candles):
+        return None
+    indicators, higher = candle_indicators(symbol, candles)
+    return score_candles(candles, indicators, higher)
+
+def analyze_market_structure(df: pd.DataFrame, market: dict = None):
     """
     Analyzes the latest candle to determine if it's a BUY opportunity.
     Returns a dictionary with signal details and score.
+    `market` is the symbol's MarketContext.for_symbol() (BTC trend, correlation, beta).
     """
     if df.empty or len(df) < 200:
         return None
 
     last_row = df.iloc[-1]
-    
-    close = last_row['close']
-    ema20 = last_row['EMA_20']
-    ema50 = last_row['EMA_50']
-    ema200 = last_row['EMA_200']
-    rsi = last_row['RSI']
+    higher = {
+        tf: {column: last_row[timeframe_column(column, tf)] for column in ('EMA_20', 'EMA_50')}
+        for tf in MTF_TIMEFRAMES if timeframe_column('EMA_50', tf) in last_row
+    }
+    return score_signal(
+        last_row['close'],
+        last_row,
+        last_row['volume'],
+        df['volume'].rolling(20).mean().iloc[-1],
+        higher,
+        last_row['timestamp'],
+        market,
+    )
+
+def add_market_context(result: dict, market: dict):
+    """
+    Attaches a symbol's market context to its analysis result; emit_signal
+    uses it to apply the BTC filter only to coins that follow BTC.
+    """
+    if result is None or market is None:
+        return result
+    result['market'] = market
+    btc_correlation = market['correlation'].get('BTC/USDT')
+    if btc_correlation is not None:
+        btc_beta = market['beta'].get('BTC/USDT')
+        beta = f", beta {btc_beta:.2f}" if btc_beta is not None else ""
+        result['reasons'].append(f"BTC Correlation {btc_correlation:.2f}{beta}")
+    return result
+
+def score_signal(close, indicators, volume, avg_vol, higher: dict, timestamp, market: dict = None):
+    """
+    The scoring rules and ATR trade setup for one candle.
+    `indicators` holds calculate_indicators' columns for that candle (a row or a dict).
+    """
+    ema20 = indicators['EMA_20']
+    ema50 = indicators['EMA_50']
+    ema200 = indicators['EMA_200']
+    rsi = indicators['RSI']
     # Use ADX_14 if available, else default to 25 (neutral)
-    adx = last_row.get('ADX_14', 25) 
-    atr = last_row.get('ATR', close * 0.02)
+    adx = indicators.get('ADX_14', 25)
+    atr = indicators.get('ATR', close * 0.02)
     
     score = 0
     reasons = []
@@ -72,8 +231,7 @@ def analyze_market_structure(df: pd.DataFrame):
         reasons.append(f"Overbought (RSI: {rsi:.1f}) - Risk of pullback")
         
     # 3. Volume/Breakout (Simplified logic for now)
-    avg_vol = df['volume'].rolling(20).mean().iloc[-1]
-    if last_row['volume'] > avg_vol * 1.5:
+    if volume > avg_vol * 1.5:
         score += 10
         reasons.append("High Volume Spike")
         
@@ -85,6 +243,11 @@ def analyze_market_structure(df: pd.DataFrame):
         score -= 10
         reasons.append(f"Weak Trend/Choppy Market (ADX: {adx:.1f})")
 
+    # 5. Higher Timeframe Confirmation (MTF_TIMEFRAMES)
+    points, mtf_reasons = score_higher_timeframes(close, higher)
+    score += points
+    reasons.extend(mtf_reasons)
+
     # Determine Status
     status = "WEAK"
     if score >= 80:
@@ -105,14 +268,14 @@ def analyze_market_structure(df: pd.DataFrame):
     reward = target2 - close
     rr_ratio = f"1:{reward/risk:.1f}" if risk > 0 else "N/A"
     
-    return {
+    return add_market_context({
         "price": close,
         "score": score,
         "status": status,
         "rsi": rsi,
         "adx": adx,
         "reasons": reasons,
-        "timestamp": last_row['timestamp'],
+        "timestamp": timestamp,
         "trade_setup": {
             "entry_zone": f"{close:.4f} - {close + (atr*0.2):.4f}",
             "stop_loss": stop_loss,
@@ -120,4 +283,4 @@ def analyze_market_structure(df: pd.DataFrame):
             "target_2": target2,
             "risk_reward_ratio": rr_ratio
         }
-    }
+    }, market)
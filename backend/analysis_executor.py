@@ -0,0 +1,115 @@
+"""
+Executor stage for the CPU-bound analysis step.
+
+Keeps pandas work off the event loop that serves the API:
+- "process": one single-worker process per core. Each symbol is always sent
+  to the same worker (by hash), so its streaming indicator state stays warm.
+  Payloads are CandleViews (NumPy arrays), not DataFrames.
+- "thread": a thread pool in this process (also the fallback when worker
+  processes can't be started or die).
+- "inline": run on the event loop, as before.
+With "thread" and "inline" the analysis reads the candle cache's arrays in
+place; only "process" copies them (when pickling).
+"""
+import asyncio
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import instrumentation
+
+ANALYSIS_EXECUTOR = os.getenv("ANALYSIS_EXECUTOR", "process")
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+
+def _init_worker():
+    # Import analysis (pandas, pandas_ta) once when the worker starts instead of on its first task
+    import analysis
+
+def analyze_payload(symbol: str, candles):
+    """
+    Worker entry point: candle_indicators + score_candles for one symbol.
+    Returns (result, (indicator_seconds, scoring_seconds)); the timings are
+    measured here because the worker may be another process.
+    """
+    from analysis import candle_indicators, score_candles
+    start = time.perf_counter()
+    indicators, higher = candle_indicators(symbol, candles)
+    scored = time.perf_counter()
+    result = score_candles(candles, indicators, higher)
+    return result, (scored - start, time.perf_counter() - scored)
+
+class AnalysisExecutor:
+    def __init__(self, mode: str = ANALYSIS_EXECUTOR, workers: int = ANALYSIS_WORKERS):
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.process_pools = []
+        self.thread_pool = None
+        self.started = False
+
+    def start(self):
+        self.started = True
+        if self.mode == "process":
+            try:
+                self.process_pools = [
+                    ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+                    for _ in range(self.workers)
+                ]
+                print(f"⚙️ Analysis executor: {self.workers} worker processes")
+                return
+            except (OSError, NotImplementedError, ImportError) as e:
+                self._fall_back(e)
+        if self.mode == "thread":
+            self.thread_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+            print(f"⚙️ Analysis executor: {self.workers} threads")
+
+    def _fall_back(self, error):
+        print(f"⚠️ Process pool unavailable ({error}). Falling back to thread pool.")
+        for pool in self.process_pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.process_pools = []
+        self.mode = "thread"
+        if self.thread_pool is None:
+            self.thread_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+
+    async def _run(self, shard_key: str, fn, *args):
+        if self.mode == "inline":
+            return fn(*args)
+        if not self.started:
+            self.start()
+        loop = asyncio.get_running_loop()
+        if self.mode == "process":
+            pool = self.process_pools[zlib.crc32(shard_key.encode()) % len(self.process_pools)]
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except (BrokenProcessPool, OSError) as e:
+                # Workers are spawned lazily, so this is also where spawning fails
+                self._fall_back(e)
+        return await loop.run_in_executor(self.thread_pool, fn, *args)
+
+    async def analyze(self, symbol: str, candles):
+        """
+        Runs the indicators and scoring for one symbol's CandleView.
+        """
+        result, (indicator_seconds, scoring_seconds) = await self._run(symbol, analyze_payload, symbol, candles)
+        instrumentation.record("indicators", indicator_seconds)
+        instrumentation.record("scoring", scoring_seconds)
+        return result
+
+    async def analyze_batch(self, frames: dict, min_score: int = None):
+        """
+        Runs batch_analysis.analyze_batch in a worker.
+        """
+        from batch_analysis import stack_ohlcv, analyze_stacked
+        symbols, last_timestamps, arrays = stack_ohlcv(frames)
+        result, timings = await self._run("batch", analyze_stacked, symbols, last_timestamps, arrays, min_score, True)
+        instrumentation.record("indicators", timings[0])
+        instrumentation.record("scoring", timings[1])
+        return result
+
+    def shutdown(self):
+        for pool in self.process_pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown(wait=False, cancel_futures=True)
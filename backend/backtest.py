@@ -0,0 +1,241 @@
+"""
+Vectorized backtest of the scoring strategy.
+
+Replays recorded OHLCV (see market_data.save_recorded_ohlcv) for many
+symbols. Each series gets its indicators and scores computed once, in
+vectorized form, with the same rules as analyze_market_structure
+(batch_analysis.py). Entries use the live thresholds: score >= 30, and
+score >= 90 while BTC is below its EMA200. Trades are then simulated with
+candle highs and lows:
+- one open trade per symbol, as with active_signals
+- TP1/TP2 are recorded when a candle's high reaches them; the trade stays open
+- the trade exits when a candle's low reaches the ATR stop loss
+If a candle touches both a target and the stop, the stop is assumed to come
+first. Symbols run in parallel across a process pool.
+
+Usage:
+    python backtest.py --download --since 2020-01-01 --symbols BTC/USDT,ETH/USDT
+    python backtest.py --workers 8 --json report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import market_data
+from batch_analysis import compute_indicators_batch, ema_matrix, score_batch
+
+MIN_HISTORY = 200 # analyze_market_structure needs 200 candles
+MIN_SCORE = 30
+BEARISH_MIN_SCORE = 90
+
+def btc_trend_series(candles: np.ndarray):
+    """
+    Returns (timestamps, trend) for BTC: +1 above EMA200, -1 below, 0 unknown.
+    """
+    close = np.asarray(candles[:, 4])
+    ema200 = ema_matrix(close[None, :], 200)[0]
+    trend = np.zeros(len(close), dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        trend[close > ema200] = 1
+        trend[close < ema200] = -1
+    return np.asarray(candles[:, 0]), trend
+
+def entry_candidates(candles: np.ndarray, btc_timestamps=None, btc_trend=None):
+    """
+    Vectorized signal generation for one series.
+    Returns (candidate indices, stop_loss, target_1, target_2) arrays.
+    """
+    high, low, close, volume = (np.asarray(candles[:, i])[None, :] for i in (2, 3, 4, 5))
+    indicators = compute_indicators_batch(high, low, close)
+    avg_vol = pd.Series(volume[0]).rolling(20).mean().values
+    score, _ = score_batch(
+        close[0], indicators['EMA_20'][0], indicators['EMA_50'][0], indicators['EMA_200'][0],
+        indicators['RSI'][0], indicators['ADX_14'][0], volume[0], avg_vol,
+    )
+
+    eligible = score >= MIN_SCORE
+    eligible[:MIN_HISTORY - 1] = False
+    if btc_timestamps is not None:
+        # BTC filter: align BTC's trend on this series' timestamps
+        positions = np.searchsorted(btc_timestamps, candles[:, 0])
+        positions = np.clip(positions, 0, len(btc_timestamps) - 1)
+        matched = btc_timestamps[positions] == candles[:, 0]
+        bearish = matched & (btc_trend[positions] == -1)
+        eligible &= ~bearish | (score >= BEARISH_MIN_SCORE)
+
+    atr = indicators['ATR'][0]
+    return (
+        np.flatnonzero(eligible),
+        close[0] - atr * 2.0,
+        close[0] + atr * 1.5,
+        close[0] + atr * 3.0,
+    )
+
+def _first_at_or_below(values: np.ndarray, start: int, level: float):
+    """
+    Index of the first value <= level at or after start, or -1.
+    Searches in growing windows so short trades don't scan the whole series.
+    """
+    window = 256
+    while start < len(values):
+        hits = np.flatnonzero(values[start:start + window] <= level)
+        if len(hits):
+            return start + int(hits[0])
+        start += window
+        window *= 4
+    return -1
+
+def simulate_trades(candles: np.ndarray, candidates, stop_loss, target_1, target_2):
+    """
+    Walks the candidate entries in order, holding at most one trade at a time.
+    Returns a list of trade dicts.
+    """
+    opens, highs, lows, closes = (np.asarray(candles[:, i]) for i in (1, 2, 3, 4))
+    trades = []
+    next_allowed = 0
+    for entry in candidates:
+        if entry < next_allowed:
+            continue
+        entry_price, stop = closes[entry], stop_loss[entry]
+        if not stop < entry_price:
+            continue
+
+        exit_index = _first_at_or_below(lows, entry + 1, stop)
+        closed = exit_index >= 0
+        end = exit_index if closed else len(closes)
+        held_highs = highs[entry + 1:end]
+        held_lows = lows[entry + 1:end + 1]
+        max_high = held_highs.max() if len(held_highs) else entry_price
+        min_low = held_lows.min() if len(held_lows) else entry_price
+        # Fill at the stop, or at the open if the candle gapped through it
+        exit_price = min(stop, opens[exit_index]) if closed else closes[-1]
+
+        trades.append({
+            "entry_time": int(candles[entry, 0]),
+            "exit_time": int(candles[exit_index, 0]) if closed else None,
+            "entry_price": float(entry_price),
+            "tp1_hit": bool(max_high >= target_1[entry]),
+            "tp2_hit": bool(max_high >= target_2[entry]),
+            "closed": closed,
+            "return_pct": float((exit_price - entry_price) / entry_price * 100),
+            "max_gain_pct": float((max_high - entry_price) / entry_price * 100),
+            "drawdown_pct": float((min_low - entry_price) / entry_price * 100),
+            "candles_held": int(end - entry),
+        })
+        # The live scan skips analysis on the candle that closes a trade
+        next_allowed = exit_index + 1 if closed else len(closes)
+    return trades
+
+def summarize(trades):
+    if not trades:
+        return {"trades": 0}
+    returns = np.array([t['return_pct'] for t in trades])
+    # Equity curve when the whole balance goes into each trade in turn (starting at 1.0)
+    equity = np.cumprod(1 + returns / 100)
+    peak = np.maximum.accumulate(np.concatenate(([1.0], equity)))[1:]
+    return {
+        "trades": len(trades),
+        "tp1_hit_rate": float(np.mean([t['tp1_hit'] for t in trades])),
+        "tp2_hit_rate": float(np.mean([t['tp2_hit'] for t in trades])),
+        "stop_rate": float(np.mean([t['closed'] for t in trades])),
+        "avg_return_pct": float(returns.mean()),
+        "total_return_pct": float((equity[-1] - 1) * 100),
+        "avg_max_gain_pct": float(np.mean([t['max_gain_pct'] for t in trades])),
+        "best_max_gain_pct": float(max(t['max_gain_pct'] for t in trades)),
+        "worst_trade_drawdown_pct": float(min(t['drawdown_pct'] for t in trades)),
+        "max_equity_drawdown_pct": float(min(0.0, (equity / peak - 1).min() * 100)),
+    }
+
+def backtest_symbol(symbol: str, timeframe: str, data_dir: str, btc_timestamps=None, btc_trend=None):
+    """
+    Worker entry point: backtests one recorded series.
+    Loads the file itself (memory-mapped) so only the path crosses processes.
+    """
+    candles = market_data.load_recorded_ohlcv(symbol, timeframe, data_dir)
+    if len(candles) < MIN_HISTORY:
+        return symbol, {"trades": 0}, []
+    trades = simulate_trades(candles, *entry_candidates(candles, btc_timestamps, btc_trend))
+    return symbol, summarize(trades), trades
+
+def run_backtest(symbols, timeframe: str = '1h', data_dir: str = None, workers: int = None, btc_filter: bool = True):
+    """
+    Backtests every symbol in parallel. Returns {"symbols": {...}, "overall": {...}}.
+    """
+    data_dir = data_dir or market_data.RECORDED_DATA_DIR
+    btc_timestamps = btc_trend = None
+    if btc_filter and os.path.exists(market_data.recorded_ohlcv_path('BTC/USDT', timeframe, data_dir)):
+        btc_timestamps, btc_trend = btc_trend_series(market_data.load_recorded_ohlcv('BTC/USDT', timeframe, data_dir))
+
+    results, all_trades = {}, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(backtest_symbol, symbol, timeframe, data_dir, btc_timestamps, btc_trend)
+            for symbol in symbols
+        ]
+        for future in futures:
+            symbol, summary, trades = future.result()
+            results[symbol] = summary
+            all_trades.extend(trades)
+    all_trades.sort(key=lambda t: t['entry_time'])
+    return {"symbols": results, "overall": summarize(all_trades)}
+
+async def record_history(symbols, timeframe: str, since: int, data_dir: str = None):
+    for symbol in symbols:
+        rows = await market_data.download_history(symbol, timeframe, since)
+        path = market_data.save_recorded_ohlcv(symbol, timeframe, rows, data_dir)
+        print(f"💾 {symbol}: {len(rows)} candles -> {path}")
+    await market_data.close_exchange()
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the signal strategy on recorded OHLCV.")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: every recorded symbol)")
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--data-dir", default=market_data.RECORDED_DATA_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-btc-filter", action="store_true")
+    parser.add_argument("--download", action="store_true", help="Record history from the exchange first")
+    parser.add_argument("--since", default="2020-01-01", help="Start date for --download (YYYY-MM-DD)")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    symbols = args.symbols.split(",") if args.symbols else None
+    if args.download:
+        if not symbols:
+            parser.error("--download needs --symbols")
+        since = int(datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc).timestamp() * 1000)
+        to_record = list(symbols)
+        if 'BTC/USDT' not in to_record and not args.no_btc_filter:
+            to_record.append('BTC/USDT')
+        asyncio.run(record_history(to_record, args.timeframe, since, args.data_dir))
+    symbols = symbols or market_data.list_recorded_symbols(args.timeframe, args.data_dir)
+    if not symbols:
+        print(f"❌ No recorded data in {args.data_dir}. Use --download first.")
+        return
+
+    start = time.perf_counter()
+    report = run_backtest(symbols, args.timeframe, args.data_dir, args.workers, not args.no_btc_filter)
+    elapsed = time.perf_counter() - start
+
+    print(f"📊 Backtest: {len(symbols)} symbols in {elapsed:.2f}s")
+    for symbol, summary in report['symbols'].items():
+        if summary['trades']:
+            print(f"{symbol:<14} trades={summary['trades']:<4} TP1={summary['tp1_hit_rate']:.0%} "
+                  f"TP2={summary['tp2_hit_rate']:.0%} avg={summary['avg_return_pct']:+.2f}% "
+                  f"maxDD={summary['max_equity_drawdown_pct']:.1f}%")
+        else:
+            print(f"{symbol:<14} no trades")
+    print(f"Overall: {json.dumps(report['overall'], indent=2)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Vectorized cross-symbol analysis.
+
+Stacks every symbol's candles into aligned (symbols x time) NumPy arrays,
+computes the indicators for all symbols in single column-wise passes and
+evaluates the analyze_market_structure scoring rules as boolean masks.
+Python-level work per symbol is limited to building the result dict for the
+symbols that pass `min_score`.
+
+Indicator formulas are the same as pandas_ta's (see indicators.py), and the
+scoring rules mirror analyze_market_structure - keep the two in sync.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis import MTF_TIMEFRAMES, indicator_engine, score_higher_timeframes
+from timeframes import higher_timeframe_indicators
+
+def stack_ohlcv(frames: dict, min_length: int = 200):
+    """
+    Stacks CandleViews (candles.py) into (symbols x time) arrays, aligned on the latest candle.
+    Shorter series are left-padded with NaN. Symbols with fewer than
+    `min_length` candles are skipped (the per-symbol path returns None for them).
+    Returns (symbols, last_timestamps, {'timestamp', 'high', 'low', 'close', 'volume'});
+    'timestamp' is epoch milliseconds as float (NaN in the padding).
+    """
+    symbols = [s for s, candles in frames.items() if len(candles) >= min_length]
+    width = max((len(frames[s]) for s in symbols), default=0)
+    arrays = {
+        column: np.full((len(symbols), width), np.nan)
+        for column in ('timestamp', 'high', 'low', 'close', 'volume')
+    }
+    last_timestamps = []
+    for row, symbol in enumerate(symbols):
+        candles = frames[symbol]
+        arrays['timestamp'][row, width - len(candles):] = candles.timestamp
+        for column in ('high', 'low', 'close', 'volume'):
+            arrays[column][row, width - len(candles):] = getattr(candles, column)
+        last_timestamps.append(candles.last_time())
+    return symbols, last_timestamps, arrays
+
+def _first_valid(matrix: np.ndarray):
+    """Index of the first non-NaN value in each column (time on axis 0)."""
+    return np.argmax(~np.isnan(matrix), axis=0)
+
+def ema_matrix(close: np.ndarray, length: int):
+    """
+    pandas_ta-style EMA (SMA seed) for every row of a (symbols x time) array.
+    """
+    values = close.T.copy()
+    steps = np.arange(values.shape[0])[:, None]
+    first = _first_valid(values)
+    seed_rows = first + length - 1
+    columns = np.arange(values.shape[1])
+    valid = seed_rows < values.shape[0]
+
+    window = (steps >= first) & (steps <= seed_rows)
+    seeds = np.where(window, values, 0.0).sum(axis=0) / length
+    values[window] = np.nan
+    values[seed_rows[valid], columns[valid]] = seeds[valid]
+    return pd.DataFrame(values).ewm(span=length, adjust=False).mean().values.T
+
+def rma_frame(frame: pd.DataFrame, length: int):
+    """Wilder's moving average (pandas_ta.rma) on each column."""
+    return frame.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+def compute_indicators_batch(high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int = 14):
+    """
+    Computes EMA20/50/200, RSI, ADX/DMI and ATR for (symbols x time) arrays.
+    Returns a dict of (symbols x time) arrays keyed like calculate_indicators' columns.
+    """
+    high_f, low_f, close_f = pd.DataFrame(high.T), pd.DataFrame(low.T), pd.DataFrame(close.T)
+    prev_close = close_f.shift(1)
+
+    # RSI
+    change = close_f - prev_close
+    gain = rma_frame(change.clip(lower=0), length)
+    loss = rma_frame(-change.clip(upper=0), length)
+    rsi = 100 * gain / (gain + loss)
+
+    # ATR
+    true_range = np.fmax(high_f - low_f, np.fmax((high_f - prev_close).abs(), (prev_close - low_f).abs()))
+    true_range[prev_close.isna()] = np.nan
+    atr = rma_frame(true_range, length)
+
+    # ADX / DMI
+    up = high_f - high_f.shift(1)
+    down = low_f.shift(1) - low_f
+    plus_dm = up.where((up > down) & (up > 0), 0.0).where(up.notna())
+    minus_dm = down.where((down > up) & (down > 0), 0.0).where(up.notna())
+    dmp = 100 * rma_frame(plus_dm, length) / atr
+    dmn = 100 * rma_frame(minus_dm, length) / atr
+    dx = 100 * (dmp - dmn).abs() / (dmp + dmn)
+    adx = rma_frame(dx, length)
+
+    return {
+        'EMA_20': ema_matrix(close, 20),
+        'EMA_50': ema_matrix(close, 50),
+        'EMA_200': ema_matrix(close, 200),
+        'RSI': rsi.values.T,
+        'ADX_14': adx.values.T,
+        'DMP_14': dmp.values.T,
+        'DMN_14': dmn.values.T,
+        'ATR': atr.values.T,
+    }
+
+def score_batch(close, ema20, ema50, ema200, rsi, adx, volume, avg_vol):
+    """
+    Evaluates the analyze_market_structure scoring rules on arrays.
+    Returns (score, masks) where masks name every rule that fired.
+    """
+    with np.errstate(invalid='ignore'):
+        masks = {}
+        masks['trend_strong'] = (close > ema20) & (ema20 > ema50) & (ema50 > ema200)
+        masks['trend_moderate'] = ~masks['trend_strong'] & (close > ema200) & (ema20 > ema50)
+        masks['trend_above_200'] = ~masks['trend_strong'] & ~masks['trend_moderate'] & (close > ema200)
+        masks['rsi_healthy'] = (rsi >= 45) & (rsi <= 65)
+        masks['rsi_recovery'] = (rsi >= 30) & (rsi < 45)
+        masks['rsi_overbought'] = rsi > 70
+        masks['volume_spike'] = volume > avg_vol * 1.5
+        masks['adx_strong'] = adx > 25
+        masks['adx_weak'] = adx < 20
+
+    score = (
+        40 * masks['trend_strong'] + 30 * masks['trend_moderate'] + 10 * masks['trend_above_200']
+        + 20 * masks['rsi_healthy'] + 10 * masks['rsi_recovery'] - 10 * masks['rsi_overbought']
+        + 10 * masks['volume_spike']
+        + 10 * masks['adx_strong'] - 10 * masks['adx_weak']
+    )
+    return score, masks
+
+def _reasons(i, masks, rsi, adx):
+    reasons = []
+    if masks['trend_strong'][i]:
+        reasons.append("Strong Uptrend (Price > EMA20 > EMA50 > EMA200)")
+    elif masks['trend_moderate'][i]:
+        reasons.append("Moderate Uptrend (Above EMA200, Golden Cross)")
+    elif masks['trend_above_200'][i]:
+        reasons.append("Above EMA200 (Long term bullish)")
+    if masks['rsi_healthy'][i]:
+        reasons.append(f"Healthy Momentum (RSI: {rsi[i]:.1f})")
+    elif masks['rsi_recovery'][i]:
+        reasons.append(f"Oversold/Recovery (RSI: {rsi[i]:.1f})")
+    elif masks['rsi_overbought'][i]:
+        reasons.append(f"Overbought (RSI: {rsi[i]:.1f}) - Risk of pullback")
+    if masks['volume_spike'][i]:
+        reasons.append("High Volume Spike")
+    if masks['adx_strong'][i]:
+        reasons.append(f"Strong Trend Strength (ADX: {adx[i]:.1f})")
+    elif masks['adx_weak'][i]:
+        reasons.append(f"Weak Trend/Choppy Market (ADX: {adx[i]:.1f})")
+    return reasons
+
+def _score_higher_timeframes(symbols, arrays: dict, close, score):
+    """
+    Adds the MTF_TIMEFRAMES confirmation points to `score` in place.
+    Resampling is per symbol, but the higher-timeframe series are short and
+    their indicator state is kept between scans. Returns the reasons per row.
+    """
+    if not MTF_TIMEFRAMES:
+        return [[] for _ in symbols]
+    reasons = []
+    for i, symbol in enumerate(symbols):
+        valid = ~np.isnan(arrays['timestamp'][i])
+        values = higher_timeframe_indicators(
+            indicator_engine, symbol, arrays['timestamp'][i][valid].astype(np.int64),
+            *(arrays[column][i][valid] for column in ('high', 'low', 'close', 'volume')),
+            MTF_TIMEFRAMES,
+        )
+        points, row_reasons = score_higher_timeframes(close[i], values)
+        score[i] += points
+        reasons.append(row_reasons)
+    return reasons
+
+def analyze_batch(frames: dict, min_score: int = None):
+    """
+    Batch equivalent of calculate_indicators + analyze_market_structure.
+    Takes {symbol: CandleView} and returns {symbol: result dict} in the
+    same format as analyze_market_structure, only for symbols scoring at
+    least `min_score` (all analyzable symbols if None).
+    """
+    symbols, last_timestamps, arrays = stack_ohlcv(frames)
+    return analyze_stacked(symbols, last_timestamps, arrays, min_score)
+
+def analyze_stacked(symbols, last_timestamps, arrays: dict, min_score: int = None, timed: bool = False):
+    """
+    analyze_batch on arrays already built by stack_ohlcv.
+    Plain lists and NumPy arrays only, so it is cheap to ship to a worker process.
+    With timed=True, returns (results, (indicator_seconds, scoring_seconds)).
+    """
+    if not symbols:
+        return ({}, (0.0, 0.0)) if timed else {}
+
+    start = time.perf_counter()
+    indicators = compute_indicators_batch(arrays['high'], arrays['low'], arrays['close'])
+    scored = time.perf_counter()
+    last = {name: values[:, -1] for name, values in indicators.items()}
+    close = arrays['close'][:, -1]
+    volume = arrays['volume'][:, -1]
+    avg_vol = arrays['volume'][:, -20:].mean(axis=1)
+    rsi, adx, atr = last['RSI'], last['ADX_14'], last['ATR']
+
+    score, masks = score_batch(close, last['EMA_20'], last['EMA_50'], last['EMA_200'], rsi, adx, volume, avg_vol)
+    higher_reasons = _score_higher_timeframes(symbols, arrays, close, score)
+    status = np.where(score >= 80, "STRONG", np.where(score >= 50, "MEDIUM", "WEAK"))
+
+    # Dynamic Risk Management (ATR Based)
+    stop_loss = close - (atr * 2.0)
+    target1 = close + (atr * 1.5)
+    target2 = close + (atr * 3.0)
+    entry_top = close + (atr * 0.2)
+    risk = close - stop_loss
+    reward = target2 - close
+
+    selected = np.arange(len(symbols)) if min_score is None else np.flatnonzero(score >= min_score)
+    results = {}
+    for i in selected:
+        results[symbols[i]] = {
+            "price": close[i],
+            "score": int(score[i]),
+            "status": str(status[i]),
+            "rsi": rsi[i],
+            "adx": adx[i],
+            "reasons": _reasons(i, masks, rsi, adx) + higher_reasons[i],
+            "timestamp": last_timestamps[i],
+            "trade_setup": {
+                "entry_zone": f"{close[i]:.4f} - {entry_top[i]:.4f}",
+                "stop_loss": stop_loss[i],
+                "target_1": target1[i],
+                "target_2": target2[i],
+                "risk_reward_ratio": f"1:{reward[i]/risk[i]:.1f}" if risk[i] > 0 else "N/A"
+            }
+        }
+    if timed:
+        return results, (scored - start, time.perf_counter() - scored)
+    return results
@@ -0,0 +1,198 @@
+"""
+Offline benchmark for the scan pipeline.
+
+Runs the real run_market_scan against a seeded, deterministic exchange
+stand-in (exchange_adapters.SyntheticExchange), so results are reproducible and no
+network is needed. Every configuration (watchlist size x candle count) runs
+in its own subprocess so peak memory is measured cleanly. For each one it
+records:
+- per-stage time (fetch, indicators, scoring, tracking, notification),
+  summed over symbols, for a cold scan and for warm scans after one new candle
+- scan wall time and throughput (symbols/s, candles/s)
+- peak RSS of the scan process and of its analysis workers
+Results are saved as JSON under bench_results/ so commits can be compared.
+
+Usage:
+    python benchmark.py                          # 50, 500, 5000 symbols x 500 candles
+    python benchmark.py --symbols 50,500 --candles 500,1000 --warm-scans 3
+    python benchmark.py --compare bench_results/old.json bench_results/new.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+RESULTS_DIR = "bench_results"
+
+def synthetic_watchlist(size: int):
+    from market_data import MOCK_PRICES
+    symbols = list(MOCK_PRICES)[:size]
+    symbols += [f"SYN{i:05d}/USDT" for i in range(size - len(symbols))]
+    return symbols
+
+def peak_rss_mb(who):
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss / scale
+
+async def run_case(symbols: int, candles: int, warm_scans: int, seed: int, latency: float, notify_latency: float):
+    """
+    Runs one configuration in this process and returns its measurements.
+    """
+    import instrumentation
+    import market_data
+    import main
+    from exchange_adapters import SyntheticExchange
+    from notifications import FakeMessagingClient, NotificationDispatcher
+
+    instrumentation.enable()
+    exchange = SyntheticExchange(seed=seed, history=max(candles, market_data.CANDLE_CACHE_MAX_LENGTH), latency=latency)
+    market_data.exchange = exchange
+    main.WATCHLIST = synthetic_watchlist(symbols)
+    main.SCAN_CANDLES = candles
+    client = FakeMessagingClient(latency=notify_latency)
+    main.notification_dispatcher = NotificationDispatcher(client)
+    main.FCM_ENABLED = True
+    main.analysis_executor.start()
+    main.notification_dispatcher.start()
+
+    async def timed_scan():
+        instrumentation.reset()
+        calls_before = exchange.calls
+        start = time.perf_counter()
+        await main.run_market_scan()
+        scan_seconds = time.perf_counter() - start
+        drain_start = time.perf_counter()
+        await main.notification_dispatcher.drain()
+        return {
+            "scan_seconds": scan_seconds,
+            "notification_drain_seconds": time.perf_counter() - drain_start,
+            "symbols_per_second": symbols / scan_seconds,
+            "candles_per_second": symbols * candles / scan_seconds,
+            "exchange_calls": exchange.calls - calls_before,
+            "signals": len(main.latest_signals),
+            "stages": instrumentation.report(),
+        }
+
+    # Keep the pipeline's own logging out of the measurement
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        cold = await timed_scan()
+        warm = []
+        for _ in range(warm_scans):
+            exchange.advance(1)
+            warm.append(await timed_scan())
+        await main.notification_dispatcher.stop()
+        main.analysis_executor.shutdown()
+
+    return {
+        "symbols": symbols,
+        "candles": candles,
+        "cold": cold,
+        "warm": warm,
+        "notifications_sent": len(client.sent),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_worker_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+def run_case_subprocess(symbols: int, candles: int, args):
+    """
+    Runs one configuration in a fresh interpreter (clean imports, state and peak memory).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SIGNALS_DB_PATH=os.path.join(tmp, "bench.db"))
+        cmd = [
+            sys.executable, __file__, "--run-case",
+            "--symbols", str(symbols), "--candles", str(candles),
+            "--warm-scans", str(args.warm_scans), "--seed", str(args.seed),
+            "--latency", str(args.latency), "--notify-latency", str(args.notify_latency),
+        ]
+        output = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+def print_case(case):
+    cold = case['cold']
+    stages = ", ".join(f"{name}={s['seconds']:.3f}s" for name, s in cold['stages'].items())
+    print(f"📊 {case['symbols']} symbols x {case['candles']} candles: "
+          f"cold {cold['scan_seconds']:.2f}s ({cold['symbols_per_second']:.0f} sym/s), "
+          f"peak {case['peak_rss_mb']:.0f} MB")
+    print(f"   stages: {stages}")
+    for i, warm in enumerate(case['warm'], 1):
+        print(f"   warm #{i}: {warm['scan_seconds']:.2f}s, {warm['exchange_calls']} exchange calls")
+
+def compare(old_path: str, new_path: str):
+    with open(old_path) as f:
+        old = {(c['symbols'], c['candles']): c for c in json.load(f)['cases']}
+    with open(new_path) as f:
+        new = {(c['symbols'], c['candles']): c for c in json.load(f)['cases']}
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key]['cold']['scan_seconds'], new[key]['cold']['scan_seconds']
+        change = (after - before) / before * 100
+        print(f"{key[0]:>6} symbols x {key[1]:>5} candles: {before:.3f}s -> {after:.3f}s ({change:+.1f}%)")
+        for name in sorted(set(old[key]['cold']['stages']) | set(new[key]['cold']['stages'])):
+            b = old[key]['cold']['stages'].get(name, {}).get('seconds', 0.0)
+            a = new[key]['cold']['stages'].get(name, {}).get('seconds', 0.0)
+            print(f"       {name:<13} {b:.3f}s -> {a:.3f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scan pipeline offline.")
+    parser.add_argument("--symbols", default="50,500,5000", help="Comma-separated watchlist sizes")
+    parser.add_argument("--candles", default="500", help="Comma-separated candle counts per symbol")
+    parser.add_argument("--warm-scans", type=int, default=2, help="Scans after the first, one new candle each")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated exchange latency per call (s)")
+    parser.add_argument("--notify-latency", type=float, default=0.0, help="Simulated FCM latency per batch (s)")
+    parser.add_argument("--output", help=f"Results file (default: {RESULTS_DIR}/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two results files")
+    parser.add_argument("--run-case", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.run_case:
+        case = asyncio.run(run_case(int(args.symbols), int(args.candles), args.warm_scans,
+                                    args.seed, args.latency, args.notify_latency))
+        print(json.dumps(case))
+        return
+
+    cases = []
+    for candles in (int(c) for c in args.candles.split(",")):
+        for symbols in (int(s) for s in args.symbols.split(",")):
+            case = run_case_subprocess(symbols, candles, args)
+            print_case(case)
+            cases.append(case)
+
+    revision = git_revision()
+    result = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": revision,
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "settings": {"seed": args.seed, "warm_scans": args.warm_scans,
+                     "latency": args.latency, "notify_latency": args.notify_latency},
+        "cases": cases,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{revision}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"💾 Saved {output}")
+
+if __name__ == "__main__":
+    main()
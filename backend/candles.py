@@ -0,0 +1,145 @@
+"""
+Compact candle storage.
+
+A CandleBuffer keeps up to `capacity` candles of one (symbol, timeframe) in
+fixed NumPy arrays: int64 timestamps (epoch ms) and open/high/low/close/volume
+in CANDLE_DTYPE (float64, or float32 for half the memory). Every candle is
+written twice, at i and i + capacity, so the newest n candles are always one
+contiguous slice: view() returns NumPy views without copying, and adding a
+candle never reallocates or shifts anything. Indicators and scoring read
+those views directly; to_frame() builds a DataFrame only for debugging.
+
+A view shares memory with its buffer: it stays valid until the buffer's
+newest candles are replaced (the next merge() of that symbol), so use it
+within one scan. pandas is only imported when a timestamp or DataFrame is asked for.
+"""
+import os
+
+import numpy as np
+
+CANDLE_DTYPE = np.dtype(os.getenv("CANDLE_DTYPE", "float64"))
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+class CandleView:
+    """
+    The newest candles of a buffer: `timestamp` (int64 ms) and a (5, n)
+    `values` array whose rows are open/high/low/close/volume.
+    """
+    __slots__ = ('timestamp', 'values')
+
+    def __init__(self, timestamp: np.ndarray, values: np.ndarray):
+        self.timestamp = timestamp
+        self.values = values
+
+    @classmethod
+    def empty(cls, dtype=CANDLE_DTYPE):
+        return cls(np.empty(0, dtype=np.int64), np.empty((len(COLUMNS), 0), dtype=dtype))
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @property
+    def open(self):
+        return self.values[0]
+
+    @property
+    def high(self):
+        return self.values[1]
+
+    @property
+    def low(self):
+        return self.values[2]
+
+    @property
+    def close(self):
+        return self.values[3]
+
+    @property
+    def volume(self):
+        return self.values[4]
+
+    def without_last(self):
+        """
+        The same candles minus the newest one (still a view, nothing is copied).
+        """
+        return CandleView(self.timestamp[:-1], self.values[:, :-1])
+
+    def last_time(self):
+        """
+        Time of the newest candle, as the pd.Timestamp a DataFrame row would hold.
+        """
+        import pandas as pd
+        return pd.Timestamp(int(self.timestamp[-1]), unit='ms')
+
+    def to_frame(self):
+        """
+        Copies the candles into a DataFrame (datetime 'timestamp' column + OHLCV).
+        """
+        import pandas as pd
+        df = pd.DataFrame({column: self.values[i] for i, column in enumerate(COLUMNS)})
+        df.insert(0, 'timestamp', pd.to_datetime(self.timestamp, unit='ms'))
+        return df
+
+class CandleBuffer:
+    """
+    Fixed-capacity ring buffer of candles with contiguous views (see module docstring).
+    """
+    __slots__ = ('capacity', 'size', 'head', 'timestamps', 'values', 'source')
+
+    def __init__(self, capacity: int, dtype=CANDLE_DTYPE):
+        self.capacity = capacity
+        self.size = 0
+        self.head = 0 # next write position, in [0, capacity)
+        self.source = None # venue the candles came from; another venue's candles don't continue them
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self.values = np.zeros((len(COLUMNS), 2 * capacity), dtype=dtype)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + self.values.nbytes
+
+    @property
+    def last_timestamp(self):
+        return int(self.timestamps[self.head + self.capacity - 1]) if self.size else None
+
+    def clear(self):
+        self.size = 0
+        self.head = 0
+        self.source = None
+
+    def merge(self, rows):
+        """
+        Adds candles given as [timestamp_ms, open, high, low, close, volume]
+        rows, oldest first (ccxt's fetch_ohlcv format). Stored candles at or
+        after the first new timestamp are replaced; beyond capacity the oldest
+        are evicted.
+        """
+        if rows is None or not len(rows):
+            return
+        # None (missing volume) becomes NaN
+        rows = np.array(rows, dtype=np.float64)[-self.capacity:]
+        first_new = rows[0, 0]
+        while self.size and self.last_timestamp >= first_new:
+            self.head = (self.head - 1) % self.capacity
+            self.size -= 1
+
+        count = len(rows)
+        slots = (self.head + np.arange(count)) % self.capacity
+        timestamps = rows[:, 0].astype(np.int64)
+        values = rows[:, 1:6].T
+        for offset in (0, self.capacity):
+            self.timestamps[slots + offset] = timestamps
+            self.values[:, slots + offset] = values
+        self.head = (self.head + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def view(self, limit: int = None):
+        """
+        The newest `limit` candles (all if None), without copying.
+        """
+        count = self.size if limit is None else min(limit, self.size)
+        end = self.head + self.capacity
+        return CandleView(self.timestamps[end - count:end], self.values[:, end - count:end])
@@ -0,0 +1,131 @@
+"""
+Running the API with several server workers (uvicorn --workers N).
+
+Exactly one worker is the scan leader: it holds an exclusive lock on
+LEADER_LOCK_PATH and is the only one running the scheduler, price tracking
+and scans, so exchange calls and notifications aren't multiplied. It writes
+every snapshot and stream event to the shared SignalStore (SQLite, WAL).
+The other workers only serve reads: every SHARED_STATE_POLL seconds they
+check whether the store changed (a cheap PRAGMA) and pull in the new
+snapshot, events and history, keeping the leader's versions and event ids
+so ETags and Last-Event-ID work on any worker. The OS drops the lock when
+the leader exits; the next worker to retry it (every LEADER_RETRY seconds)
+takes over.
+"""
+import asyncio
+import os
+
+import events
+import snapshots
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+LEADER_LOCK_PATH = os.getenv("LEADER_LOCK_PATH", "scan-leader.lock")
+LEADER_RETRY = float(os.getenv("LEADER_RETRY", "5")) # seconds between lock attempts by followers
+SHARED_STATE_POLL = float(os.getenv("SHARED_STATE_POLL", "1")) # seconds between store checks by followers
+
+class LeaderLock:
+    """
+    Non-blocking exclusive file lock, held until release() or process exit.
+    """
+    def __init__(self, path: str = LEADER_LOCK_PATH):
+        self.path = path
+        self.fd = None
+
+    @property
+    def held(self):
+        return self.fd is not None
+
+    def try_acquire(self):
+        if self.fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        # Lets followers say which process runs the scans
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self.fd = fd
+        return True
+
+    def holder(self):
+        """
+        Pid of the current leader, if known.
+        """
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def release(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def sync_shared_state(store):
+    """
+    Pulls the snapshot, stream events and history the leader wrote to `store`.
+    """
+    snapshot, new_events = store.load_shared(after_event=events.broadcaster.last_id)
+    if snapshot is not None:
+        snapshots.install(*snapshot)
+    for event_id, event_type, data in new_events:
+        events.broadcaster.replay(event_id, event_type, data)
+    store.refresh()
+
+class Follower:
+    """
+    Keeps a non-leader worker's state in sync and calls `on_promoted()` once
+    it wins the leader lock.
+    """
+    def __init__(self, store, lock: LeaderLock, on_promoted, poll: float = SHARED_STATE_POLL,
+                 retry: float = LEADER_RETRY):
+        self.store = store
+        self.lock = lock
+        self.on_promoted = on_promoted
+        self.poll = poll
+        self.retry = retry
+        self.worker = None
+
+    def start(self):
+        if self.worker is None:
+            self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+    async def _run(self):
+        waited = 0.0
+        while True:
+            await asyncio.sleep(self.poll)
+            waited += self.poll
+            try:
+                if self.store.changed():
+                    sync_shared_state(self.store)
+            except Exception as e:
+                print(f"⚠️ Shared state sync failed: {e}")
+            if waited >= self.retry:
+                waited = 0.0
+                if self.lock.try_acquire():
+                    # Catch up on everything the old leader wrote before taking over
+                    sync_shared_state(self.store)
+                    self.worker = None
+                    await self.on_promoted()
+                    return
@@ -0,0 +1,143 @@
+"""
+Server-Sent Events push for signal updates.
+
+A client gets the current snapshot when it connects, then only changes:
+- "signals": a scan published a new snapshot (added signals, removed ids)
+- "tp1_hit" / "tp2_hit" / "exit": an active trade reached a target or its stop
+Every signal in these payloads carries its "id" (snapshots.signal_id, built
+from the epoch-ms candle time), the same on every worker and after a
+restart, so clients can match "removed" ids and trade events to it.
+Every event is encoded once into a shared ring buffer with an increasing
+id. Connections don't get their own queues: each one keeps a cursor into the
+buffer and sleeps on one shared wake-up event, so fan-out costs the same
+for one or thousands of clients. A slow client just falls behind; once its
+cursor drops out of the buffer it is re-synced with a fresh snapshot.
+Clients resume after a reconnect with the standard Last-Event-ID header.
+With several server workers only the scan leader publishes; `sink` copies
+its events to the shared store and the other workers replay() them with the
+same ids, so a client can resume on any worker.
+"""
+import asyncio
+import os
+from collections import deque
+
+import snapshots
+from snapshots import signal_id
+
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "1000"))
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", "15")) # seconds of silence before a keep-alive comment
+HEARTBEAT_FRAME = b": ping\n\n"
+
+def encode_frame(event_id: int, event_type: str, data: bytes):
+    # data is compact JSON, so it always fits on one "data:" line
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event_type.encode(), data)
+
+class EventBroadcaster:
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE, heartbeat: float = SSE_HEARTBEAT):
+        self.buffer = deque(maxlen=buffer_size) # (event_id, frame)
+        self.last_id = 0
+        self.heartbeat = heartbeat
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self._snapshot_data = (None, None) # (snapshot version, encoded data)
+        self.sink = None # sink(event_id, event_type, data) is called for every published event
+
+    def publish(self, event_type: str, payload):
+        """
+        Encodes an event once and wakes every connection.
+        """
+        data = snapshots.dumps(payload)
+        self.replay(self.last_id + 1, event_type, data)
+        if self.sink:
+            self.sink(self.last_id, event_type, data)
+        return self.last_id
+
+    def replay(self, event_id: int, event_type: str, data: bytes):
+        """
+        Adds an event published elsewhere (another worker), keeping its id.
+        """
+        if event_id != self.last_id + 1:
+            # Missed events: clients behind this point re-sync from a snapshot
+            self.buffer.clear()
+        self.last_id = event_id
+        self.buffer.append((event_id, encode_frame(event_id, event_type, data)))
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish_snapshot(self, previous, snapshot):
+        """
+        Publishes the difference between two scan snapshots.
+        """
+        before = {signal_id(s) for s in previous.signals}
+        after = {signal_id(s) for s in snapshot.signals}
+        return self.publish("signals", {
+            "version": snapshot.version,
+            "added": [{**s, "id": signal_id(s)} for s in snapshot.signals if signal_id(s) not in before],
+            "removed": sorted(before - after),
+        })
+
+    def snapshot_frame(self):
+        """
+        The current snapshot as a "snapshot" event at the latest event id.
+        """
+        snapshot = snapshots.current
+        version, data = self._snapshot_data
+        if version != snapshot.version:
+            data = snapshots.dumps({
+                "version": snapshot.version,
+                "count": len(snapshot.signals),
+                "signals": [{**s, "id": signal_id(s)} for s in snapshot.signals],
+            })
+            self._snapshot_data = (snapshot.version, data)
+        return encode_frame(self.last_id, "snapshot", data)
+
+    def events_after(self, cursor: int):
+        """
+        Encoded frames after `cursor`, or None if they already left the buffer.
+        """
+        if cursor > self.last_id:
+            return None # id from before a restart
+        if cursor == self.last_id:
+            return []
+        if not self.buffer or cursor < self.buffer[0][0] - 1:
+            return None
+        start = len(self.buffer) - (self.last_id - cursor)
+        return [self.buffer[i][1] for i in range(start, len(self.buffer))]
+
+    async def stream(self, last_event_id: int = None):
+        """
+        Yields SSE bytes for one connection until it is closed.
+        """
+        self.subscribers += 1
+        try:
+            # The cursor moves before each yield: events published while a
+            # write is in progress are picked up on the next pass
+            cursor = self.last_id
+            frames = self.events_after(last_event_id) if last_event_id is not None else None
+            if frames is None:
+                # New client, or resuming from too far back: start from a snapshot
+                yield self.snapshot_frame()
+            elif frames:
+                yield b"".join(frames)
+
+            while True:
+                if cursor < self.last_id:
+                    frames = self.events_after(cursor)
+                    cursor = self.last_id
+                    # Fell behind by more than the buffer holds: re-sync
+                    yield b"".join(frames) if frames is not None else self.snapshot_frame()
+                    continue
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT_FRAME
+        finally:
+            self.subscribers -= 1
+
+broadcaster = EventBroadcaster()
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
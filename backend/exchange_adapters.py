@@ -0,0 +1,183 @@
+"""
+Offline stand-ins for the ccxt exchange client.
+
+Both implement the calls market_data makes on `exchange` (fetch_ohlcv with
+since/limit, fetch_tickers, load_markets, parse_timeframe, milliseconds, close), so they can replace it
+for load tests, profiling and benchmarks without any network:
+- SyntheticExchange: deterministic generated candles (generate_mock_data)
+- ReplayExchange: recorded candles from memory-mapped .npy files
+  (market_data.save_recorded_ohlcv), on a replay clock
+Both can inject latency per call to mimic a real exchange.
+"""
+import asyncio
+import os
+
+import ccxt.async_support as ccxt
+import numpy as np
+
+import market_data
+
+TIMEFRAME_MS = 3600 * 1000
+SYNTHETIC_EPOCH_MS = 1_700_000_000_000 // TIMEFRAME_MS * TIMEFRAME_MS # fixed "now", so runs are identical
+
+def ticker_from_candles(symbol: str, candles):
+    """
+    24h ticker fields computed from the last day of 1h candles.
+    """
+    day = np.asarray(candles[-24:])
+    last, first_open = float(day[-1, 4]), float(day[0, 1])
+    return {
+        "symbol": symbol,
+        "last": last,
+        "open": first_open,
+        "high": float(day[:, 2].max()),
+        "low": float(day[:, 3].min()),
+        "percentage": (last - first_open) / first_open * 100 if first_open else None,
+        "baseVolume": float(day[:, 5].sum()),
+        "quoteVolume": float((day[:, 4] * day[:, 5]).sum()),
+    }
+
+def market_entry(symbol: str):
+    base, quote = symbol.split('/')
+    return {"symbol": symbol, "base": base, "quote": quote, "spot": True, "active": True}
+
+class SyntheticExchange:
+    """
+    Deterministic generated market. Each symbol's 1h history is produced by
+    generate_mock_data from the seed, on a fixed clock that advance() moves forward.
+    """
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+    def __init__(self, seed: int = 42, history: int = 1000, latency: float = 0.0):
+        self.seed = seed
+        self.history = history
+        self.latency = latency
+        self.now_ms = SYNTHETIC_EPOCH_MS
+        self.calls = 0
+
+    def milliseconds(self):
+        return self.now_ms
+
+    def advance(self, candles: int = 1):
+        self.now_ms += candles * TIMEFRAME_MS
+
+    def _series(self, symbol: str):
+        # The same seed always yields the same prefix, so advancing only appends candles
+        steps = (self.now_ms - SYNTHETIC_EPOCH_MS) // TIMEFRAME_MS
+        df = market_data.generate_mock_data(symbol, self.history + int(steps), seed=self.seed)
+        timestamps = self.now_ms - TIMEFRAME_MS * np.arange(len(df))[::-1]
+        return np.column_stack([
+            timestamps, df['open'].values, df['high'].values,
+            df['low'].values, df['close'].values, df['volume'].values,
+        ])
+
+    async def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        rows = self._series(symbol)
+        if since is not None:
+            rows = rows[rows[:, 0] >= since][:limit]
+        elif limit:
+            rows = rows[-limit:]
+        return rows.tolist()
+
+    async def fetch_tickers(self, symbols=None):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return {symbol: ticker_from_candles(symbol, self._series(symbol)) for symbol in symbols or []}
+
+    async def load_markets(self):
+        return {symbol: market_entry(symbol) for symbol in market_data.MOCK_PRICES}
+
+    async def close(self):
+        pass
+
+class ReplayExchange:
+    """
+    Serves recorded OHLCV from memory-mapped files as if it were live.
+    Only candles at or before the replay clock are visible; the clock starts
+    at the newest recorded candle unless `start_ms` is given.
+    `latency` (+ uniform random `jitter`) seconds are awaited on every call.
+    """
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+    def __init__(self, data_dir: str = None, latency: float = 0.0, jitter: float = 0.0,
+                 start_ms: int = None, seed: int = None):
+        self.data_dir = data_dir or market_data.RECORDED_DATA_DIR
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = np.random.default_rng(seed)
+        self.files = {}
+        self.calls = 0
+        self.now_ms = start_ms if start_ms is not None else self._latest_timestamp()
+
+    def _latest_timestamp(self):
+        latest = 0
+        if os.path.isdir(self.data_dir):
+            for name in os.listdir(self.data_dir):
+                if name.endswith(".npy"):
+                    candles = np.load(os.path.join(self.data_dir, name), mmap_mode='r')
+                    if len(candles):
+                        latest = max(latest, int(candles[-1, 0]))
+        return latest
+
+    def _candles(self, symbol: str, timeframe: str):
+        key = (symbol, timeframe)
+        if key not in self.files:
+            path = market_data.recorded_ohlcv_path(symbol, timeframe, self.data_dir)
+            if not os.path.exists(path):
+                raise ccxt.BadSymbol(f"replay: no recorded data for {symbol} {timeframe}")
+            self.files[key] = market_data.load_recorded_ohlcv(symbol, timeframe, self.data_dir)
+        return self.files[key]
+
+    def milliseconds(self):
+        return self.now_ms
+
+    def set_time(self, timestamp_ms: int):
+        self.now_ms = int(timestamp_ms)
+
+    def advance(self, milliseconds: int):
+        self.now_ms += int(milliseconds)
+
+    async def _delay(self):
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None):
+        self.calls += 1
+        await self._delay()
+        candles = self._candles(symbol, timeframe)
+        timestamps = candles[:, 0]
+        end = int(np.searchsorted(timestamps, self.now_ms, side='right'))
+        if since is not None:
+            start = int(np.searchsorted(timestamps, since, side='left'))
+            rows = candles[start:end][:limit]
+        else:
+            rows = candles[max(0, end - (limit or end)):end]
+        return np.asarray(rows).tolist()
+
+    async def fetch_tickers(self, symbols=None, timeframe='1h'):
+        """
+        24h tickers at the replay clock, standing in for the live price feed.
+        """
+        self.calls += 1
+        await self._delay()
+        tickers = {}
+        for symbol in symbols or []:
+            try:
+                candles = self._candles(symbol, timeframe)
+            except ccxt.BadSymbol:
+                continue
+            end = int(np.searchsorted(candles[:, 0], self.now_ms, side='right'))
+            if end:
+                tickers[symbol] = ticker_from_candles(symbol, candles[:end])
+        return tickers
+
+    async def load_markets(self, timeframe='1h'):
+        return {symbol: market_entry(symbol) for symbol in market_data.list_recorded_symbols(timeframe, self.data_dir)}
+
+    async def close(self):
+        self.files.clear()
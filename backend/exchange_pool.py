@@ -0,0 +1,267 @@
+"""
+Pool of exchange clients behind one ccxt-like interface.
+
+market_data talks to `exchange` as if it were a single ccxt client; with
+DATA_SOURCE=exchange that object is an ExchangePool over EXCHANGES:
+- every venue's latency (moving average) and error rate are tracked
+- each symbol is routed to the fastest healthy venue that lists it, and
+  stays there while that venue is healthy and not clearly slower
+- a venue that keeps failing trips its circuit breaker and gets no traffic
+  until the cooldown ends; then one trial request (half-open) decides
+  whether it closes again
+When no venue can serve a request, DataSourceUnavailable is raised and the
+state is visible through health(); nothing silently switches to mock data.
+"""
+import os
+import time
+
+import ccxt.async_support as ccxt
+
+import instrumentation
+
+EXCHANGES = [name.strip() for name in os.getenv("EXCHANGES", "binance,mexc").split(",") if name.strip()]
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5")) # consecutive failures that open a breaker
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30")) # seconds before a half-open trial
+ROUTE_SWITCH_RATIO = 1.5 # move a symbol only if another venue is this much faster
+LATENCY_ALPHA = 0.2 # weight of the newest sample in the latency/error averages
+
+class DataSourceUnavailable(ccxt.NetworkError):
+    """
+    No venue could serve the request (all failing, tripped or not listing the symbol).
+    """
+
+class CircuitBreaker:
+    __slots__ = ('failure_threshold', 'cooldown', 'state', 'failures', 'opened_at', 'trial_in_flight')
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def available(self):
+        """
+        True if a request could be sent now (doesn't change the state).
+        """
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return time.monotonic() - self.opened_at >= self.cooldown
+        return not self.trial_in_flight
+
+    def allow(self):
+        """
+        Claims permission for one request; moves open -> half-open after the cooldown.
+        """
+        if not self.available():
+            return False
+        if self.state != "closed":
+            self.state = "half_open"
+            self.trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+class Venue:
+    """
+    One exchange client with its breaker and statistics.
+    """
+    def __init__(self, name: str, client, breaker: CircuitBreaker = None):
+        self.name = name
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = None # seconds, moving average
+        self.error_rate = 0.0 # moving average of failed requests
+        self.requests = 0
+        self.errors = 0
+        self.last_error = None
+        self.unsupported = set() # symbols this venue doesn't list
+
+    def lists(self, symbol: str):
+        """
+        False if the venue is known not to list `symbol` (from its loaded markets or an earlier BadSymbol).
+        """
+        if symbol in self.unsupported:
+            return False
+        markets = getattr(self.client, 'markets', None)
+        return not markets or symbol in markets
+
+    def record_success(self, seconds: float):
+        self.requests += 1
+        self.latency = seconds if self.latency is None else self.latency + LATENCY_ALPHA * (seconds - self.latency)
+        self.error_rate *= 1 - LATENCY_ALPHA
+        self.breaker.record_success()
+
+    def record_failure(self, error: Exception):
+        self.requests += 1
+        self.errors += 1
+        self.error_rate += LATENCY_ALPHA * (1 - self.error_rate)
+        self.last_error = f"{type(error).__name__}: {error}"[:200]
+        instrumentation.inc("exchange_errors_total", exchange=self.name, error=type(error).__name__)
+        self.breaker.record_failure()
+
+    def health(self):
+        return {
+            "name": self.name,
+            "state": self.breaker.state,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "unsupported_symbols": len(self.unsupported),
+        }
+
+def create_client(name: str):
+    # enableRateLimit makes ccxt queue every call through its own throttler, so
+    # concurrent fetches still respect each exchange's rate limit.
+    return getattr(ccxt, name)({
+        'enableRateLimit': True,
+        'timeout': 30000,
+    })
+
+class ExchangePool:
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+    milliseconds = staticmethod(ccxt.Exchange.milliseconds)
+
+    def __init__(self, venues):
+        self.venues = list(venues)
+        self.routes = {} # symbol -> Venue that last served it
+
+    @classmethod
+    def from_names(cls, names=None):
+        return cls(Venue(name, create_client(name)) for name in (names or EXCHANGES))
+
+    def ranked(self, symbol: str):
+        """
+        Venues to try for a symbol, best first.
+        """
+        candidates = [v for v in self.venues if v.lists(symbol) and v.breaker.available()]
+        # Unmeasured venues sort first so each one gets measured
+        candidates.sort(key=lambda v: v.latency or 0.0)
+        current = self.routes.get(symbol)
+        if current in candidates and candidates[0] is not current:
+            fastest = candidates[0].latency or 0.0
+            if (current.latency or 0.0) <= fastest * ROUTE_SWITCH_RATIO:
+                candidates.remove(current)
+                candidates.insert(0, current)
+        return candidates
+
+    async def _call(self, venue: Venue, method: str, *args, **kwargs):
+        if not venue.breaker.allow():
+            raise DataSourceUnavailable(f"{venue.name}: circuit open")
+        start = time.perf_counter()
+        try:
+            result = await getattr(venue.client, method)(*args, **kwargs)
+        except ccxt.BadSymbol:
+            # The venue answered; it just doesn't list this market
+            venue.record_success(time.perf_counter() - start)
+            raise
+        except Exception as e:
+            venue.record_failure(e)
+            if venue.breaker.state == "open":
+                print(f"⚠️ {venue.name}: circuit opened after {venue.breaker.failures} failures ({venue.last_error})")
+            raise
+        venue.record_success(time.perf_counter() - start)
+        return result
+
+    async def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None):
+        errors = []
+        for venue in self.ranked(symbol):
+            try:
+                rows = await self._call(venue, 'fetch_ohlcv', symbol, timeframe, since=since, limit=limit)
+            except ccxt.BadSymbol:
+                venue.unsupported.add(symbol)
+                continue
+            except Exception as e:
+                errors.append(f"{venue.name}: {type(e).__name__}")
+                continue
+            self.routes[symbol] = venue
+            return rows
+        if not any(v.lists(symbol) for v in self.venues):
+            raise ccxt.BadSymbol(f"{symbol} is not listed on any of {[v.name for v in self.venues]}")
+        raise DataSourceUnavailable(f"No exchange could serve {symbol} ({', '.join(errors) or 'all circuits open'})")
+
+    async def fetch_tickers(self, symbols=None):
+        """
+        Bulk tickers, one request per venue: each symbol goes to its preferred
+        venue among those that list it, and symbols of a failed request move
+        on to their next venue. A symbol is only left out once every venue
+        listing it has failed.
+        """
+        tickers = {}
+        pending = list(symbols or [])
+        tried = {symbol: set() for symbol in pending}
+        while pending:
+            groups = {}
+            for symbol in pending:
+                venues = [v for v in self.ranked(symbol) if v not in tried[symbol]]
+                if venues:
+                    groups.setdefault(venues[0], []).append(symbol)
+            pending = []
+            for venue, group in groups.items():
+                try:
+                    tickers.update(await self._call(venue, 'fetch_tickers', group))
+                except Exception:
+                    for symbol in group:
+                        tried[symbol].add(venue)
+                    pending.extend(group)
+        if symbols and not tickers:
+            raise DataSourceUnavailable("No exchange could serve tickers")
+        return tickers
+
+    async def load_markets(self):
+        """
+        Union of the venues' markets; venues that fail are skipped.
+        """
+        markets = {}
+        # Slowest first (unmeasured before all), so the fastest venue is applied last
+        slowest_first = sorted(self.venues, key=lambda v: v.latency if v.latency is not None else float('inf'),
+                               reverse=True)
+        for venue in slowest_first:
+            if not venue.breaker.available():
+                continue
+            try:
+                # The fastest venue's metadata wins for symbols listed on several
+                markets.update(await self._call(venue, 'load_markets'))
+            except Exception as e:
+                print(f"⚠️ {venue.name}: failed to load markets ({type(e).__name__})")
+        if not markets:
+            raise DataSourceUnavailable("No exchange could load markets")
+        return markets
+
+    def available(self):
+        """
+        True if at least one venue can take requests.
+        """
+        return any(v.breaker.available() for v in self.venues)
+
+    def health(self):
+        venues = [v.health() for v in self.venues]
+        available = [v for v in self.venues if v.breaker.available()]
+        if len(available) == len(self.venues) and all(v.breaker.state == "closed" for v in self.venues):
+            status = "ok"
+        elif available:
+            status = "degraded"
+        else:
+            status = "down"
+        routed = {}
+        for venue in self.routes.values():
+            routed[venue.name] = routed.get(venue.name, 0) + 1
+        return {"status": status, "exchanges": venues, "routed_symbols": routed}
+
+    async def close(self):
+        for venue in self.venues:
+            await venue.client.close()
@@ -0,0 +1,161 @@
+"""
+Lightweight instrumentation for the scan pipeline.
+
+Two consumers share the same hooks:
+- stage totals (STAGE_TIMING=1 or enable()): summed seconds per stage, used
+  by benchmark.py
+- Prometheus metrics (METRICS=1, the default): per-stage latency histograms,
+  counters and gauges, rendered in the text exposition format for /metrics
+When both are off, stage() hands back one shared no-op context manager and
+record()/inc() return immediately, so the hooks cost a function call and
+nothing else.
+"""
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+enabled = os.getenv("STAGE_TIMING", "0") == "1"
+metrics_enabled = os.getenv("METRICS", "1") == "1"
+stage_seconds = defaultdict(float)
+stage_calls = defaultdict(int)
+
+METRIC_PREFIX = "signals_"
+# Seconds; covers a single cached fetch up to a slow full scan
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+STAGE_HELP = "Duration of pipeline stages (fetch is per symbol, scan is a whole scan)."
+COUNTER_HELP = {
+    "exchange_errors_total": "Failed exchange requests, by exchange and error type.",
+    "fetch_failures_total": "Symbols skipped in a scan because no exchange returned candles.",
+    "emitted_total": "New signals emitted by scans.",
+    "notifications_total": "Notification send outcomes (sent, retried, dead_letter).",
+    "notification_events_total": "Notification events by planning outcome (planned, deduplicated, rate_limited).",
+    "scans_total": "Market scans started.",
+    "scan_overlaps_total": "Scans started while another scan was still running.",
+    "scans_coalesced_total": "Scan requests merged into a running or already queued scan.",
+}
+
+# {stage: [bucket counts..., +Inf count, sum]}
+stage_histograms = {}
+counters = defaultdict(float) # {(name, ((label, value), ...)): value}
+gauges = {} # {name: (help, callback)}
+
+class _StageTimer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_TIMER = _NoopTimer()
+
+def stage(name: str):
+    """
+    Times a block: `with stage("fetch"): ...`
+    """
+    if not (enabled or metrics_enabled):
+        return _NOOP_TIMER
+    return _StageTimer(name)
+
+def record(name: str, seconds: float):
+    """
+    Adds a duration measured elsewhere (e.g. inside a worker process).
+    """
+    if enabled:
+        stage_seconds[name] += seconds
+        stage_calls[name] += 1
+    if metrics_enabled:
+        histogram = stage_histograms.get(name)
+        if histogram is None:
+            histogram = stage_histograms[name] = [0] * (len(STAGE_BUCKETS) + 1) + [0.0]
+        histogram[bisect_left(STAGE_BUCKETS, seconds)] += 1
+        histogram[-1] += seconds
+
+def inc(name: str, amount: float = 1, **labels):
+    """
+    Increments a counter from COUNTER_HELP: `inc("exchange_errors_total", exchange="binance")`
+    """
+    if metrics_enabled:
+        counters[(name, tuple(sorted(labels.items())))] += amount
+
+def register_gauge(name: str, help_text: str, callback):
+    """
+    Registers a gauge read at scrape time. `callback()` returns a number, or
+    a list of (labels dict, number) pairs.
+    """
+    gauges[name] = (help_text, callback)
+
+def enable(on: bool = True):
+    global enabled
+    enabled = on
+
+def reset():
+    stage_seconds.clear()
+    stage_calls.clear()
+
+def report():
+    return {
+        name: {"seconds": stage_seconds[name], "calls": stage_calls[name]}
+        for name in sorted(stage_seconds)
+    }
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    name = METRIC_PREFIX + "stage_seconds"
+    lines += [f"# HELP {name} {STAGE_HELP}", f"# TYPE {name} histogram"]
+    for stage_name in sorted(stage_histograms):
+        histogram = stage_histograms[stage_name]
+        cumulative = 0
+        for bound, count in zip(STAGE_BUCKETS + ("+Inf",), histogram[:-1]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{stage="{stage_name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{stage="{stage_name}"}} {histogram[-1]}')
+        lines.append(f'{name}_count{{stage="{stage_name}"}} {cumulative}')
+
+    for counter_name, help_text in COUNTER_HELP.items():
+        name = METRIC_PREFIX + counter_name
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (key, labels), value in sorted(counters.items()):
+            if key == counter_name:
+                lines.append(f"{name}{_labels(labels)} {value:g}")
+
+    for gauge_name, (help_text, callback) in sorted(gauges.items()):
+        name = METRIC_PREFIX + gauge_name
+        try:
+            value = callback()
+        except Exception:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        if isinstance(value, list):
+            for labels, sample in value:
+                lines.append(f"{name}{_labels(sorted(labels.items()))} {sample:g}")
+        else:
+            lines.append(f"{name} {value:g}")
+    return "\n".join(lines) + "\n"
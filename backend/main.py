@@ -1,53 +1,81 @@
-from fastapi import FastAPI, BackgroundTasks
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from market_data import fetch_ohlcv
-from analysis import calculate_indicators, analyze_market_structure
+import time
+BOOT_STARTED = time.perf_counter() # the startup report is measured from here
+
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+# pandas, pandas_ta, ccxt and firebase_admin are imported on first use, not here
+from market_data import closed_candles, fetch_candles_many, data_source_health, get_exchange
+from analysis_executor import AnalysisExecutor
 import asyncio
+import hmac
 import os
-import firebase_admin
-from firebase_admin import credentials, messaging
+from notifications import NotificationDispatcher, FirebaseMessagingClient
+from notification_planner import NotificationPlanner
+import snapshots
+import negotiation
+import events
+import instrumentation
+from instrumentation import stage
+from storage import SignalStore, parse_time
+from price_tracker import PriceTracker
+from screener import UniverseScreener
+from profiling import ScanProfiler, CAPTURE_FILES, new_profile_id
+from scan_scheduler import ScanScheduler
+import cluster
+import market_context
 
 app = FastAPI(title="Crypto Signals API")
 
 # --- FIREBASE SETUP ---
+# Runs in the background after startup (init_firebase); notifications are skipped until then
 FCM_ENABLED = False
-try:
-    if os.path.exists("serviceAccountKey.json"):
-        cred = credentials.Certificate("serviceAccountKey.json")
-        firebase_admin.initialize_app(cred)
-        FCM_ENABLED = True
-        print("✅ Firebase Admin Initialized")
-    else:
-        print("⚠️ serviceAccountKey.json not found. FCM Notifications will be SKIPPED.")
-except Exception as e:
-    print(f"⚠️ Firebase Initialization Error: {e}")
+firebase_initialized = False
+
+def init_firebase():
+    global FCM_ENABLED, firebase_initialized
+    if firebase_initialized:
+        return
+    firebase_initialized = True
+    try:
+        if os.path.exists("serviceAccountKey.json"):
+            import firebase_admin
+            from firebase_admin import credentials
+            cred = credentials.Certificate("serviceAccountKey.json")
+            firebase_admin.initialize_app(cred)
+            FCM_ENABLED = True
+            print("✅ Firebase Admin Initialized")
+        else:
+            print("⚠️ serviceAccountKey.json not found. FCM Notifications will be SKIPPED.")
+    except Exception as e:
+        print(f"⚠️ Firebase Initialization Error: {e}")
+
+# Sends from a background worker in batches so the scan never waits on FCM
+notification_dispatcher = NotificationDispatcher(FirebaseMessagingClient())
 
 def send_fcm_notification(topic, title, body):
     """
-    Sends a push notification to a specific topic.
+    Queues a push notification to a specific topic.
     """
     if not FCM_ENABLED:
         return
     
-    try:
-        message = messaging.Message(
-            notification=messaging.Notification(
-                title=title,
-                body=body,
-            ),
-            topic=topic,
-        )
-        response = messaging.send(message)
-        print(f"🚀 FCM Sent to {topic}: {response}")
-    except Exception as e:
-        print(f"❌ FCM Error ({topic}): {e}")
+    notification_dispatcher.enqueue(topic, title, body)
+
+# Collects a scan's (or a tracking check's) events into deduplicated, rate-limited digests
+notification_planner = NotificationPlanner(send_fcm_notification)
+
+def notify(symbol, kind, title_en, body_en, title_ar, body_ar):
+    """
+    Records a notification event; the planner decides what is sent and when.
+    """
+    notification_planner.add(symbol, kind, {"en": (title_en, body_en), "ar": (title_ar, body_ar)})
 
 
-# Store signals in memory for MVP
+# Latest scan results are kept in memory; history and active trades are persisted
 latest_signals = []
-signal_history = []
-# NEW: Store active signals to track profits
-active_signals = {} # format: {symbol: {entry_price, max_gain, stop_loss, target_1, target_2}}
+signal_store = SignalStore()
+# NEW: Store active signals to track profits (restored from the store so tracking survives restarts)
+active_signals = signal_store.load_active() # format: {symbol: {signal_id, entry_price, max_gain, stop_loss, target_1, target_2}}
 
 # List of Top 50 Coins (Verified for Binance)
 WATCHLIST = [
@@ -60,7 +88,19 @@ WATCHLIST = [
     'SNX/USDT', 'CRV/USDT'
 ]
 
-scheduler = AsyncIOScheduler()
+# "watchlist": scan WATCHLIST; "screener": scan the top pairs of every USDT market (screener.py)
+SCAN_UNIVERSE = os.getenv("SCAN_UNIVERSE", "watchlist")
+screener = UniverseScreener(fallback=WATCHLIST)
+
+# Candles fetched per symbol (enough history for EMA200 to be valid)
+SCAN_CANDLES = int(os.getenv("SCAN_CANDLES", "500"))
+
+# "stream": analyze each symbol as its data arrives
+# "batch": analyze all symbols at once on stacked NumPy arrays (batch_analysis.py)
+SCAN_MODE = os.getenv("SCAN_MODE", "stream")
+
+# Runs calculate_indicators/analyze_market_structure off the event loop (ANALYSIS_EXECUTOR)
+analysis_executor = AnalysisExecutor()
 
 def format_notification(signal, lang='en'):
     """
@@ -99,271 +139,565 @@ def format_notification(signal, lang='en'):
     
     return title, body
 
-async def run_market_scan():
+def track_active_signal(symbol, current_price):
+    """
+    Checks an active trade against TP1/TP2/Stop Loss and sends the alerts.
+    Returns True if the trade changed (closed, target hit, new max gain or
+    reported gain), i.e. active_signals has to be written to the store.
+    """
+    changed = False
+    if symbol in active_signals:
+        signal = active_signals[symbol]
+        entry_price = signal['entry_price']
+        
+        # Calculate Gain/Loss
+        gain_pct = ((current_price - entry_price) / entry_price) * 100
+        
+        # Update Max Gain
+        if gain_pct > signal['max_gain']:
+            signal['max_gain'] = gain_pct
+            changed = True
+        
+        # Check for Take Profit / Stop Loss Events
+        if current_price >= signal['target_1'] and not signal.get('tp1_hit'):
+            title_en = f"🚀 TP1 HIT: {symbol}"
+            body_en = f"{symbol} hit Target 1! Gain: +{gain_pct:.2f}%"
+            
+            title_ar = f"🚀 تم تحقيق الهدف الأول: {symbol}"
+            body_ar = f"عملة {symbol} حققت الهدف الأول! الربح: +{gain_pct:.2f}%"
+
+            print(title_en)
+            print(title_ar)
+            
+            notify(symbol, "tp1", title_en, body_en, title_ar, body_ar)
+            
+            signal['tp1_hit'] = True
+            changed = True
+            events.broadcaster.publish("tp1_hit", {"id": signal.get('signal_id'), "symbol": symbol, "price": current_price, "gain_pct": gain_pct})
+            
+        elif current_price >= signal['target_2'] and not signal.get('tp2_hit'):
+            title_en = f"🚀🚀 TP2 HIT: {symbol}"
+            body_en = f"{symbol} hit Target 2! Gain: +{gain_pct:.2f}%"
+            
+            title_ar = f"🚀🚀 تم تحقيق الهدف الثاني: {symbol}"
+            body_ar = f"عملة {symbol} حققت الهدف الثاني! الربح: +{gain_pct:.2f}%"
+
+            print(title_en)
+            print(title_ar)
+            
+            notify(symbol, "tp2", title_en, body_en, title_ar, body_ar)
+            
+            signal['tp2_hit'] = True
+            changed = True
+            events.broadcaster.publish("tp2_hit", {"id": signal.get('signal_id'), "symbol": symbol, "price": current_price, "gain_pct": gain_pct})
+            
+        elif current_price <= signal['stop_loss']:
+            title_en = f"🛑 EXIT ALERT: {symbol}"
+            body_en = f"{symbol} reached exit zone. Gain: {gain_pct:.2f}%"
+            
+            title_ar = f"🛑 تنبيه خروج: {symbol}"
+            body_ar = f"عملة {symbol} وصلت لمنطقة الخروج. الربح: {gain_pct:.2f}%"
+
+            print(title_en)
+            print(title_ar)
+            
+            notify(symbol, "exit", title_en, body_en, title_ar, body_ar)
+            
+            del active_signals[symbol] # Remove from active
+            events.broadcaster.publish("exit", {"id": signal.get('signal_id'), "symbol": symbol, "price": current_price, "gain_pct": gain_pct})
+            return True
+            
+        # Periodic Profit Update (e.g. every +2%)
+        if gain_pct >= 2.0 and int(gain_pct) > int(signal.get('last_reported_gain', 0)):
+            title_en = f"📈 UPDATE: {symbol}"
+            body_en = f"{symbol} is up +{gain_pct:.2f}%"
+            
+            title_ar = f"📈 تحديث: {symbol}"
+            body_ar = f"عملة {symbol} ارتفعت بنسبة +{gain_pct:.2f}%"
+
+            print(title_en)
+            print(title_ar)
+            
+            notify(symbol, "update", title_en, body_en, title_ar, body_ar)
+            
+            signal['last_reported_gain'] = gain_pct
+            changed = True
+    return changed
+
+def emit_signal(symbol, result, context):
+    """
+    Applies the BTC filter and score threshold to an analysis result.
+    Notifies and starts tracking qualifying signals; returns the signal dict, or None.
+    """
+    if result:
+        from analysis import add_market_context
+        result = add_market_context(result, context.for_symbol(symbol))
+        # BTC Correlation Filter
+        # Don't buy a coin that follows BTC while BTC is Bearish (unless the signal is exceptionally strong > 90)
+        if context.btc_trend == "BEARISH" and result['score'] < 90 and market_context.follows_btc(result['market']):
+            # print(f"⚠️ Filtered {symbol} due to Bearish BTC Market")
+            return None
+
+        signal_data = {
+            "symbol": symbol,
+            **result
+        }
+        # Only keep Strong or Medium signals
+        if result['score'] >= 30:
+            # Check if this is a NEW signal to notify (Mock notification)
+            # Generate Bilingual Content
+            title_en, body_en = format_notification(signal_data, 'en')
+            title_ar, body_ar = format_notification(signal_data, 'ar')
+            
+            print(f"🔔 [EN] {title_en}")
+            print(body_en)
+            print("-" * 20)
+            print(f"🔔 [AR] {title_ar}")
+            print(body_ar)
+            print("=" * 40)
+            
+            notify(symbol, "signal", title_en, body_en, title_ar, body_ar)
+            
+            # Add to history for tracking (written to the store at the end of the scan)
+            signal_store.add_signal(signal_data)
+            instrumentation.inc("emitted_total")
+            
+            # Add to Active Signals for Tracking
+            active_signals[symbol] = {
+                "signal_id": snapshots.signal_id(signal_data),
+                "entry_price": result['price'],
+                "stop_loss": result['trade_setup']['stop_loss'],
+                "target_1": result['trade_setup']['target_1'],
+                "target_2": result['trade_setup']['target_2'],
+                "max_gain": 0.0,
+                "tp1_hit": False,
+                "tp2_hit": False
+            }
+            return signal_data
+    return None
+
+# Checks active trades every few seconds from one bulk ticker request (TRACK_INTERVAL)
+price_tracker = PriceTracker(
+    symbols=lambda: list(active_signals),
+    track=track_active_signal,
+    on_changed=lambda changed: signal_store.flush_later(active_signals),
+    on_checked=notification_planner.flush,
+)
+
+async def process_symbol(symbol, candles):
+    """
+    Analyzes a symbol without an active trade; emit_signal decides once the market context is complete.
+    """
+    return symbol, await analysis_executor.analyze(symbol, candles)
+
+async def scan_candles(scan_symbols, context):
+    """
+    Candles of every symbol to scan: the benchmarks the market context already fetched, then the rest.
+    Only closed candles are analyzed (see closed_candles).
+    """
+    for symbol in scan_symbols:
+        if symbol in context.benchmarks:
+            yield symbol, context.benchmarks[symbol]
+    others = [s for s in scan_symbols if s not in context.benchmarks]
+    async for symbol, candles in fetch_candles_many(others, '1h', limit=SCAN_CANDLES):
+        yield symbol, closed_candles(candles)
+
+scans_in_progress = 0
+
+async def run_market_scan(symbols=None):
+    """
+    Runs analysis on all coins in WATCHLIST, or on the screener's candidates.
+    With `symbols`, only those are rescanned and the other signals are kept.
+    """
+    global scans_in_progress
+    instrumentation.inc("scans_total")
+    if scans_in_progress:
+        instrumentation.inc("scan_overlaps_total")
+    scans_in_progress += 1
+    try:
+        with stage("scan"), notification_planner.collect():
+            await _run_market_scan(symbols)
+    finally:
+        scans_in_progress -= 1
+
+# Profiling: every Nth scheduled scan (0 = never), or the next one when armed via /admin/profiles/next
+SCAN_PROFILE_EVERY = int(os.getenv("SCAN_PROFILE_EVERY", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+scan_profiler = ScanProfiler()
+scheduled_scans = 0
+profile_next_scan = False
+
+def scheduled_scan():
     """
-    Runs analysis on all coins in WATCHLIST.
+    Called at every candle close: queues a plain scan, or a profiled one when requested.
     """
-    print("🔄 Running Market Scan...")
+    global scheduled_scans, profile_next_scan
+    scheduled_scans += 1
+    profile_id = None
+    if profile_next_scan or (SCAN_PROFILE_EVERY and scheduled_scans % SCAN_PROFILE_EVERY == 0):
+        profile_next_scan = False
+        profile_id = new_profile_id()
+    scan_scheduler.request(profile_id=profile_id, reason="candle_close")
+
+async def run_scan_request(request):
+    if request.profile_id:
+        await scan_profiler.run(lambda: run_market_scan(request.symbols), request.profile_id)
+    else:
+        await run_market_scan(request.symbols)
+
+# Every scan goes through here: one in flight, right after each candle close (scan_scheduler.py)
+scan_scheduler = ScanScheduler(run_scan_request, on_close=scheduled_scan)
+
+# Signal order of the last full scan ({symbol: position}), kept by partial rescans
+signal_order = {}
+
+async def _run_market_scan(symbols=None):
+    print("🔄 Running Market Scan..." if symbols is None else f"🔄 Rescanning {', '.join(sorted(symbols))}...")
     global latest_signals
+    global signal_order
     global active_signals
     new_signals = []
     
     # 1. CHECK BITCOIN TREND FIRST (Market Correlation)
-    btc_trend = "NEUTRAL"
+    # BTC (and the other benchmarks) are fetched once here and reused for their own analysis
     try:
-        btc_df = await fetch_ohlcv('BTC/USDT', '1h', limit=100)
-        if not btc_df.empty:
-            btc_df = calculate_indicators(btc_df)
-            btc_last = btc_df.iloc[-1]
-            if btc_last['close'] > btc_last['EMA_200']:
-                btc_trend = "BULLISH"
-            elif btc_last['close'] < btc_last['EMA_200']:
-                btc_trend = "BEARISH"
-        print(f"📉 Market Sentiment (BTC): {btc_trend}")
+        with stage("market_context"):
+            context = await market_context.load(SCAN_CANDLES)
+        print(f"📉 Market Sentiment (BTC): {context.btc_trend}")
     except Exception as e:
         print(f"⚠️ Failed to fetch BTC trend: {e}")
+        context = market_context.MarketContext()
 
-    for symbol in WATCHLIST:
-        # Fetch Data (Fetch more to ensure EMA200 is valid)
-        df = await fetch_ohlcv(symbol, '1h', limit=500)
-        if df.empty:
-            continue
-        
-        # Get Current Price for Tracking
-        current_price = df.iloc[-1]['close']
-        
-        # --- TRACK ACTIVE SIGNALS ---
-        if symbol in active_signals:
-            signal = active_signals[symbol]
-            entry_price = signal['entry_price']
-            
-            # Calculate Gain/Loss
-            gain_pct = ((current_price - entry_price) / entry_price) * 100
-            
-            # Update Max Gain
-            if gain_pct > signal['max_gain']:
-                signal['max_gain'] = gain_pct
-            
-            # Check for Take Profit / Stop Loss Events
-            if current_price >= signal['target_1'] and not signal.get('tp1_hit'):
-                title_en = f"🚀 TP1 HIT: {symbol}"
-                body_en = f"{symbol} hit Target 1! Gain: +{gain_pct:.2f}%"
-                
-                title_ar = f"🚀 تم تحقيق الهدف الأول: {symbol}"
-                body_ar = f"عملة {symbol} حققت الهدف الأول! الربح: +{gain_pct:.2f}%"
-
-                print(title_en)
-                print(title_ar)
-                
-                send_fcm_notification('signals_en', title_en, body_en)
-                send_fcm_notification('signals_ar', title_ar, body_ar)
-                
-                signal['tp1_hit'] = True
-                
-            elif current_price >= signal['target_2'] and not signal.get('tp2_hit'):
-                title_en = f"🚀🚀 TP2 HIT: {symbol}"
-                body_en = f"{symbol} hit Target 2! Gain: +{gain_pct:.2f}%"
-                
-                title_ar = f"🚀🚀 تم تحقيق الهدف الثاني: {symbol}"
-                body_ar = f"عملة {symbol} حققت الهدف الثاني! الربح: +{gain_pct:.2f}%"
-
-                print(title_en)
-                print(title_ar)
-                
-                send_fcm_notification('signals_en', title_en, body_en)
-                send_fcm_notification('signals_ar', title_ar, body_ar)
-                
-                signal['tp2_hit'] = True
-                
-            elif current_price <= signal['stop_loss']:
-                title_en = f"🛑 EXIT ALERT: {symbol}"
-                body_en = f"{symbol} reached exit zone. Gain: {gain_pct:.2f}%"
-                
-                title_ar = f"🛑 تنبيه خروج: {symbol}"
-                body_ar = f"عملة {symbol} وصلت لمنطقة الخروج. الربح: {gain_pct:.2f}%"
-
-                print(title_en)
-                print(title_ar)
-                
-                send_fcm_notification('signals_en', title_en, body_en)
-                send_fcm_notification('signals_ar', title_ar, body_ar)
-                
-                del active_signals[symbol] # Remove from active
-                continue # Skip analysis for this coin
-                
-            # Periodic Profit Update (e.g. every +2%)
-            if gain_pct >= 2.0 and int(gain_pct) > int(signal.get('last_reported_gain', 0)):
-                title_en = f"📈 UPDATE: {symbol}"
-                body_en = f"{symbol} is up +{gain_pct:.2f}%"
-                
-                title_ar = f"📈 تحديث: {symbol}"
-                body_ar = f"عملة {symbol} ارتفعت بنسبة +{gain_pct:.2f}%"
-
-                print(title_en)
-                print(title_ar)
-                
-                send_fcm_notification('signals_en', title_en, body_en)
-                send_fcm_notification('signals_ar', title_ar, body_ar)
-                
-                signal['last_reported_gain'] = gain_pct
-
-        # --- ANALYZE FOR NEW SIGNALS ---
-        # Skip analysis if we already have an active trade for this symbol
-        if symbol in active_signals:
+    # 2. TRACK ACTIVE SIGNALS (the price tracker also does this between scans)
+    # Coins with an open trade, or whose trade just closed, are not analyzed
+    changed = await price_tracker.check()
+    skip = set(active_signals) | changed
+    if symbols is not None:
+        scan_symbols = [s for s in sorted(symbols, key=lambda s: signal_order.get(s, len(signal_order)))
+                        if s not in skip]
+    elif SCAN_UNIVERSE == "screener":
+        scan_symbols = await screener.candidates(exclude=skip)
+    else:
+        scan_symbols = [s for s in WATCHLIST if s not in skip]
+
+    # Fetch Data (Fetch more to ensure EMA200 is valid)
+    # Symbols are fetched concurrently and analyzed as soon as each one arrives
+    batch_frames = {}
+    analysis_tasks = []
+    async for symbol, candles in scan_candles(scan_symbols, context):
+        if not len(candles):
             continue
+        batch_frames[symbol] = candles
+        if SCAN_MODE != "batch":
+            # Analysis runs in the executor while the remaining fetches continue
+            analysis_tasks.append(asyncio.create_task(process_symbol(symbol, candles)))
 
-        df = calculate_indicators(df)
-        result = analyze_market_structure(df)
-        
-        if result:
-            # BTC Correlation Filter
-            # Don't buy if BTC is Bearish (unless the signal is exceptionally strong > 90)
-            if btc_trend == "BEARISH" and result['score'] < 90:
-                # print(f"⚠️ Filtered {symbol} due to Bearish BTC Market")
-                continue
-
-            signal_data = {
-                "symbol": symbol,
-                **result
-            }
-            # Only keep Strong or Medium signals
-            if result['score'] >= 30:
-                new_signals.append(signal_data)
-                
-                # Check if this is a NEW signal to notify (Mock notification)
-                # Generate Bilingual Content
-                title_en, body_en = format_notification(signal_data, 'en')
-                title_ar, body_ar = format_notification(signal_data, 'ar')
-                
-                print(f"🔔 [EN] {title_en}")
-                print(body_en)
-                print("-" * 20)
-                print(f"🔔 [AR] {title_ar}")
-                print(body_ar)
-                print("=" * 40)
-                
-                send_fcm_notification('signals_en', title_en, body_en)
-                send_fcm_notification('signals_ar', title_ar, body_ar)
-                
-                # Add to history for tracking
-                signal_history.append(signal_data)
-                
-                # Add to Active Signals for Tracking
-                active_signals[symbol] = {
-                    "entry_price": result['price'],
-                    "stop_loss": result['trade_setup']['stop_loss'],
-                    "target_1": result['trade_setup']['target_1'],
-                    "target_2": result['trade_setup']['target_2'],
-                    "max_gain": 0.0,
-                    "tp1_hit": False,
-                    "tp2_hit": False
-                }
+    # Correlation/beta of every fetched symbol against the benchmarks, in one pass
+    with stage("market_context"):
+        context.correlate(batch_frames)
+
+    if analysis_tasks:
+        results = await asyncio.gather(*analysis_tasks)
+    elif batch_frames:
+        # Analyze everything together once all data is in
+        # Signals need score >= 30 anyway, so skip building results below that
+        results = (await analysis_executor.analyze_batch(batch_frames, min_score=30)).items()
+    else:
+        results = []
+    for symbol, result in results:
+        signal_data = emit_signal(symbol, result, context)
+        if signal_data:
+            new_signals.append(signal_data)
     
     # Update latest signals list
     # User requested Market Cap order (which matches WATCHLIST order), not Score order
+    # (screener candidates keep their screening rank)
+    if symbols is None:
+        signal_order = {symbol: i for i, symbol in enumerate(scan_symbols)}
+    else:
+        # Keep the signals of everything that wasn't rescanned (also those restored at startup)
+        new_signals += [s for s in snapshots.current.signals if s['symbol'] not in symbols]
+    new_signals.sort(key=lambda s: signal_order.get(s['symbol'], len(signal_order)))
     latest_signals = new_signals
+    # Encode the API responses once per scan
+    previous_snapshot = snapshots.current
+    snapshot = snapshots.publish(latest_signals)
+    # Persist new signals, the tracking state and the snapshot (read by the other workers) in one batch
+    await asyncio.wrap_future(signal_store.flush_later(active_signals, snapshot=snapshot))
+    # Then push the changes to stream clients
+    events.broadcaster.publish_snapshot(previous_snapshot, snapshot)
     print("✅ Scan Complete.")
 
+# Gauges read when /metrics is scraped
+instrumentation.register_gauge("scans_in_progress", "Market scans currently running.", lambda: scans_in_progress)
+instrumentation.register_gauge("scans_pending", "1 if a scan is queued behind the running one.",
+                               lambda: int(scan_scheduler.pending is not None))
+instrumentation.register_gauge("active_trades", "Signals being tracked for TP/stop.", lambda: len(active_signals))
+instrumentation.register_gauge("notification_queue_depth", "Notifications waiting to be sent.",
+                               lambda: notification_dispatcher.queue.qsize())
+instrumentation.register_gauge("notification_retries_pending", "Failed notifications waiting for a retry.",
+                               lambda: notification_dispatcher.pending_retries)
+instrumentation.register_gauge("notification_dead_letters", "Notifications that ran out of retries.",
+                               lambda: len(notification_dispatcher.dead_letters))
+instrumentation.register_gauge("history_write_buffer", "Signals not yet written to the store.",
+                               lambda: len(signal_store.pending))
+instrumentation.register_gauge("sse_subscribers", "Open /signals/stream connections.",
+                               lambda: events.broadcaster.subscribers)
+instrumentation.register_gauge("scan_leader", "1 if this worker runs the scans.", lambda: int(leader_lock.held))
+instrumentation.register_gauge("exchange_circuit_open", "1 if the exchange's circuit breaker is not closed.", lambda: [
+    ({"exchange": e['name']}, int(e['state'] != "closed"))
+    for e in data_source_health().get('exchanges', [])
+])
+
+# With several server workers only the holder of the leader lock scans (cluster.py)
+leader_lock = cluster.LeaderLock()
+
+async def become_leader(initial_scan: bool = True):
+    """
+    Starts scanning and tracking in this worker.
+    """
+    # A previous leader may have changed the tracked trades since this worker started
+    active_signals.clear()
+    active_signals.update(signal_store.load_active())
+    events.broadcaster.sink = signal_store.add_event_later
+    analysis_executor.start()
+    price_tracker.start()
+    scan_scheduler.start()
+    print(f"👑 Worker {os.getpid()} is the scan leader")
+    if initial_scan:
+        # Run one scan immediately after taking over
+        scan_scheduler.request(reason="leader_takeover")
+
+follower = cluster.Follower(signal_store, leader_lock, on_promoted=become_leader)
+
+# Startup timings in seconds since main was imported (also served by /health)
+startup_report = {}
+
+def import_pipeline():
+    # Module imports hold the event loop while they run, so they happen in a thread
+    import ccxt.async_support
+    import analysis
+    import batch_analysis
+
+async def warm_up():
+    """
+    Runs once the API is already serving: Firebase and the scan's imports
+    (pandas, pandas_ta, ccxt) in a thread, then the first scan, which fills
+    the candle cache.
+    """
+    await asyncio.to_thread(init_firebase)
+    if leader_lock.held:
+        await asyncio.to_thread(import_pipeline)
+        get_exchange()
+        scan_started = time.perf_counter()
+        await scan_scheduler.request(reason="warm_up").done.wait()
+        startup_report["first_scan_seconds"] = round(time.perf_counter() - scan_started, 3)
+    startup_report["warm_seconds"] = round(time.perf_counter() - BOOT_STARTED, 3)
+    print(f"🔥 Warm-up done {startup_report['warm_seconds']}s after start: {startup_report}")
+
 @app.on_event("startup")
 async def start_scheduler():
-    scheduler.add_job(run_market_scan, 'interval', minutes=20) # Run every 20 minutes as requested
-    scheduler.start()
-    # Run one scan immediately on startup
-    asyncio.create_task(run_market_scan())
+    notification_dispatcher.start()
+    # Serve the last published signals (and resume stream ids) right away, until the first scan
+    cluster.sync_shared_state(signal_store)
+    if leader_lock.try_acquire():
+        await become_leader(initial_scan=False)
+    else:
+        print(f"👥 Worker {os.getpid()} serves reads; scans run in worker {leader_lock.holder()}")
+        follower.start()
+    startup_report.update({
+        "role": "leader" if leader_lock.held else "follower",
+        "ready_seconds": round(time.perf_counter() - BOOT_STARTED, 3),
+        "restored_snapshot_version": snapshots.current.version,
+        "restored_signals": len(snapshots.current.signals),
+    })
+    print(f"🚀 Ready in {startup_report['ready_seconds']}s, serving {startup_report['restored_signals']} "
+          f"restored signals (snapshot v{startup_report['restored_snapshot_version']}); warming up in the background")
+    asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def stop_executor():
+    await follower.stop()
+    await scan_scheduler.stop()
+    await price_tracker.stop()
+    await notification_dispatcher.stop()
+    analysis_executor.shutdown()
+    signal_store.close()
+    leader_lock.release()
 
 @app.get("/")
 def home():
     return {"message": "Crypto Signals Backend is Running"}
 
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus metrics (text exposition format).
+    """
+    return Response(content=instrumentation.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health")
+def health():
+    """
+    Data source health: per-exchange circuit state, latency and error rate,
+    plus the startup report and the scan schedule.
+    Responds 503 when no exchange can serve requests.
+    """
+    report = data_source_health()
+    return JSONResponse({**report, "startup": startup_report, "scans": scan_scheduler.status()},
+                        status_code=503 if report['status'] == "down" else 200)
+
+def snapshot_response(request: Request, snapshot, etag: str, body: bytes, media_type: str = "application/json"):
+    """
+    Serves a pre-encoded body of `snapshot`, compressed if the client accepts
+    it, or 304 if the client already has this version.
+    """
+    encoding = None
+    if len(body) >= negotiation.COMPRESS_MIN_SIZE:
+        encoding = negotiation.choose_encoding(request.headers.get("accept-encoding"))
+    if encoding:
+        # Each representation gets its own ETag
+        etag = f'{etag[:-1]}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+    if snapshots.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        body = snapshot.compressed(etag, body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
 @app.get("/signals")
-def get_signals():
+def get_signals(request: Request):
     """
     Returns the current active signals.
     """
-    return {
-        "count": len(latest_signals),
-        "signals": latest_signals
-    }
+    snapshot = snapshots.current
+    return snapshot_response(request, snapshot, snapshot.signals_etag, snapshot.signals_body)
+
+@app.get("/signals/stream")
+def stream_signals(request: Request, last_event_id: int = None):
+    """
+    Server-Sent Events: the current signals on connect, then only changes
+    ("signals", "tp1_hit", "tp2_hit", "exit"). Reconnecting clients send
+    Last-Event-ID (or ?last_event_id=) to resume where they left off.
+    """
+    header_id = events.parse_last_event_id(request.headers.get("last-event-id"))
+    return StreamingResponse(
+        events.broadcaster.stream(header_id if header_id is not None else last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/history")
-def get_history():
+def get_history(limit: int = 50, cursor: int = None, symbol: str = None, status: str = None,
+                since: str = None, until: str = None):
     """
-    Returns the history of all signals generated.
+    Returns the history of all signals generated (last 50 by default).
+    Filter by symbol, status and time range (epoch seconds or ISO 8601);
+    pass `next_cursor` back as `cursor` to page further back.
+    `count` is the number of signals matching the filters.
     """
+    try:
+        since, until = parse_time(since), parse_time(until)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since/until must be epoch seconds or ISO 8601")
+    history, next_cursor = signal_store.history(
+        limit=limit,
+        cursor=cursor,
+        symbol=symbol,
+        status=status,
+        since=since,
+        until=until,
+    )
     return {
-        "count": len(signal_history),
-        "history": signal_history[-50:] # Return last 50
+        "count": signal_store.count(symbol=symbol, status=status, since=since, until=until),
+        "history": history,
+        "next_cursor": next_cursor
     }
 
 @app.post("/scan")
-async def trigger_scan(background_tasks: BackgroundTasks):
+async def trigger_scan(request: Request, profile: bool = False, symbols: str = None):
     """
     Manually trigger a scan (useful for testing).
+    ?symbols=BTC/USDT,ETH/USDT rescans only those coins. A trigger joins the
+    running scan if that one covers it, otherwise the next one ("queued").
+    With ?profile=true the scan is profiled (admin only, like /admin/profiles/next);
+    download it from /admin/profiles/{profile_id}.
     """
-    background_tasks.add_task(run_market_scan)
-    return {"message": "Scan started in background"}
+    if profile:
+        require_admin(request)
+    require_leader()
+    if symbols is not None:
+        symbols = {s.strip().upper() for s in symbols.split(",") if s.strip()}
+        if not symbols:
+            raise HTTPException(status_code=400, detail="No symbols given")
+    if profile and scan_profiler.active_id is not None:
+        raise HTTPException(status_code=409, detail=f"Profile {scan_profiler.active_id} is still running")
+    scan = scan_scheduler.request(symbols, profile_id=new_profile_id() if profile else None)
+    state = "running" if scan is scan_scheduler.running else "queued"
+    response = {"message": f"Scan {state}", "state": state, "scan": scan.describe()}
+    if scan.profile_id:
+        response["profile_id"] = scan.profile_id
+    return response
 
-from datetime import datetime, timezone
+def require_leader():
+    if not leader_lock.held:
+        raise HTTPException(status_code=409, detail=f"Scans run in worker {leader_lock.holder()}; retry the request")
 
-def get_time_ago(timestamp_str):
-    try:
-        # Parse timestamp (assuming ISO format from isoformat())
-        # If timestamp is already a datetime object, use it directly
-        if isinstance(timestamp_str, str):
-            signal_time = datetime.fromisoformat(timestamp_str)
-        else:
-            signal_time = timestamp_str
-            
-        now = datetime.now(timezone.utc)
-        # Ensure signal_time is timezone-aware
-        if signal_time.tzinfo is None:
-            signal_time = signal_time.replace(tzinfo=timezone.utc)
-            
-        diff = now - signal_time
-        minutes = int(diff.total_seconds() / 60)
-        
-        if minutes < 1:
-            return "Just now"
-        elif minutes < 60:
-            return f"{minutes}m ago"
-        elif minutes < 1440:
-            return f"{minutes // 60}h ago"
-        else:
-            return f"{minutes // 1440}d ago"
-    except Exception as e:
-        print(f"Error calculating time_ago: {e}")
-        return "Just now"
+def require_admin(request: Request):
+    # Profiles expose code paths and memory contents: without a token the admin endpoints are off
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    """
+    Stored scan profiles, newest first.
+    """
+    require_admin(request)
+    return {"profiles": scan_profiler.list(), "formats": list(CAPTURE_FILES)}
+
+@app.post("/admin/profiles/next")
+def profile_next_scheduled_scan(request: Request):
+    """
+    Profiles the next scheduled scan.
+    """
+    global profile_next_scan
+    require_admin(request)
+    require_leader()
+    profile_next_scan = True
+    return {"message": "The next scheduled scan will be profiled"}
+
+@app.get("/admin/profiles/{profile_id}")
+def download_profile(request: Request, profile_id: str, format: str = "pstats"):
+    """
+    Downloads one capture file: pstats, collapsed (flamegraph stacks),
+    allocations (top tracemalloc sites), tracemalloc (raw snapshot) or meta.
+    """
+    require_admin(request)
+    path = scan_profiler.file_path(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Unknown profile or format")
+    filename, media_type = CAPTURE_FILES[format]
+    return FileResponse(path, media_type=media_type, filename=f"{profile_id}-{filename}")
 
 @app.get("/android/signals")
-def get_android_signals():
+def get_android_signals(request: Request):
     """
     Optimized endpoint for Android App.
     Returns signals with formatted strings ready for UI display.
+    The body is pre-encoded per scan; only "time_ago" is refreshed (once a minute).
+    With "Accept: application/x-msgpack" it returns the compact MessagePack
+    feed instead (snapshots.ANDROID_COMPACT_FIELDS), encoded once per scan.
     """
-    android_signals = []
-    for s in latest_signals:
-        coin = s['symbol'].split('/')[0]
-        image_url = f"https://lcw.nyc3.cdn.digitaloceanspaces.com/production/currencies/64/{coin.lower()}.png"
-
-        android_signals.append({
-            "id": f"{s['symbol']}-{s['timestamp']}",
-            "coin": coin,
-            "pair": s['symbol'],
-            "price": f"${s['price']:.2f}",
-            "image_url": image_url,
-            "score_value": s['score'],
-            "score_color": "#00C853" if s['score'] >= 80 else "#FFAB00", # Green for Strong, Amber for Medium
-            "status_text": s['status'],
-            "entry": s['trade_setup']['entry_zone'],
-            "targets": f"TP1: {s['trade_setup']['target_1']:.2f} | TP2: {s['trade_setup']['target_2']:.2f}",
-            "stop_loss": f"Exit: {s['trade_setup']['stop_loss']:.2f}",
-            "time_ago": get_time_ago(s['timestamp'])
-        })
-    
-    return {
-        "status": "success",
-        "data": android_signals
-    }
+    snapshot = snapshots.current
+    if negotiation.wants_msgpack(request.headers.get("accept")):
+        etag, body = snapshot.android_compact_body()
+        return snapshot_response(request, snapshot, etag, body, media_type="application/x-msgpack")
+    etag, body = snapshot.android_body()
+    return snapshot_response(request, snapshot, etag, body)
 
 @app.post("/test-notification")
 def test_notification():
@@ -378,4 +712,4 @@ def test_notification():
         
     send_fcm_notification('signals_en', 'Test Notification', 'This is a test message from your Crypto Server (English).')
     send_fcm_notification('signals_ar', 'إشعار تجريبي', 'هذه رسالة تجريبية من سيرفر الكريبتو الخاص بك (عربي).')
-    return {"status": "success", "message": "Test notifications sent to signals_en and signals_ar"}
\ No newline at end of file
+    return {"status": "success", "message": "Test notifications queued for signals_en and signals_ar"}
\ No newline at end of file
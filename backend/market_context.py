@@ -0,0 +1,128 @@
+"""
+Market context shared by every symbol of a scan.
+
+Computed once per scan from the benchmark candles (BTC/USDT, plus e.g.
+ETH/USDT via CORRELATION_BENCHMARKS), which are fetched with the full
+SCAN_CANDLES history and then reused for those symbols' own analysis, so
+nothing is fetched twice:
+- the BTC trend (price vs. EMA200 on the same history the scan uses)
+- rolling correlation and beta of every scanned symbol against each
+  benchmark over the last CORRELATION_WINDOW 1h log returns, computed for
+  all symbols at once on a (symbols x window) matrix
+The bearish-BTC filter then only applies to coins that actually move with
+BTC (correlation >= BTC_FOLLOW_CORRELATION) instead of to every coin.
+"""
+import asyncio
+import os
+
+import numpy as np
+
+from candles import CandleView
+from market_data import closed_candles, fetch_candles
+
+BTC_SYMBOL = 'BTC/USDT'
+CORRELATION_BENCHMARKS = [s.strip() for s in os.getenv("CORRELATION_BENCHMARKS", BTC_SYMBOL).split(",") if s.strip()]
+if BTC_SYMBOL not in CORRELATION_BENCHMARKS:
+    CORRELATION_BENCHMARKS.insert(0, BTC_SYMBOL) # the trend filter always needs BTC
+CORRELATION_WINDOW = int(os.getenv("CORRELATION_WINDOW", "168")) # 1h returns: one week
+BTC_FOLLOW_CORRELATION = float(os.getenv("BTC_FOLLOW_CORRELATION", "0.5"))
+
+def aligned_closes(candles_by_symbol: dict, timestamps: np.ndarray):
+    """
+    (symbols x len(timestamps)) matrix of closes at `timestamps`, NaN where a symbol has no candle.
+    """
+    closes = np.full((len(candles_by_symbol), len(timestamps)), np.nan)
+    for row, candles in enumerate(candles_by_symbol.values()):
+        if not len(candles):
+            continue
+        index = np.minimum(np.searchsorted(candles.timestamp, timestamps), len(candles) - 1)
+        found = candles.timestamp[index] == timestamps
+        closes[row, found] = candles.close[index[found]]
+    return closes
+
+def correlation_beta(returns: np.ndarray, benchmark: np.ndarray, min_periods: int):
+    """
+    Correlation and beta of each row of `returns` against `benchmark`,
+    using only the periods where both are known. NaN below `min_periods`.
+    """
+    valid = np.isfinite(returns) & np.isfinite(benchmark)
+    count = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = np.where(valid, returns, 0.0)
+        y = np.where(valid, benchmark, 0.0)
+        x = np.where(valid, x - x.sum(axis=1, keepdims=True) / count[:, None], 0.0)
+        y = np.where(valid, y - y.sum(axis=1, keepdims=True) / count[:, None], 0.0)
+        covariance = (x * y).sum(axis=1)
+        variance_x = (x * x).sum(axis=1)
+        variance_y = (y * y).sum(axis=1)
+        correlation = covariance / np.sqrt(variance_x * variance_y)
+        beta = covariance / variance_y
+    too_short = count < min_periods
+    correlation[too_short] = np.nan
+    beta[too_short] = np.nan
+    return correlation, beta
+
+def _value(x):
+    return round(float(x), 3) if np.isfinite(x) else None
+
+class MarketContext:
+    """
+    `benchmarks` is {symbol: CandleView}; correlate() fills `correlation`
+    and `beta` as {benchmark: {symbol: value or None}}.
+    """
+    def __init__(self, btc_trend: str = "NEUTRAL", benchmarks: dict = None, window: int = CORRELATION_WINDOW):
+        self.btc_trend = btc_trend
+        self.benchmarks = benchmarks or {}
+        self.window = window
+        self.correlation = {}
+        self.beta = {}
+
+    def correlate(self, candles_by_symbol: dict):
+        """
+        Rolling correlation/beta of every symbol against every benchmark, at the latest candle.
+        """
+        symbols = list(candles_by_symbol)
+        for benchmark, candles in self.benchmarks.items():
+            if len(candles) < 2 or not symbols:
+                continue
+            timestamps = candles.timestamp[-(self.window + 1):]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                returns = np.diff(np.log(aligned_closes(candles_by_symbol, timestamps)), axis=1)
+                benchmark_returns = np.diff(np.log(candles.close[-(self.window + 1):].astype(np.float64)))
+            correlation, beta = correlation_beta(returns, benchmark_returns, min_periods=self.window // 2)
+            self.correlation[benchmark] = {s: _value(c) for s, c in zip(symbols, correlation)}
+            self.beta[benchmark] = {s: _value(b) for s, b in zip(symbols, beta)}
+
+    def for_symbol(self, symbol: str):
+        """
+        The context one symbol is scored with (see analysis.add_market_context).
+        """
+        return {
+            "btc_trend": self.btc_trend,
+            "correlation": {b: values.get(symbol) for b, values in self.correlation.items()},
+            "beta": {b: values.get(symbol) for b, values in self.beta.items()},
+        }
+
+def follows_btc(market: dict):
+    """
+    Whether the BTC trend filter applies: unknown correlation counts as following BTC.
+    """
+    correlation = (market or {}).get("correlation", {}).get(BTC_SYMBOL)
+    return correlation is None or correlation >= BTC_FOLLOW_CORRELATION
+
+async def load(limit: int):
+    """
+    Fetches the benchmarks once and computes the BTC trend, on closed candles only.
+    """
+    from analysis import candle_indicators # keeps pandas out of the API's startup imports
+    fetched = await asyncio.gather(*(fetch_candles(s, '1h', limit=limit) for s in CORRELATION_BENCHMARKS))
+    benchmarks = {s: closed_candles(candles) for s, candles in zip(CORRELATION_BENCHMARKS, fetched) if len(candles)}
+    btc_trend = "NEUTRAL"
+    btc = benchmarks.get(BTC_SYMBOL, CandleView.empty())
+    if len(btc):
+        indicators, _ = candle_indicators(BTC_SYMBOL, btc, timeframes=())
+        if btc.close[-1] > indicators['EMA_200']:
+            btc_trend = "BULLISH"
+        elif btc.close[-1] < indicators['EMA_200']:
+            btc_trend = "BEARISH"
+    return MarketContext(btc_trend, benchmarks)
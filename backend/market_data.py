@@ -1,45 +1,197 @@
-import ccxt.async_support as ccxt
-import pandas as pd
 import asyncio
+import os
+import zlib
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
+import instrumentation
+from instrumentation import stage
+from candles import CandleBuffer, CandleView
 
-# Initialize Exchange (Using Binance as requested)
-exchange = ccxt.binance({
-    'enableRateLimit': True,
-    'timeout': 30000,
-})
+# Where candles come from: "exchange" (the EXCHANGES pool, see exchange_pool.py),
+# or offline "replay" (recorded files, see exchange_adapters.ReplayExchange) / "synthetic" (generated)
+DATA_SOURCE = os.getenv("DATA_SOURCE", "exchange")
+REPLAY_LATENCY = float(os.getenv("REPLAY_LATENCY", "0")) # seconds added to each offline call
 
-# Flag to track if we are in simulation mode to avoid spamming logs
-USE_SIMULATION_MODE = False
+# Exchanges (Binance first, then the fallbacks in EXCHANGES), or the offline source.
+# Created on first use by get_exchange(), so importing this module stays cheap.
+exchange = None
+
+# Set to make generated (synthetic) data reproducible
+MOCK_DATA_SEED = int(os.environ["MOCK_DATA_SEED"]) if os.getenv("MOCK_DATA_SEED") else None
+
+# Fetch stage tuning
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "10"))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+FETCH_RETRY_DELAY = float(os.getenv("FETCH_RETRY_DELAY", "1.0")) # seconds, doubled on each retry
+
+# Candle cache: only candles newer than the last cached one are downloaded
+CANDLE_CACHE_MAX_LENGTH = int(os.getenv("CANDLE_CACHE_MAX_LENGTH", "1000"))
+candle_cache = {} # format: {(symbol, timeframe): CandleBuffer} (see candles.py)
+
+def get_exchange():
+    """
+    The data source client; ccxt is imported and the clients are built on the first call.
+    """
+    global exchange
+    if exchange is None:
+        if DATA_SOURCE == "exchange":
+            from exchange_pool import ExchangePool
+            exchange = ExchangePool.from_names()
+        else:
+            exchange = create_offline_exchange(DATA_SOURCE)
+            print(f"🧪 Using offline data source: {DATA_SOURCE}")
+    return exchange
+
+async def fetch_candles(symbol: str, timeframe: str = '1h', limit: int = 100):
+    """
+    Fetches the last `limit` candles of a symbol.
+    Returns a CandleView: zero-copy arrays into the candle cache (empty on failure).
+    """
+    with stage("fetch"):
+        try:
+            # Try fetching real data (incrementally, through the candle cache)
+            return await _fetch_cached(symbol, timeframe, limit)
+        except Exception as e:
+            # No fake data: the symbol is skipped this time and /health shows why
+            print(f"⚠️ Error fetching {symbol}: {type(e).__name__}: {e}")
+            instrumentation.inc("fetch_failures_total")
+            return CandleView.empty()
+
+def closed_candles(candles, timeframe: str = '1h'):
+    """
+    The candles without the newest one while it is still forming (by the data
+    source's clock). A scan right after a close then scores the candle that
+    just closed, not the one that opened seconds ago with almost no volume.
+    """
+    if not len(candles):
+        return candles
+    exchange = get_exchange()
+    if candles.timestamp[-1] + exchange.parse_timeframe(timeframe) * 1000 > exchange.milliseconds():
+        return candles.without_last()
+    return candles
 
 async def fetch_ohlcv(symbol: str, timeframe: str = '1h', limit: int = 100):
     """
     Fetches OHLCV data for a symbol.
-    Returns a pandas DataFrame.
+    Returns a pandas DataFrame (a copy; the scan itself uses fetch_candles).
+    """
+    return (await fetch_candles(symbol, timeframe, limit)).to_frame()
+
+async def _fetch_cached(symbol: str, timeframe: str, limit: int):
+    """
+    Returns the last `limit` candles, downloading only what the cache is missing.
+    The newest cached candle is usually still forming, so it is always re-fetched
+    (via since=) and replaced. If the pool served the new candles from another
+    venue than the cached ones (volumes and prices differ between venues), the
+    history is fetched again in full from the new venue.
+    """
+    key = (symbol, timeframe)
+    buffer = candle_cache.get(key)
+    exchange = get_exchange()
+
+    if buffer is not None and len(buffer) >= limit:
+        last_timestamp = buffer.last_timestamp
+        timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+        missing = (exchange.milliseconds() - last_timestamp) // timeframe_ms + 1
+        # After a long pause a single page can't close the gap: fall through to a full fetch
+        if missing < limit:
+            rows = await _fetch_with_retry(symbol, timeframe, int(missing) + 1, since=last_timestamp)
+            if _source(symbol) == buffer.source:
+                buffer.merge(rows)
+                return buffer.view(limit)
+
+    ohlcv = await _fetch_with_retry(symbol, timeframe, limit)
+    capacity = max(CANDLE_CACHE_MAX_LENGTH, limit)
+    if buffer is None or buffer.capacity < capacity:
+        buffer = candle_cache[key] = CandleBuffer(capacity)
+    else:
+        buffer.clear()
+    buffer.merge(ohlcv)
+    buffer.source = _source(symbol)
+    return buffer.view(limit)
+
+def _source(symbol: str):
+    """
+    Name of the venue that served the last request for `symbol` (None for offline sources).
+    """
+    venue = getattr(get_exchange(), 'routes', {}).get(symbol)
+    return venue.name if venue is not None else None
+
+def merge_candles(cached, new_rows, max_length: int):
+    """
+    Appends new candles to the cached ones.
+    Cached candles at or after the first new timestamp are replaced, and the
+    oldest candles are evicted beyond max_length.
+    """
+    if not new_rows:
+        return cached
+    first_new = new_rows[0][0]
+    keep = len(cached)
+    while keep and cached[keep - 1][0] >= first_new:
+        keep -= 1
+    return (cached[:keep] + list(new_rows))[-max_length:]
+
+async def _with_retry(request):
+    """
+    Awaits request(), retrying transient network errors with exponential backoff.
+    """
+    import ccxt.async_support as ccxt
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            return await request()
+        except ccxt.NetworkError:
+            # With every exchange's circuit open, waiting here won't help
+            if attempt == FETCH_RETRIES or not getattr(get_exchange(), 'available', lambda: True)():
+                raise
+            await asyncio.sleep(FETCH_RETRY_DELAY * (2 ** attempt))
+
+async def _fetch_with_retry(symbol: str, timeframe: str, limit: int, since: int = None):
+    return await _with_retry(lambda: get_exchange().fetch_ohlcv(symbol, timeframe, since=since, limit=limit))
+
+async def fetch_candles_many(symbols, timeframe: str = '1h', limit: int = 100, concurrency: int = None):
+    """
+    Fetches candles for many symbols concurrently.
+    At most `concurrency` requests are in flight at once.
+    Yields (symbol, CandleView) pairs in completion order, so callers can
+    start analyzing the first results while slower symbols are still loading.
     """
-    global USE_SIMULATION_MODE
-    
-    if USE_SIMULATION_MODE:
-        return generate_mock_data(symbol, limit)
+    semaphore = asyncio.Semaphore(concurrency or FETCH_CONCURRENCY)
 
+    async def _fetch(symbol):
+        async with semaphore:
+            return symbol, await fetch_candles(symbol, timeframe, limit)
+
+    tasks = [asyncio.create_task(_fetch(symbol)) for symbol in symbols]
     try:
-        # Try fetching real data
-        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        
-        # Convert timestamp to datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        
-        return df
-    except Exception as e:
-        # Check if it's a connection error
-        print(f"⚠️ Network Error fetching {symbol}. Switching to SIMULATION MODE.")
-        # print(f"Debug Error: {e}") # Uncomment for debugging
-        USE_SIMULATION_MODE = True
-        return generate_mock_data(symbol, limit)
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Consumer stopped early (or failed): don't leave requests running
+        for task in tasks:
+            task.cancel()
+
+async def fetch_ticker_stats(symbols):
+    """
+    Fetches the 24h ticker (last, high, low, percentage, quoteVolume, ...) of
+    many symbols with one bulk request. Returns {symbol: ticker}.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    return await _with_retry(lambda: get_exchange().fetch_tickers(symbols))
+
+async def fetch_prices(symbols):
+    """
+    Fetches the last traded price of many symbols with one bulk ticker request.
+    Returns {symbol: price}; symbols the exchange has no price for are left out.
+    """
+    with stage("fetch_prices"):
+        tickers = await fetch_ticker_stats(symbols)
+    return {
+        symbol: float(ticker['last'])
+        for symbol, ticker in tickers.items()
+        if ticker.get('last') is not None
+    }
 
 # Base prices for simulation (approximate)
 MOCK_PRICES = {
@@ -55,37 +207,130 @@ MOCK_PRICES = {
     'INJ/USDT': 35, 'IMX/USDT': 3.0, 'GALA/USDT': 0.03, 'SNX/USDT': 3.5, 'CRV/USDT': 0.55
 }
 
-def generate_mock_data(symbol: str, limit: int):
+def generate_mock_data(symbol: str, limit: int, seed: int = None, drift: float = 0.0001,
+                       volatility: float = 0.005, regimes=None, end: datetime = None):
     """
     Generates synthetic bullish data to test the analyzer.
+    Prices follow a random walk whose per-candle change is N(drift, volatility)
+    times the current price, as in the original loop.
+    `regimes` splits the series into segments with their own behaviour, as
+    [(weight, drift, volatility), ...] where weights are relative lengths.
+    The same seed (and symbol) always produces the same prices.
     """
-    dates = [datetime.now() - timedelta(hours=x) for x in range(limit)]
-    dates.reverse()
-    
+    import pandas as pd
+    if seed is None:
+        rng = np.random.default_rng()
+    else:
+        rng = np.random.default_rng([int(seed), zlib.crc32(symbol.encode())])
+
+    if regimes:
+        weights = np.array([r[0] for r in regimes], dtype=float)
+        lengths = np.floor(weights / weights.sum() * limit).astype(int)
+        lengths[-1] = limit - lengths[:-1].sum()
+        drifts = np.repeat([r[1] for r in regimes], lengths)
+        volatilities = np.repeat([r[2] for r in regimes], lengths)
+    else:
+        drifts, volatilities = drift, volatility
+
     # Get base price for the specific coin
     base_price = MOCK_PRICES.get(symbol, 100) # Default 100 if unknown
-    
-    prices = []
-    for i in range(limit):
-        # Smaller increments relative to price
-        change = np.random.normal(loc=0.0001 * base_price, scale=0.005 * base_price)
-        base_price += change
-        # Ensure price doesn't go negative
-        base_price = max(0.000001, base_price)
-        prices.append(base_price)
-    
+    # Same walk as the original per-candle loop, whose step was
+    # normal(loc=drift * price, scale=volatility * price) added to the current
+    # price: that is price * (1 + normal(drift, volatility)), so a cumprod
+    returns = rng.normal(loc=drifts, scale=volatilities, size=limit)
+    # Ensure price doesn't go negative
+    prices = np.maximum(base_price * np.cumprod(1 + returns), 0.000001)
+
     # Ensure the end is strong but not crazy
-    prices[-1] = prices[-2] * 1.002 # 0.2% jump
-    
+    if limit > 1:
+        prices[-1] = prices[-2] * 1.002 # 0.2% jump
+
+    dates = pd.date_range(end=end or datetime.now(), periods=limit, freq='h')
     df = pd.DataFrame({
         'timestamp': dates,
         'open': prices,
-        'high': [p * 1.005 for p in prices],
-        'low': [p * 0.995 for p in prices],
+        'high': prices * 1.005,
+        'low': prices * 0.995,
         'close': prices,
-        'volume': [1000 + x*10 for x in range(limit)]
+        'volume': 1000 + 10 * np.arange(limit)
     })
     return df
 
+# --- RECORDED DATA ---
+# Candles stored locally as float64 .npy arrays of shape (n, 6):
+# [timestamp_ms, open, high, low, close, volume], one file per (symbol, timeframe).
+RECORDED_DATA_DIR = os.getenv("RECORDED_DATA_DIR", "data/ohlcv")
+
+def recorded_ohlcv_path(symbol: str, timeframe: str, data_dir: str = None):
+    return os.path.join(data_dir or RECORDED_DATA_DIR, f"{symbol.replace('/', '_')}-{timeframe}.npy")
+
+def save_recorded_ohlcv(symbol: str, timeframe: str, candles, data_dir: str = None):
+    path = recorded_ohlcv_path(symbol, timeframe, data_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, np.asarray(candles, dtype=np.float64).reshape(-1, 6))
+    return path
+
+def load_recorded_ohlcv(symbol: str, timeframe: str, data_dir: str = None, mmap: bool = True):
+    """
+    Loads recorded candles; memory-mapped by default so nothing is read until used.
+    """
+    return np.load(recorded_ohlcv_path(symbol, timeframe, data_dir), mmap_mode='r' if mmap else None)
+
+def list_recorded_symbols(timeframe: str, data_dir: str = None):
+    suffix = f"-{timeframe}.npy"
+    data_dir = data_dir or RECORDED_DATA_DIR
+    if not os.path.isdir(data_dir):
+        return []
+    return sorted(
+        name[:-len(suffix)].replace('_', '/')
+        for name in os.listdir(data_dir) if name.endswith(suffix)
+    )
+
+async def download_history(symbol: str, timeframe: str, since: int, page_limit: int = 1000):
+    """
+    Downloads every candle from `since` (ms) until now, one page at a time.
+    Venues may cap a page below `page_limit`, so a short page doesn't mean the
+    end: it stops on an empty page or once `since` stops advancing.
+    """
+    rows = []
+    while True:
+        page = await _fetch_with_retry(symbol, timeframe, page_limit, since=since)
+        if not page:
+            break
+        rows = merge_candles(rows, page, len(rows) + len(page))
+        if page[-1][0] < since:
+            break
+        since = page[-1][0] + 1
+    return rows
+
+async def fetch_markets():
+    """
+    Market metadata ({symbol: market}) of every exchange in the data source.
+    """
+    return await _with_retry(lambda: get_exchange().load_markets())
+
+def data_source_health():
+    """
+    Health of the data source: the exchange pool's report, or the offline source in use.
+    """
+    if exchange is None:
+        return {"source": DATA_SOURCE, "status": "ok", "connected": False}
+    if hasattr(exchange, 'health'):
+        return {"source": DATA_SOURCE, **exchange.health()}
+    return {"source": DATA_SOURCE, "status": "ok"}
+
 async def close_exchange():
-    await exchange.close()
+    if exchange is not None:
+        await exchange.close()
+
+def create_offline_exchange(source: str):
+    """
+    Builds the offline exchange stand-in for DATA_SOURCE=replay|synthetic.
+    """
+    import exchange_adapters
+    if source == "replay":
+        return exchange_adapters.ReplayExchange(latency=REPLAY_LATENCY)
+    if source == "synthetic":
+        seed = MOCK_DATA_SEED if MOCK_DATA_SEED is not None else 42
+        return exchange_adapters.SyntheticExchange(seed=seed, latency=REPLAY_LATENCY)
+    raise ValueError(f"Unknown DATA_SOURCE: {source}")
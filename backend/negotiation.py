@@ -0,0 +1,75 @@
+"""
+Content negotiation for the pre-encoded snapshot responses.
+
+- Accept: application/x-msgpack (or application/msgpack) selects the compact
+  MessagePack feed on /android/signals (snapshots.ANDROID_COMPACT_FIELDS);
+  anything else gets JSON.
+- Accept-Encoding: br (if the optional `brotli` package is installed) or
+  gzip compresses bodies of at least COMPRESS_MIN_SIZE bytes.
+Compressed bodies are cached on the snapshot (SignalSnapshot.compressed),
+so each representation is compressed once per scan (once per minute for
+the Android JSON), not per request.
+"""
+import gzip
+import os
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "512")) # bytes; smaller bodies aren't worth it
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "9"))
+MSGPACK_MEDIA_TYPES = ("application/x-msgpack", "application/msgpack", "application/vnd.msgpack")
+
+def _parse(header: str):
+    """
+    {token: q} of an Accept / Accept-Encoding header.
+    """
+    values = {}
+    for part in (header or "").split(","):
+        token, *params = [p.strip() for p in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        values[token.lower()] = q
+    return values
+
+def wants_msgpack(accept: str):
+    """
+    True if the client prefers MessagePack over JSON (and msgpack is installed).
+    """
+    if msgpack is None:
+        return False
+    accepted = _parse(accept)
+    msgpack_q = max((accepted.get(t, 0.0) for t in MSGPACK_MEDIA_TYPES), default=0.0)
+    json_q = accepted.get("application/json", 0.0)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+def choose_encoding(accept_encoding: str):
+    """
+    "br", "gzip" or None (identity), by the client's preference.
+    """
+    accepted = _parse(accept_encoding)
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    candidates = [(accepted.get(e, accepted.get("*", 0.0)), -i, e) for i, e in enumerate(available)]
+    q, _, encoding = max(candidates)
+    return encoding if q > 0 else None
+
+def compress(body: bytes, encoding: str):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the bytes identical for identical bodies
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
@@ -0,0 +1,164 @@
+"""
+Plans the push notifications of a scan (or of a price-tracking check).
+
+Events (new signal, TP1, TP2, exit, "+N%" update) are collected instead of
+being sent one by one, then flushed together:
+- duplicates are dropped: the same (symbol, kind) keeps only its latest
+  event, and an update is dropped when the same symbol also hit a target
+  or its exit
+- per symbol, signals and updates are pushed at most once every
+  NOTIFY_SYMBOL_COOLDOWN seconds; targets and exits always go out and
+  don't start the cooldown, so a new signal right after an exit is pushed
+- per topic, one signal/update message every NOTIFY_TOPIC_INTERVAL
+  seconds at most; events arriving sooner wait and go out together in the
+  next message. Targets and exits skip this limit: they go out with the
+  flush that planned them, in a digest of their own
+- each language topic gets one digest: the event itself if there is only
+  one, otherwise a summary with one line per event
+With NOTIFY_SYMBOL_TOPICS=1, every symbol's events also go to a per-symbol
+topic per language (e.g. "signals_en_BTC"), so a device can subscribe to
+just the coins it follows.
+"""
+import asyncio
+import os
+import re
+import time
+from contextlib import contextmanager
+
+import instrumentation
+
+NOTIFY_SYMBOL_COOLDOWN = float(os.getenv("NOTIFY_SYMBOL_COOLDOWN", "900")) # seconds
+NOTIFY_TOPIC_INTERVAL = float(os.getenv("NOTIFY_TOPIC_INTERVAL", "60")) # seconds
+NOTIFY_SYMBOL_TOPICS = os.getenv("NOTIFY_SYMBOL_TOPICS", "0") == "1"
+NOTIFY_DIGEST_LINES = int(os.getenv("NOTIFY_DIGEST_LINES", "10"))
+
+# Language -> topic of the devices using that language
+LANGUAGE_TOPICS = {"en": "signals_en", "ar": "signals_ar"}
+DIGEST_TITLES = {
+    "en": "📬 {count} Crypto Signal updates",
+    "ar": "📬 {count} تحديثات للعملات",
+}
+DIGEST_MORE = {"en": "+{count} more", "ar": "+{count} أخرى"}
+# Kinds that are never rate limited (per symbol or per topic) nor start the symbol cooldown, and that make an update of the same symbol redundant
+PRIORITY_KINDS = ("tp1", "tp2", "exit")
+
+def symbol_topic(topic: str, symbol: str):
+    """
+    Per-symbol topic name: "signals_en" + "BTC/USDT" -> "signals_en_BTC".
+    """
+    coin = symbol.split('/')[0]
+    return f"{topic}_{re.sub(r'[^a-zA-Z0-9-_.~%]', '', coin)}"
+
+class NotificationPlanner:
+    """
+    `send(topic, title, body)` delivers one message (e.g. through the NotificationDispatcher).
+    """
+    def __init__(self, send, symbol_cooldown: float = NOTIFY_SYMBOL_COOLDOWN,
+                 topic_interval: float = NOTIFY_TOPIC_INTERVAL, symbol_topics: bool = NOTIFY_SYMBOL_TOPICS,
+                 digest_lines: int = NOTIFY_DIGEST_LINES):
+        self.send = send
+        self.symbol_cooldown = symbol_cooldown
+        self.topic_interval = topic_interval
+        self.symbol_topics = symbol_topics
+        self.digest_lines = digest_lines
+        self.events = {} # {(symbol, kind): {language: (title, body)}}, in arrival order
+        self.waiting = {} # {topic: [(title, body), ...]} held back by the topic rate limit
+        self.last_symbol_push = {} # {symbol: time}
+        self.last_topic_push = {} # {topic: time}
+        self.collecting = 0
+        self._timer = None
+
+    def add(self, symbol: str, kind: str, texts: dict):
+        """
+        Records one event; `texts` is {language: (title, body)}.
+        """
+        key = (symbol, kind)
+        if key in self.events:
+            del self.events[key] # the latest one wins, at the end of the order
+            instrumentation.inc("notification_events_total", result="deduplicated")
+        self.events[key] = texts
+
+    @contextmanager
+    def collect(self):
+        """
+        Holds flushes until the block (a scan) ends, then sends everything at once.
+        """
+        self.collecting += 1
+        try:
+            yield self
+        finally:
+            self.collecting -= 1
+            self.flush()
+
+    def flush(self, now: float = None):
+        """
+        Plans and sends the collected events. Does nothing while a scan is collecting.
+        """
+        if self.collecting:
+            return
+        now = time.time() if now is None else now
+        priority, planned = self._plan(now)
+        for topic, messages in priority.items():
+            self.send(topic, *self._digest(topic, messages))
+        for topic, messages in planned.items():
+            self.waiting.setdefault(topic, []).extend(messages)
+        self._send_waiting(now)
+
+    def _plan(self, now: float):
+        """
+        Returns ({topic: messages} of targets and exits, {topic: messages} of the rest).
+        """
+        events, self.events = self.events, {}
+        priority_symbols = {symbol for symbol, kind in events if kind in PRIORITY_KINDS}
+        priority, planned = {}, {}
+        for (symbol, kind), texts in events.items():
+            if kind == "update" and symbol in priority_symbols:
+                instrumentation.inc("notification_events_total", result="deduplicated")
+                continue
+            if kind not in PRIORITY_KINDS:
+                last = self.last_symbol_push.get(symbol)
+                if last is not None and now - last < self.symbol_cooldown:
+                    instrumentation.inc("notification_events_total", result="rate_limited")
+                    continue
+                self.last_symbol_push[symbol] = now
+            instrumentation.inc("notification_events_total", result="planned")
+            messages = priority if kind in PRIORITY_KINDS else planned
+            for language, text in texts.items():
+                topic = LANGUAGE_TOPICS[language]
+                messages.setdefault(topic, []).append(text)
+                if self.symbol_topics:
+                    messages.setdefault(symbol_topic(topic, symbol), []).append(text)
+        return priority, planned
+
+    def _send_waiting(self, now: float):
+        retry_in = None
+        for topic in list(self.waiting):
+            wait = self.topic_interval - (now - self.last_topic_push.get(topic, -self.topic_interval))
+            if wait > 0:
+                retry_in = wait if retry_in is None else min(retry_in, wait)
+                continue
+            title, body = self._digest(topic, self.waiting.pop(topic))
+            self.last_topic_push[topic] = now
+            self.send(topic, title, body)
+        if retry_in is not None:
+            self._schedule(retry_in)
+
+    def _digest(self, topic: str, messages):
+        if len(messages) == 1:
+            return messages[0]
+        language = next((l for l, t in LANGUAGE_TOPICS.items() if topic == t or topic.startswith(f"{t}_")), "en")
+        lines = [title for title, _ in messages[:self.digest_lines]]
+        if len(messages) > self.digest_lines:
+            lines.append(DIGEST_MORE[language].format(count=len(messages) - self.digest_lines))
+        return DIGEST_TITLES[language].format(count=len(messages)), "\n".join(lines)
+
+    def _schedule(self, delay: float):
+        if self._timer is not None:
+            return
+        def fire():
+            self._timer = None
+            self.flush()
+        try:
+            self._timer = asyncio.get_running_loop().call_later(delay, fire)
+        except RuntimeError:
+            pass # no event loop (scripts): waiting messages go out with the next flush
@@ -0,0 +1,177 @@
+"""
+Non-blocking FCM notification dispatcher.
+
+The scan only enqueues messages. A background worker groups whatever is
+pending and sends it with one `send_each` call, retrying failed messages a
+bounded number of times before moving them to a dead-letter list.
+The messaging client is pluggable: FirebaseMessagingClient in production,
+FakeMessagingClient for tests and benchmarks.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+import instrumentation
+
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "500")) # FCM send_each accepts up to 500 messages
+NOTIFY_BATCH_WINDOW = float(os.getenv("NOTIFY_BATCH_WINDOW", "0.2")) # seconds to wait for more messages
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "3"))
+NOTIFY_RETRY_DELAY = float(os.getenv("NOTIFY_RETRY_DELAY", "2.0")) # seconds, doubled on each retry
+DEAD_LETTER_LIMIT = 1000
+
+class Notification:
+    __slots__ = ('topic', 'title', 'body', 'attempts')
+
+    def __init__(self, topic: str, title: str, body: str):
+        self.topic = topic
+        self.title = title
+        self.body = body
+        self.attempts = 0
+
+class MessagingClient:
+    """
+    Interface for sending a batch of notifications.
+    send_each() is blocking and returns one entry per notification:
+    None on success, or the exception that made it fail.
+    """
+    def send_each(self, notifications):
+        raise NotImplementedError
+
+class FirebaseMessagingClient(MessagingClient):
+    def __init__(self):
+        self._messaging = None
+
+    @property
+    def messaging(self):
+        # Imported on the first send, not at startup
+        if self._messaging is None:
+            from firebase_admin import messaging
+            self._messaging = messaging
+        return self._messaging
+
+    def send_each(self, notifications):
+        messages = [
+            self.messaging.Message(
+                notification=self.messaging.Notification(title=n.title, body=n.body),
+                topic=n.topic,
+            )
+            for n in notifications
+        ]
+        response = self.messaging.send_each(messages)
+        return [None if r.success else r.exception for r in response.responses]
+
+class FakeMessagingClient(MessagingClient):
+    """
+    Records messages in memory instead of sending them.
+    `latency` simulates the HTTPS round-trip; `fail_every` fails every Nth message.
+    """
+    def __init__(self, latency: float = 0.0, fail_every: int = 0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.sent = []
+        self.calls = 0
+        self._count = 0
+
+    def send_each(self, notifications):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        results = []
+        for n in notifications:
+            self._count += 1
+            if self.fail_every and self._count % self.fail_every == 0:
+                results.append(RuntimeError("simulated FCM failure"))
+            else:
+                self.sent.append((n.topic, n.title, n.body))
+                results.append(None)
+        return results
+
+class NotificationDispatcher:
+    def __init__(self, client: MessagingClient, batch_size: int = NOTIFY_BATCH_SIZE,
+                 batch_window: float = NOTIFY_BATCH_WINDOW, max_retries: int = NOTIFY_MAX_RETRIES,
+                 retry_delay: float = NOTIFY_RETRY_DELAY):
+        self.client = client
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queue = asyncio.Queue()
+        self.dead_letters = deque(maxlen=DEAD_LETTER_LIMIT)
+        self.pending_retries = 0
+        self.worker = None
+
+    def enqueue(self, topic: str, title: str, body: str):
+        """
+        Queues a notification. Never blocks.
+        """
+        self.queue.put_nowait(Notification(topic, title, body))
+
+    def start(self):
+        if self.worker is None:
+            self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+    async def drain(self):
+        """
+        Waits until every queued notification was sent, retried out or dead-lettered.
+        """
+        while True:
+            await self.queue.join()
+            if not self.pending_retries:
+                return
+            await asyncio.sleep(0.05)
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            # Give the rest of the scan a moment to add to this batch
+            if self.batch_window:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self._send(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _send(self, batch):
+        start = time.perf_counter()
+        try:
+            results = await asyncio.to_thread(self.client.send_each, batch)
+        except Exception as e:
+            results = [e] * len(batch)
+        instrumentation.record("notification", time.perf_counter() - start)
+
+        for notification, error in zip(batch, results):
+            if error is None:
+                print(f"🚀 FCM Sent to {notification.topic}: {notification.title}")
+                instrumentation.inc("notifications_total", result="sent")
+                continue
+            notification.attempts += 1
+            if notification.attempts > self.max_retries:
+                print(f"❌ FCM Error ({notification.topic}), giving up: {error}")
+                self.dead_letters.append((notification, repr(error)))
+                instrumentation.inc("notifications_total", result="dead_letter")
+            else:
+                self._retry_later(notification)
+                instrumentation.inc("notifications_total", result="retry")
+
+    def _retry_later(self, notification):
+        delay = self.retry_delay * (2 ** (notification.attempts - 1))
+        self.pending_retries += 1
+
+        def requeue():
+            self.pending_retries -= 1
+            self.queue.put_nowait(notification)
+
+        asyncio.get_running_loop().call_later(delay, requeue)
@@ -0,0 +1,81 @@
+"""
+High-frequency tracking of active trades.
+
+Every TRACK_INTERVAL seconds the prices of all symbols with an open trade
+are fetched in one bulk ticker request and checked against TP1/TP2/stop
+loss, so target and exit alerts go out within seconds instead of waiting
+for the next market scan. The scan itself then only analyzes symbols
+without an active trade.
+"""
+import asyncio
+import os
+import time
+
+from instrumentation import stage
+from market_data import fetch_prices
+
+TRACK_INTERVAL = float(os.getenv("TRACK_INTERVAL", "5")) # seconds between price checks; 0 disables the loop
+
+class PriceTracker:
+    """
+    `symbols()` returns the symbols to watch, `track(symbol, price)` evaluates
+    one trade and returns True if it changed (e.g. a target was hit or it
+    closed); `on_changed(symbols)` is called after a check that changed
+    trades, so they can be persisted right away, and `on_checked()` after every check.
+    `fetch` can be swapped for another price feed.
+    """
+    def __init__(self, symbols, track, on_changed=None, on_checked=None, fetch=fetch_prices,
+                 interval: float = TRACK_INTERVAL):
+        self.symbols = symbols
+        self.track = track
+        self.on_changed = on_changed
+        self.on_checked = on_checked
+        self.fetch = fetch
+        self.interval = interval
+        self.last_check = None
+        self.worker = None
+
+    async def check(self):
+        """
+        Fetches current prices and evaluates every active trade once.
+        Returns the set of symbols whose trade changed (closed ones included).
+        """
+        symbols = list(self.symbols())
+        if not symbols:
+            return set()
+        try:
+            prices = await self.fetch(symbols)
+        except Exception as e:
+            print(f"⚠️ Price tracking failed: {e}")
+            return set()
+
+        changed = set()
+        with stage("tracking"):
+            for symbol in symbols:
+                price = prices.get(symbol)
+                if price is not None and self.track(symbol, price):
+                    changed.add(symbol)
+        self.last_check = time.time()
+        if changed and self.on_changed:
+            self.on_changed(changed)
+        if self.on_checked:
+            self.on_checked()
+        return changed
+
+    def start(self):
+        if self.worker is None and self.interval > 0:
+            self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
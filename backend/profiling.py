@@ -0,0 +1,166 @@
+"""
+On-demand profiling of single market scans.
+
+A profiled scan runs with, at the same time:
+- cProfile (deterministic), saved as scan.pstats (open with pstats/snakeviz)
+- a stack sampler on the event loop thread, saved as scan.collapsed
+  ("frame;frame;frame count" lines for flamegraph.pl / speedscope)
+- tracemalloc, saved as a raw snapshot plus the top allocation sites
+Captures are stored under PROFILE_DIR/<id>/ and only the newest PROFILE_KEEP
+are kept. Scans that aren't profiled run exactly as before: nothing here is
+touched unless a capture was asked for. cProfile and the sampler only see
+the event loop thread, so work done in analysis workers is not included.
+"""
+import cProfile
+import json
+import os
+import re
+import secrets
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005")) # seconds
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 50
+
+# Downloadable files per capture: format -> (file name, media type)
+CAPTURE_FILES = {
+    "pstats": ("scan.pstats", "application/octet-stream"),
+    "collapsed": ("scan.collapsed", "text/plain"),
+    "allocations": ("allocations.txt", "text/plain"),
+    "tracemalloc": ("tracemalloc.snapshot", "application/octet-stream"),
+    "meta": ("meta.json", "application/json"),
+}
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{6}$")
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack at a fixed interval and counts identical stacks.
+    """
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        super().__init__(name="scan-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def new_profile_id():
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{secrets.token_hex(3)}"
+
+class ScanProfiler:
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self.active_id = None # only one capture at a time: cProfile and tracemalloc are process-wide
+
+    async def run(self, scan, profile_id: str = None):
+        """
+        Awaits scan() under the profilers and saves the capture.
+        Returns the capture id, or None if another capture was already running
+        (the scan then runs unprofiled).
+        """
+        if self.active_id is not None:
+            print(f"⚠️ Profile {self.active_id} still running; this scan is not profiled")
+            await scan()
+            return None
+        profile_id = profile_id or new_profile_id()
+        self.active_id = profile_id
+
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident())
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        started = time.time()
+        wall = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            await scan()
+        finally:
+            profiler.disable()
+            sampler.stop()
+            duration = time.perf_counter() - wall
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracemalloc:
+                tracemalloc.stop()
+            self.active_id = None
+            self._save(profile_id, profiler, sampler, snapshot, {
+                "id": profile_id,
+                "started_at": started,
+                "duration_seconds": duration,
+                "samples": sum(sampler.stacks.values()),
+                "sample_interval": sampler.interval,
+                "tracemalloc_peak_bytes": peak,
+            })
+        print(f"🔬 Scan profile saved: {profile_id} ({duration:.2f}s)")
+        return profile_id
+
+    def _save(self, profile_id, profiler, sampler, snapshot, meta):
+        path = os.path.join(self.directory, profile_id)
+        os.makedirs(path, exist_ok=True)
+        profiler.dump_stats(os.path.join(path, CAPTURE_FILES["pstats"][0]))
+        with open(os.path.join(path, CAPTURE_FILES["collapsed"][0]), "w") as f:
+            f.write(sampler.collapsed())
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        snapshot.dump(os.path.join(path, CAPTURE_FILES["tracemalloc"][0]))
+        with open(os.path.join(path, CAPTURE_FILES["allocations"][0]), "w") as f:
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+        with open(os.path.join(path, CAPTURE_FILES["meta"][0]), "w") as f:
+            json.dump(meta, f, indent=2)
+        self._prune()
+
+    def _prune(self):
+        for old in self.list()[self.keep:]:
+            shutil.rmtree(os.path.join(self.directory, old["id"]), ignore_errors=True)
+
+    def list(self):
+        """
+        Metadata of the stored captures, newest first.
+        """
+        captures = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                meta_path = os.path.join(self.directory, name, CAPTURE_FILES["meta"][0])
+                if PROFILE_ID_PATTERN.match(name) and os.path.exists(meta_path):
+                    with open(meta_path) as f:
+                        captures.append(json.load(f))
+        return sorted(captures, key=lambda m: m["started_at"], reverse=True)
+
+    def file_path(self, profile_id: str, fmt: str):
+        """
+        Path of one capture file, or None if the id/format is unknown.
+        """
+        if fmt not in CAPTURE_FILES or not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = os.path.join(self.directory, profile_id, CAPTURE_FILES[fmt][0])
+        return path if os.path.exists(path) else None
@@ -0,0 +1,149 @@
+"""
+Scan scheduling aligned to candle closes.
+
+Scans fire SCAN_CLOSE_DELAY seconds after a candle of any of SCAN_TIMEFRAMES
+closes (closes shared by several timeframes fire once), so every scan sees a
+newly closed candle instead of re-analyzing the same one; the scan scores
+that closed candle and leaves out the one that just opened
+(market_data.closed_candles). At most one scan is in flight:
+- a request arriving while a scan runs joins it when that scan already
+  covers its symbols (manual triggers, partial rescans)
+- otherwise it is merged into the single pending scan, which starts as soon
+  as the running one finishes: full scans absorb partial ones, partial ones
+  are combined into one scan of all their symbols
+- a candle close always queues, since the running scan started before it
+A request returns a ScanRequest whose `done` event is set when the scan that
+covers it finishes.
+"""
+import asyncio
+import os
+import time
+
+import instrumentation
+from timeframes import WEEK_OFFSET_MS, timeframe_ms
+
+SCAN_TIMEFRAMES = [tf.strip() for tf in os.getenv("SCAN_TIMEFRAMES", "1h").split(",") if tf.strip()]
+SCAN_CLOSE_DELAY = float(os.getenv("SCAN_CLOSE_DELAY", "10")) # seconds after the close, while the exchange finalizes the candle
+
+def next_close_ms(now_ms: int, timeframes):
+    """
+    Epoch ms of the next candle close of any of `timeframes` after `now_ms`.
+    """
+    closes = []
+    for timeframe in timeframes:
+        size = timeframe_ms(timeframe)
+        offset = WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+        closes.append(now_ms - (now_ms - offset) % size + size)
+    return min(closes)
+
+class ScanRequest:
+    """
+    One scan to run: `symbols` is None for the whole universe, or the set of
+    symbols of a partial rescan.
+    """
+    def __init__(self, symbols=None, profile_id: str = None, reason: str = "manual"):
+        self.symbols = set(symbols) if symbols is not None else None
+        self.profile_id = profile_id
+        self.reasons = [reason]
+        self.requests = 1
+        self.started_at = None
+        self.done = asyncio.Event()
+
+    def covers(self, symbols):
+        return self.symbols is None or (symbols is not None and set(symbols) <= self.symbols)
+
+    def merge(self, symbols, profile_id: str, reason: str):
+        self.symbols = None if symbols is None or self.symbols is None else self.symbols | set(symbols)
+        self.profile_id = self.profile_id or profile_id
+        if reason not in self.reasons:
+            self.reasons.append(reason)
+        self.requests += 1
+
+    def describe(self):
+        return {
+            "symbols": sorted(self.symbols) if self.symbols is not None else None,
+            "profile_id": self.profile_id,
+            "reasons": self.reasons,
+            "requests": self.requests,
+            "started_at": self.started_at,
+        }
+
+class ScanScheduler:
+    """
+    `run(request)` performs one scan. `on_close()` is called at every candle
+    close (default: request a full scan); the owner can use it to decide
+    e.g. whether that scan is profiled.
+    """
+    def __init__(self, run, on_close=None, timeframes=SCAN_TIMEFRAMES, delay: float = SCAN_CLOSE_DELAY):
+        self.run = run
+        self.on_close = on_close or (lambda: self.request(reason="candle_close"))
+        self.timeframes = timeframes
+        self.delay = delay
+        self.running = None
+        self.pending = None
+        self.next_run = None # epoch seconds of the next candle-close scan
+        self.worker = None
+        self.runner = None
+
+    def request(self, symbols=None, profile_id: str = None, reason: str = "manual"):
+        """
+        Asks for a scan of `symbols` (None = everything). Returns the
+        ScanRequest that will cover it: the running scan or the pending one.
+        """
+        if (self.running is not None and reason != "candle_close" and profile_id is None
+                and self.running.covers(symbols)):
+            self.running.merge(symbols, None, reason)
+            instrumentation.inc("scans_coalesced_total")
+            return self.running
+        if self.pending is None:
+            self.pending = ScanRequest(symbols, profile_id, reason)
+        else:
+            self.pending.merge(symbols, profile_id, reason)
+            instrumentation.inc("scans_coalesced_total")
+        if self.runner is None:
+            self.runner = asyncio.create_task(self._drain())
+        return self.pending
+
+    async def _drain(self):
+        try:
+            while self.pending is not None:
+                self.running, self.pending = self.pending, None
+                self.running.started_at = time.time()
+                try:
+                    await self.run(self.running)
+                except Exception as e:
+                    print(f"⚠️ Scan failed: {e}")
+                finally:
+                    self.running.done.set()
+                    self.running = None
+        finally:
+            self.runner = None
+
+    def start(self):
+        if self.worker is None and self.timeframes:
+            self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self.worker, self.runner):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.worker = None
+        self.runner = None
+
+    async def _run(self):
+        while True:
+            self.next_run = next_close_ms(int(time.time() * 1000), self.timeframes) / 1000 + self.delay
+            await asyncio.sleep(max(0.0, self.next_run - time.time()))
+            self.on_close()
+
+    def status(self):
+        return {
+            "timeframes": self.timeframes,
+            "next_run": self.next_run,
+            "running": self.running.describe() if self.running is not None else None,
+            "pending": self.pending.describe() if self.pending is not None else None,
+        }
@@ -0,0 +1,109 @@
+"""
+Two-stage universe screening.
+
+Stage 1 (cheap): the universe is every active USDT spot pair in the
+exchanges' market metadata (refreshed every UNIVERSE_REFRESH seconds). One
+bulk 24h-ticker request prices all of them, and each pair is ranked by
+volume, volatility and momentum. Illiquid pairs are dropped.
+Stage 2 (expensive): only the top SCREENER_TOP_N pairs go through the full
+candle fetch + calculate_indicators/analyze_market_structure scan.
+"""
+import os
+import time
+
+import numpy as np
+
+import market_data
+
+SCREENER_TOP_N = int(os.getenv("SCREENER_TOP_N", "50"))
+SCREENER_MIN_VOLUME = float(os.getenv("SCREENER_MIN_VOLUME", "5000000")) # 24h quote volume (USDT)
+UNIVERSE_REFRESH = float(os.getenv("UNIVERSE_REFRESH", "21600")) # seconds between market metadata reloads
+QUOTE_CURRENCY = "USDT"
+# Rank weights: liquidity first, then how much and which way the pair is moving
+WEIGHTS = {"volume": 0.4, "volatility": 0.3, "momentum": 0.3}
+EXCLUDED_BASES = {"USDC", "FDUSD", "TUSD", "BUSD", "DAI", "USDP", "EUR", "GBP", "AEUR", "USD1"}
+
+def tradable_symbols(markets: dict, quote: str = QUOTE_CURRENCY):
+    """
+    Active spot pairs against `quote`, without stablecoin and fiat pairs.
+    """
+    symbols = []
+    for symbol, market in markets.items():
+        base = market.get('base') or symbol.split('/')[0]
+        if (market.get('quote') == quote and market.get('spot', True) and market.get('active') is not False
+                and base not in EXCLUDED_BASES):
+            symbols.append(symbol)
+    return sorted(symbols)
+
+def rank_candidates(tickers: dict, top_n: int = SCREENER_TOP_N, min_volume: float = SCREENER_MIN_VOLUME, exclude=()):
+    """
+    Ranks 24h tickers and returns the best `top_n` symbols, best first.
+    Each metric is turned into a percentile rank so they can be weighted together.
+    """
+    import pandas as pd
+    rows = []
+    for symbol, t in tickers.items():
+        last = t.get('last')
+        if symbol in exclude or not last:
+            continue
+        volume = t.get('quoteVolume')
+        if volume is None and t.get('baseVolume') is not None:
+            volume = t['baseVolume'] * last
+        change = t.get('percentage')
+        if change is None and t.get('open'):
+            change = (last - t['open']) / t['open'] * 100
+        high, low = t.get('high'), t.get('low')
+        rows.append((symbol, volume, (high - low) / last if high and low else None, change))
+
+    df = pd.DataFrame(rows, columns=['symbol', 'volume', 'volatility', 'momentum']).dropna()
+    df = df[df['volume'] >= min_volume]
+    if df.empty:
+        return []
+    score = (
+        WEIGHTS['volume'] * np.log(df['volume']).rank(pct=True)
+        + WEIGHTS['volatility'] * df['volatility'].rank(pct=True)
+        + WEIGHTS['momentum'] * df['momentum'].rank(pct=True)
+    )
+    return df.assign(score=score).nlargest(top_n, 'score')['symbol'].tolist()
+
+class UniverseScreener:
+    def __init__(self, fallback, top_n: int = SCREENER_TOP_N, min_volume: float = SCREENER_MIN_VOLUME,
+                 refresh_seconds: float = UNIVERSE_REFRESH):
+        self.fallback = list(fallback) # used until the first market load succeeds
+        self.top_n = top_n
+        self.min_volume = min_volume
+        self.refresh_seconds = refresh_seconds
+        self.universe = []
+        self.refreshed_at = None
+
+    async def refresh(self):
+        """
+        Reloads the universe from the exchanges' market metadata.
+        """
+        markets = await market_data.fetch_markets()
+        universe = tradable_symbols(markets)
+        if universe:
+            self.universe = universe
+            self.refreshed_at = time.monotonic()
+            print(f"🌐 Universe refreshed: {len(universe)} {QUOTE_CURRENCY} pairs")
+
+    async def candidates(self, exclude=()):
+        """
+        The symbols worth a full scan this time, best first.
+        """
+        if self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.refresh_seconds:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Universe refresh failed: {e}")
+        if not self.universe:
+            return [s for s in self.fallback if s not in exclude]
+
+        try:
+            tickers = await market_data.fetch_ticker_stats(self.universe)
+        except Exception as e:
+            print(f"⚠️ Screener tickers failed, scanning the fallback list: {e}")
+            return [s for s in self.fallback if s not in exclude]
+        selected = rank_candidates(tickers, self.top_n, self.min_volume, set(exclude))
+        print(f"🔎 Screener: {len(self.universe)} pairs -> {len(selected)} candidates")
+        return selected
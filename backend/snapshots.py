@@ -0,0 +1,221 @@
+"""
+Versioned, pre-serialized responses for /signals and /android/signals.
+
+Each scan publishes one immutable SignalSnapshot. The endpoints serve its
+bytes directly with an ETag, so unchanged polls get a 304 and changed ones
+don't re-encode anything. The only per-request work is the relative
+"time_ago" text, which has minute resolution: the Android body is rendered
+at most once per minute per snapshot. Items also carry the raw
+"timestamp_ms" so clients can compute the age themselves.
+
+Clients that accept MessagePack get a compact, versioned Android feed
+instead (ANDROID_COMPACT_FIELDS): one array of raw numbers per signal,
+without the display strings, colors and image URLs the app can derive.
+It has no "time_ago", so it is encoded once per snapshot. JSON is encoded
+with orjson when it is installed (compact output, several times faster).
+"""
+import json
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from negotiation import compress, msgpack
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+IMAGE_URL_TEMPLATE = "https://lcw.nyc3.cdn.digitaloceanspaces.com/production/currencies/64/{coin}.png"
+
+def _json_default(value):
+    # Same conversions FastAPI's jsonable_encoder applies to our signal dicts
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def format_time_ago(minutes: int):
+    if minutes < 1:
+        return "Just now"
+    elif minutes < 60:
+        return f"{minutes}m ago"
+    elif minutes < 1440:
+        return f"{minutes // 60}h ago"
+    else:
+        return f"{minutes // 1440}d ago"
+
+def to_epoch_seconds(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    # Naive timestamps are UTC (pd.to_datetime(unit='ms'))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+def timestamp_ms(signal):
+    """
+    The signal's candle time in epoch ms. A live signal holds a pd.Timestamp,
+    a stored one (restored, or on another worker) an ISO string.
+    """
+    return int(to_epoch_seconds(signal['timestamp']) * 1000)
+
+def signal_id(signal):
+    """
+    Stable id of a signal: the same on every worker and after a restart.
+    """
+    return f"{signal['symbol']}-{timestamp_ms(signal)}"
+
+def format_android_signal(s):
+    """
+    Formats one signal for the Android app, without the time-dependent "time_ago".
+    """
+    coin = s['symbol'].split('/')[0]
+    return {
+        "id": signal_id(s),
+        "coin": coin,
+        "pair": s['symbol'],
+        "price": f"${s['price']:.2f}",
+        "image_url": IMAGE_URL_TEMPLATE.format(coin=coin.lower()),
+        "score_value": s['score'],
+        "score_color": "#00C853" if s['score'] >= 80 else "#FFAB00", # Green for Strong, Amber for Medium
+        "status_text": s['status'],
+        "entry": s['trade_setup']['entry_zone'],
+        "targets": f"TP1: {s['trade_setup']['target_1']:.2f} | TP2: {s['trade_setup']['target_2']:.2f}",
+        "stop_loss": f"Exit: {s['trade_setup']['stop_loss']:.2f}",
+        "timestamp_ms": timestamp_ms(s),
+    }
+
+# Bump ANDROID_COMPACT_VERSION whenever the fields change
+ANDROID_COMPACT_VERSION = 1
+ANDROID_COMPACT_FIELDS = (
+    "pair", "price", "score", "status", "entry_low", "entry_high",
+    "target_1", "target_2", "stop_loss", "timestamp_ms",
+)
+
+def compact_android_signal(s):
+    """
+    One signal as a row of ANDROID_COMPACT_FIELDS (raw values; the app formats them).
+    """
+    setup = s['trade_setup']
+    entry_low, _, entry_high = setup['entry_zone'].partition(' - ')
+    return [
+        s['symbol'],
+        float(s['price']),
+        int(s['score']),
+        s['status'],
+        float(entry_low),
+        float(entry_high or entry_low),
+        float(setup['target_1']),
+        float(setup['target_2']),
+        float(setup['stop_loss']),
+        timestamp_ms(s),
+    ]
+
+class SignalSnapshot:
+    """
+    Immutable result of one scan, with its response bodies encoded once.
+    """
+    __slots__ = ('version', 'created_at', 'signals', 'signals_body', 'android_items', '_android_cache',
+                 '_compact_body', '_compressed')
+
+    def __init__(self, version: int, signals: list):
+        self.version = version
+        self.created_at = time.time()
+        self.signals = tuple(signals)
+        self.signals_body = dumps({"count": len(signals), "signals": signals})
+        # Each item is encoded up to the "time_ago" value, which is filled in at render time
+        self.android_items = []
+        for s in signals:
+            item = format_android_signal(s)
+            prefix = dumps(item)[:-1] + b',"time_ago":'
+            self.android_items.append((prefix, item['timestamp_ms'] / 1000))
+        self._android_cache = (None, None)
+        self._compact_body = None
+        self._compressed = {} # {(etag, encoding): body}
+
+    @property
+    def signals_etag(self):
+        return f'"{self.version}"'
+
+    def android_body(self, now: float = None):
+        """
+        Returns (etag, body) for /android/signals at the given time.
+        """
+        minute = int((now or time.time()) // 60)
+        cached_minute, cached = self._android_cache
+        if cached_minute == minute:
+            return cached
+
+        now_seconds = minute * 60
+        items = [
+            prefix + dumps(format_time_ago(max(0, int((now_seconds - ts) / 60)))) + b'}'
+            for prefix, ts in self.android_items
+        ]
+        body = b'{"status":"success","data":[' + b','.join(items) + b']}'
+        result = (f'"{self.version}-{minute}"', body)
+        self._android_cache = (minute, result)
+        return result
+
+    def android_compact_body(self):
+        """
+        Returns (etag, body) of the MessagePack Android feed, encoded on first use.
+        """
+        if self._compact_body is None:
+            body = msgpack.packb({
+                "v": ANDROID_COMPACT_VERSION,
+                "fields": ANDROID_COMPACT_FIELDS,
+                "data": [compact_android_signal(s) for s in self.signals],
+            }) # doubles: float32 would round entry/stop/targets (~0.008 at BTC prices)
+            self._compact_body = (f'"{self.version}-mp{ANDROID_COMPACT_VERSION}"', body)
+        return self._compact_body
+
+    def compressed(self, etag: str, body: bytes, encoding: str):
+        """
+        The compressed body of one representation (etag), compressed once per snapshot.
+        """
+        key = (etag, encoding)
+        cached = self._compressed.get(key)
+        if cached is None:
+            if len(self._compressed) >= 16:
+                # Old minutes of the Android JSON body
+                self._compressed.clear()
+            cached = self._compressed[key] = compress(body, encoding)
+        return cached
+
+current = SignalSnapshot(0, [])
+
+def publish(signals: list):
+    """
+    Encodes a new snapshot from the scan results and makes it current.
+    """
+    global current
+    current = SignalSnapshot(current.version + 1, signals)
+    return current
+
+def install(version: int, signals: list):
+    """
+    Makes a snapshot published by another worker (or a previous run) current.
+    """
+    global current
+    if version != current.version:
+        current = SignalSnapshot(version, signals)
+    return current
+
+def etag_matches(if_none_match: str, etag: str):
+    """
+    True if an If-None-Match header value matches the ETag (weak or strong).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [c.strip() for c in if_none_match.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates
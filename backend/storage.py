@@ -0,0 +1,283 @@
+"""
+Persistent signal store (SQLite in WAL mode).
+
+Replaces the in-memory `signal_history` list and makes `active_signals`
+survive restarts. Writes are buffered during a scan and committed in one
+transaction by flush(). On the event loop, flush_later() and
+add_event_later() hand the commit to a single writer thread instead, so
+SQLite never blocks the loop and writes still land in order. Only a bounded window of recent history is kept in
+memory; everything else is served by indexed queries.
+
+The store is also the state shared between server workers (cluster.py): the
+scan leader writes the current snapshot and the stream events here, and the
+other workers pull them in when `changed()` reports a commit.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import snapshots
+from events import EVENT_BUFFER_SIZE
+
+SIGNALS_DB_PATH = os.getenv("SIGNALS_DB_PATH", "signals.db")
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "200"))
+HISTORY_PAGE_MAX = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    status TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_signals_symbol ON signals (symbol, id);
+CREATE INDEX IF NOT EXISTS idx_signals_status ON signals (status, id);
+CREATE INDEX IF NOT EXISTS idx_signals_timestamp ON signals (timestamp);
+CREATE TABLE IF NOT EXISTS active_signals (
+    symbol TEXT PRIMARY KEY,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+"""
+
+def parse_time(value):
+    """
+    Accepts epoch seconds or an ISO 8601 string; returns epoch seconds.
+    Raises ValueError for anything else.
+    """
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return snapshots.to_epoch_seconds(datetime.fromisoformat(value))
+
+class SignalStore:
+    def __init__(self, path: str = SIGNALS_DB_PATH, cache_size: int = HISTORY_CACHE_SIZE):
+        self.lock = threading.Lock()
+        # Endpoints run in FastAPI's thread pool, so share one connection behind a lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="signal-store")
+        self.pending = []
+        self.data_version = self._data_version()
+        self.recent = deque(maxlen=cache_size)
+        self.total = self.conn.execute("SELECT COUNT(*) FROM signals").fetchone()[0]
+        rows = self.conn.execute(
+            "SELECT id, payload FROM signals ORDER BY id DESC LIMIT ?", (cache_size,)
+        ).fetchall()
+        for row_id, payload in reversed(rows):
+            self.recent.append(self._decode(row_id, payload))
+
+    @staticmethod
+    def _decode(row_id, payload):
+        item = json.loads(payload)
+        item['id'] = row_id
+        return item
+
+    def add_signal(self, signal_data: dict):
+        """
+        Buffers a new signal; it is written on the next flush().
+        """
+        self.pending.append((
+            signal_data['symbol'],
+            snapshots.to_epoch_seconds(signal_data['timestamp']),
+            signal_data['status'],
+            int(signal_data['score']),
+            snapshots.dumps(signal_data).decode('utf-8'),
+        ))
+
+    def flush(self, active_signals: dict = None, snapshot=None):
+        """
+        Writes buffered signals and (if given) the full active_signals state
+        and the current SignalSnapshot in one transaction.
+        """
+        self._write(*self._prepare(active_signals), snapshot)
+
+    def flush_later(self, active_signals: dict = None, snapshot=None):
+        """
+        flush() on the writer thread. The rows are encoded here, so the
+        caller can keep changing active_signals. Returns a Future.
+        """
+        return self._submit(self._write, *self._prepare(active_signals), snapshot)
+
+    def _prepare(self, active_signals: dict):
+        pending, self.pending = self.pending, []
+        active_rows = None
+        if active_signals is not None:
+            active_rows = [(symbol, snapshots.dumps(state).decode('utf-8')) for symbol, state in active_signals.items()]
+        return pending, active_rows
+
+    def _write(self, pending, active_rows, snapshot):
+        with self.lock, self.conn:
+            new_items = []
+            for row in pending:
+                cursor = self.conn.execute(
+                    "INSERT INTO signals (symbol, timestamp, status, score, payload) VALUES (?, ?, ?, ?, ?)", row
+                )
+                new_items.append(self._decode(cursor.lastrowid, row[4]))
+            if active_rows is not None:
+                self.conn.execute("DELETE FROM active_signals")
+                self.conn.executemany("INSERT INTO active_signals (symbol, payload) VALUES (?, ?)", active_rows)
+            if snapshot is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO snapshot (id, version, payload) VALUES (1, ?, ?)",
+                    (snapshot.version, snapshot.signals_body.decode('utf-8')),
+                )
+            self.recent.extend(new_items)
+            self.total += len(new_items)
+
+    def add_event(self, event_id: int, event_type: str, data: bytes):
+        """
+        Writes one stream event (already JSON-encoded) and drops the oldest ones.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO events (id, type, payload) VALUES (?, ?, ?)",
+                (event_id, event_type, data.decode('utf-8')),
+            )
+            self.conn.execute("DELETE FROM events WHERE id <= ?", (event_id - EVENT_BUFFER_SIZE,))
+
+    def add_event_later(self, event_id: int, event_type: str, data: bytes):
+        """
+        add_event() on the writer thread (usable as the broadcaster's sink).
+        """
+        return self._submit(self.add_event, event_id, event_type, data)
+
+    def _submit(self, fn, *args):
+        def report(future):
+            if future.exception() is not None:
+                print(f"⚠️ Signal store write failed: {future.exception()}")
+        future = self.writer.submit(fn, *args)
+        future.add_done_callback(report)
+        return future
+
+    def load_shared(self, after_event: int = 0):
+        """
+        Reads, in one transaction, the stored snapshot as (version, signals)
+        (or None) and the events after `after_event` as (id, type, data) rows.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                row = self.conn.execute("SELECT version, payload FROM snapshot WHERE id = 1").fetchone()
+                rows = self.conn.execute(
+                    "SELECT id, type, payload FROM events WHERE id > ? ORDER BY id", (after_event,)
+                ).fetchall()
+            finally:
+                self.conn.execute("COMMIT")
+        snapshot = (row[0], json.loads(row[1])['signals']) if row else None
+        return snapshot, [(event_id, event_type, payload.encode('utf-8')) for event_id, event_type, payload in rows]
+
+    def _data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self):
+        """
+        True if another connection (another worker) committed since the last call.
+        """
+        with self.lock:
+            version = self._data_version()
+        changed, self.data_version = version != self.data_version, version
+        return changed
+
+    def refresh(self):
+        """
+        Picks up signals written by another worker into the history cache.
+        """
+        last_id = self.recent[-1]['id'] if self.recent else 0
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, payload FROM signals WHERE id > ? ORDER BY id DESC LIMIT ?", (last_id, self.recent.maxlen)
+            ).fetchall()
+            if rows:
+                self.total = self.conn.execute("SELECT COUNT(*) FROM signals").fetchone()[0]
+        if len(rows) == self.recent.maxlen:
+            self.recent.clear() # more new rows than the cache holds: don't leave a gap
+        for row_id, payload in reversed(rows):
+            self.recent.append(self._decode(row_id, payload))
+
+    def load_active(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT symbol, payload FROM active_signals").fetchall()
+        return {symbol: json.loads(payload) for symbol, payload in rows}
+
+    def history(self, limit: int = 50, cursor: int = None, symbol: str = None,
+                status: str = None, since: float = None, until: float = None):
+        """
+        Returns (items, next_cursor): up to `limit` signals older than `cursor`
+        (a signal id), matching the filters, oldest first.
+        Pass next_cursor back as `cursor` to get the previous page.
+        """
+        limit = max(1, min(limit, HISTORY_PAGE_MAX))
+        filtered = any(v is not None for v in (cursor, symbol, status, since, until))
+
+        if not filtered and limit <= len(self.recent):
+            # Hot path: the latest page is always in memory
+            items = list(self.recent)[-limit:]
+        else:
+            clauses, params = self._filters(symbol, status, since, until)
+            if cursor is not None:
+                clauses.append("id < ?")
+                params.append(cursor)
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT id, payload FROM signals {where} ORDER BY id DESC LIMIT ?", (*params, limit)
+                ).fetchall()
+            items = [self._decode(row_id, payload) for row_id, payload in reversed(rows)]
+
+        next_cursor = items[0]['id'] if len(items) == limit else None
+        return items, next_cursor
+
+    def count(self, symbol: str = None, status: str = None, since: float = None, until: float = None):
+        """
+        Number of stored signals matching the filters (all of them without filters).
+        """
+        clauses, params = self._filters(symbol, status, since, until)
+        if not clauses:
+            return self.total
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM signals WHERE {' AND '.join(clauses)}", params
+            ).fetchone()[0]
+
+    @staticmethod
+    def _filters(symbol, status, since, until):
+        clauses, params = [], []
+        if symbol:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        return clauses, params
+
+    def close(self):
+        self.writer.shutdown(wait=True) # let queued writes finish
+        with self.lock:
+            self.conn.close()
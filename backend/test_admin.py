@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+# Keep the store and leader lock of the tests out of the working directory
+_state_dir = tempfile.mkdtemp()
+os.environ.setdefault("SIGNALS_DB_PATH", os.path.join(_state_dir, "signals.db"))
+os.environ.setdefault("LEADER_LOCK_PATH", os.path.join(_state_dir, "scan-leader.lock"))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app) # no startup: nothing scans or takes the leader lock
+
+ADMIN_REQUESTS = [
+    ("get", "/admin/profiles"),
+    ("post", "/admin/profiles/next"),
+    ("get", "/admin/profiles/missing"),
+    ("post", "/scan?profile=true"),
+]
+
+@pytest.mark.parametrize("method, path", ADMIN_REQUESTS)
+def test_admin_endpoints_are_off_without_a_token(monkeypatch, method, path):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    response = getattr(client, method)(path, headers={"X-Admin-Token": "anything"})
+    assert response.status_code == 403
+
+@pytest.mark.parametrize("method, path", ADMIN_REQUESTS)
+def test_admin_endpoints_check_the_token(monkeypatch, method, path):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(main, "profile_next_scan", False) # restored after /admin/profiles/next
+    assert getattr(client, method)(path).status_code == 401
+    assert getattr(client, method)(path, headers={"X-Admin-Token": "wrong"}).status_code == 401
+    response = getattr(client, method)(path, headers={"X-Admin-Token": "secret"})
+    assert response.status_code not in (401, 403)
+
+def test_plain_scan_needs_no_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    # Not the leader in this process, but past the admin check
+    assert client.post("/scan").status_code == 409
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+
+from backtest import simulate_trades, summarize
+
+def trades_with_returns(*returns):
+    return [
+        {"return_pct": r, "tp1_hit": r > 0, "tp2_hit": False, "closed": True,
+         "max_gain_pct": max(r, 0.0), "drawdown_pct": min(r, 0.0)}
+        for r in returns
+    ]
+
+def test_summarize_compounds_returns():
+    summary = summarize(trades_with_returns(10.0, -20.0, 50.0))
+    # 1.0 -> 1.1 -> 0.88 -> 1.32
+    assert summary["trades"] == 3
+    assert math.isclose(summary["total_return_pct"], 32.0)
+    assert math.isclose(summary["max_equity_drawdown_pct"], -20.0) # 0.88 / 1.1 - 1
+    assert math.isclose(summary["avg_return_pct"], 40.0 / 3)
+    assert math.isclose(summary["tp1_hit_rate"], 2 / 3)
+
+def test_summarize_drawdown_from_starting_equity():
+    summary = summarize(trades_with_returns(-10.0, 5.0))
+    assert math.isclose(summary["max_equity_drawdown_pct"], -10.0)
+    assert math.isclose(summary["total_return_pct"], -5.5) # 0.9 * 1.05
+
+def test_summarize_never_loses_more_than_everything():
+    summary = summarize(trades_with_returns(-50.0, -50.0, -50.0, -50.0))
+    assert math.isclose(summary["total_return_pct"], -93.75)
+    assert math.isclose(summary["max_equity_drawdown_pct"], -93.75)
+    assert summarize(trades_with_returns(5.0, 5.0))["max_equity_drawdown_pct"] == 0.0
+    assert summarize([]) == {"trades": 0}
+
+def test_simulate_trades_exits_at_the_stop():
+    # columns: timestamp, open, high, low, close, volume
+    candles = np.array([
+        [0, 100, 101, 99, 100, 1],
+        [1, 100, 104, 99, 103, 1], # TP1 (103)
+        [2, 103, 107, 98, 104, 1], # TP2 (106)
+        [3, 97, 98, 90, 92, 1],    # gaps below the stop (95): filled at the open
+        [4, 92, 93, 91, 92, 1],
+    ], dtype=float)
+    stop_loss = np.full(5, 95.0)
+    target_1 = np.full(5, 103.0)
+    target_2 = np.full(5, 106.0)
+    trades = simulate_trades(candles, np.array([0, 2, 4]), stop_loss, target_1, target_2)
+
+    # The entry at 2 is skipped while the first trade is open; at 4 the price is already below the stop
+    assert len(trades) == 1
+    trade = trades[0]
+    assert trade["tp1_hit"] and trade["tp2_hit"] and trade["closed"]
+    assert trade["exit_time"] == 3
+    assert math.isclose(trade["return_pct"], -5.0)
+    assert math.isclose(trade["max_gain_pct"], 7.0)
+    assert trade["candles_held"] == 3
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
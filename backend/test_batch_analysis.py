@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+
+from analysis import analyze_candles, indicator_engine
+from batch_analysis import analyze_batch
+from candles import CandleView
+
+HOUR_MS = 3_600_000
+END_MS = 1_700_000_000_000 - 1_700_000_000_000 % HOUR_MS
+
+def make_view(count: int, seed: int):
+    """
+    Random-walk 1h candles ending at END_MS, with a volume spike now and then.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.01, count)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, count))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, count))
+    volume = rng.uniform(100, 200, count) * np.where(rng.random(count) < 0.2, 3.0, 1.0)
+    timestamps = END_MS - np.arange(count - 1, -1, -1, dtype=np.int64) * HOUR_MS
+    return CandleView(timestamps, np.vstack([open_, high, low, close, volume]))
+
+def assert_same_result(batch: dict, single: dict):
+    for key in ('score', 'status', 'reasons', 'timestamp'):
+        assert batch[key] == single[key], f"{key}: {batch[key]} != {single[key]}"
+    for key in ('price', 'rsi', 'adx'):
+        assert math.isclose(batch[key], single[key], rel_tol=1e-9), f"{key}: {batch[key]} != {single[key]}"
+    for key, value in single['trade_setup'].items():
+        if isinstance(value, str):
+            assert batch['trade_setup'][key] == value, key
+        else:
+            assert math.isclose(batch['trade_setup'][key], value, rel_tol=1e-9), key
+
+def test_batch_matches_per_symbol_path():
+    frames = {f"COIN{i}/USDT": make_view(300 + 40 * i, seed=i) for i in range(8)}
+    frames["NEW/USDT"] = make_view(150, seed=99) # too short for either path
+    indicator_engine.reset()
+    single = {symbol: analyze_candles(symbol, candles) for symbol, candles in frames.items()}
+    batch = analyze_batch(frames)
+
+    assert single.pop("NEW/USDT") is None
+    assert set(batch) == set(single)
+    for symbol, result in single.items():
+        assert_same_result(batch[symbol], result)
+
+def test_batch_min_score_filters_like_per_symbol_path():
+    frames = {f"COIN{i}/USDT": make_view(400, seed=10 + i) for i in range(12)}
+    indicator_engine.reset()
+    single = {symbol: analyze_candles(symbol, candles) for symbol, candles in frames.items()}
+    batch = analyze_batch(frames, min_score=50)
+    assert set(batch) == {symbol for symbol, result in single.items() if result['score'] >= 50}
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
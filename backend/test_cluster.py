@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import threading
+
+import pytest
+
+import cluster
+import events
+import snapshots
+from storage import SignalStore
+from test_snapshots import live_signal
+
+def db_path():
+    return os.path.join(tempfile.mkdtemp(), "signals.db")
+
+@pytest.fixture
+def follower_state(monkeypatch):
+    """
+    A fresh snapshot and event buffer for the follower side, restored afterwards.
+    """
+    monkeypatch.setattr(snapshots, "current", snapshots.SignalSnapshot(0, []))
+    monkeypatch.setattr(events, "broadcaster", events.EventBroadcaster())
+
+def test_follower_sees_the_leaders_flush(follower_state):
+    path = db_path()
+    leader, follower = SignalStore(path), SignalStore(path)
+    assert not follower.changed()
+
+    signals = [live_signal(), live_signal('BTC/USDT', 36512.37)]
+    for signal in signals:
+        leader.add_signal(signal)
+    published = snapshots.SignalSnapshot(3, signals)
+    leader.flush_later({"BTC/USDT": {"entry_price": 36512.37}}, snapshot=published).result()
+    leader.add_event_later(1, "signals", b'{"version":3,"added":[],"removed":[]}').result()
+
+    assert follower.changed()
+    cluster.sync_shared_state(follower)
+    assert snapshots.current.version == 3
+    assert snapshots.current.signals_body == published.signals_body
+    assert events.broadcaster.last_id == 1
+    assert follower.total == 2
+    assert [item['symbol'] for item in follower.recent] == ['CRV/USDT', 'BTC/USDT']
+    assert follower.load_active() == {"BTC/USDT": {"entry_price": 36512.37}}
+    assert not follower.changed()
+    leader.close()
+    follower.close()
+
+def block_writer(store):
+    """
+    Holds the writer thread until the returned event is set, so later writes queue up.
+    """
+    release = threading.Event()
+    store.writer.submit(release.wait)
+    return release
+
+def test_later_writes_commit_in_submission_order():
+    store = SignalStore(db_path())
+    release = block_writer(store)
+    active = {}
+    futures = []
+    for i in range(1, 21):
+        active["BTC/USDT"] = {"step": i}
+        futures.append(store.flush_later(active))
+        futures.append(store.add_event_later(i, "tp1_hit", json.dumps({"step": i}).encode()))
+    # Rows are encoded when submitted: changing the dict now doesn't reach the store
+    active["BTC/USDT"] = {"step": "changed after submitting"}
+    assert not any(f.done() for f in futures)
+
+    release.set()
+    for future in futures:
+        future.result()
+    assert store.load_active() == {"BTC/USDT": {"step": 20}}
+    _, rows = store.load_shared()
+    assert [event_id for event_id, _, _ in rows] == list(range(1, 21))
+    assert [json.loads(data)["step"] for _, _, data in rows] == list(range(1, 21))
+    store.close()
+
+def test_close_drains_queued_writes():
+    path = db_path()
+    store = SignalStore(path)
+    release = block_writer(store)
+    store.add_signal(live_signal())
+    store.flush_later({"CRV/USDT": {"entry_price": 0.5}})
+    for i in range(1, 6):
+        store.add_event_later(i, "exit", b'{}')
+    threading.Timer(0.1, release.set).start()
+    store.close() # waits for the queue instead of dropping it
+
+    reopened = SignalStore(path)
+    assert reopened.total == 1
+    assert reopened.load_active() == {"CRV/USDT": {"entry_price": 0.5}}
+    assert [event_id for event_id, _, _ in reopened.load_shared()[1]] == [1, 2, 3, 4, 5]
+    reopened.close()
+
+def test_only_one_leader_at_a_time():
+    path = os.path.join(tempfile.mkdtemp(), "scan-leader.lock")
+    first, second = cluster.LeaderLock(path), cluster.LeaderLock(path)
+    assert first.try_acquire() and first.held
+    assert not second.try_acquire()
+    assert second.holder() == os.getpid()
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,48 @@
+import json
+
+import snapshots
+from events import EventBroadcaster
+from test_snapshots import live_signal, stored
+
+def frame_data(frame: bytes):
+    """
+    The JSON payload of one encoded SSE frame.
+    """
+    line = next(l for l in frame.decode().split("\n") if l.startswith("data: "))
+    return json.loads(line[len("data: "):])
+
+def test_restored_snapshot_diffs_to_nothing():
+    signals = [live_signal(), live_signal('BTC/USDT', 36512.37)]
+    live = snapshots.SignalSnapshot(1, signals)
+    # The same signals as a follower (or a restarted server) holds them
+    restored = snapshots.SignalSnapshot(2, stored(signals))
+    broadcaster = EventBroadcaster()
+    broadcaster.publish_snapshot(live, restored)
+    data = frame_data(broadcaster.buffer[-1][1])
+    assert data == {"version": 2, "added": [], "removed": []}
+
+def test_removed_ids_match_the_snapshot_ids():
+    kept, dropped = live_signal('BTC/USDT', 36512.37), live_signal()
+    previous = snapshots.SignalSnapshot(1, stored([kept, dropped]))
+    new = live_signal('ETH/USDT', 2012.5)
+    current = snapshots.SignalSnapshot(2, [kept, new])
+
+    broadcaster = EventBroadcaster()
+    previous_current, snapshots.current = snapshots.current, previous
+    try:
+        sent = frame_data(broadcaster.snapshot_frame())
+    finally:
+        snapshots.current = previous_current
+    broadcaster.publish_snapshot(previous, current)
+    diff = frame_data(broadcaster.buffer[-1][1])
+
+    assert [s['id'] for s in sent['signals']] == ['BTC/USDT-1699995600000', 'CRV/USDT-1699995600000']
+    assert diff['removed'] == ['CRV/USDT-1699995600000']
+    assert [s['id'] for s in diff['added']] == ['ETH/USDT-1699995600000']
+    assert set(diff['removed']) <= {s['id'] for s in sent['signals']}
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,170 @@
+import asyncio
+
+import ccxt.async_support as ccxt
+import pytest
+
+import exchange_pool
+from exchange_pool import CircuitBreaker, DataSourceUnavailable, ExchangePool, Venue
+
+class StubClient:
+    """
+    ccxt-like client: lists `markets`, and fails every request while `down` is set.
+    Like ccxt, fetch_tickers raises BadSymbol if any requested symbol isn't listed.
+    """
+    def __init__(self, name: str, markets, down: bool = False):
+        self.name = name
+        self.markets = {symbol: {"symbol": symbol} for symbol in markets}
+        self.down = down
+        self.calls = []
+
+    async def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None):
+        self.calls.append(('fetch_ohlcv', symbol))
+        if self.down:
+            raise ccxt.NetworkError(f"{self.name} is down")
+        if symbol not in self.markets:
+            raise ccxt.BadSymbol(symbol)
+        return [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]
+
+    async def fetch_tickers(self, symbols=None):
+        self.calls.append(('fetch_tickers', tuple(symbols)))
+        if self.down:
+            raise ccxt.NetworkError(f"{self.name} is down")
+        unknown = [s for s in symbols if s not in self.markets]
+        if unknown:
+            raise ccxt.BadSymbol(f"{self.name} does not have market symbol {unknown[0]}")
+        return {symbol: {"symbol": symbol, "last": 1.0, "venue": self.name} for symbol in symbols}
+
+    async def load_markets(self):
+        return self.markets
+
+    async def close(self):
+        pass
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(exchange_pool.time, "monotonic", clock)
+    return clock
+
+def make_pool(*clients, latencies=None):
+    venues = [Venue(c.name, c, CircuitBreaker(failure_threshold=2, cooldown=30)) for c in clients]
+    for venue, latency in zip(venues, latencies or []):
+        venue.latency = latency
+    return ExchangePool(venues)
+
+def test_breaker_opens_and_allows_a_single_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.available() and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    # Only one trial at a time
+    assert not breaker.available() and not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0 and breaker.allow()
+
+def test_failed_trial_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure() # one failure is enough in half-open
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    clock.now += 29
+    assert not breaker.available()
+    clock.now += 1
+    assert breaker.allow()
+
+def test_tripped_venue_gets_no_traffic_until_its_trial(clock):
+    fast = StubClient("fast", ["BTC/USDT"], down=True)
+    slow = StubClient("slow", ["BTC/USDT"])
+    pool = make_pool(fast, slow, latencies=[0.05, 0.5])
+
+    async def fetch(times):
+        for _ in range(times):
+            assert await pool.fetch_ohlcv("BTC/USDT") == [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]
+
+    asyncio.run(fetch(2)) # each call fails on "fast" first, then falls back
+    assert pool.venues[0].breaker.state == "open"
+    assert pool.routes["BTC/USDT"] is pool.venues[1]
+    fast.calls.clear()
+    asyncio.run(fetch(3))
+    assert fast.calls == [] # rerouted while the breaker is open
+
+    # Cooldown over, still down: the trial fails and the breaker reopens
+    clock.now += 30
+    asyncio.run(fetch(1))
+    assert len(fast.calls) == 1
+    assert pool.venues[0].breaker.state == "open"
+
+    # Recovered: the next trial closes it and traffic can return
+    clock.now += 30
+    fast.down = False
+    pool.routes.clear()
+    asyncio.run(fetch(1))
+    assert pool.venues[0].breaker.state == "closed"
+    assert pool.routes["BTC/USDT"] is pool.venues[0]
+
+def test_all_venues_down_raises(clock):
+    pool = make_pool(StubClient("a", ["BTC/USDT"], down=True), StubClient("b", ["BTC/USDT"], down=True))
+    with pytest.raises(DataSourceUnavailable):
+        asyncio.run(pool.fetch_ohlcv("BTC/USDT"))
+    with pytest.raises(ccxt.BadSymbol):
+        asyncio.run(pool.fetch_ohlcv("NOPE/USDT"))
+
+def test_tickers_only_go_to_venues_listing_the_symbol(clock):
+    binance = StubClient("binance", ["BTC/USDT", "ETH/USDT", "BNB/USDT"])
+    mexc = StubClient("mexc", ["BTC/USDT", "ETH/USDT", "MX/USDT"])
+    pool = make_pool(binance, mexc, latencies=[0.05, 0.5])
+    tickers = asyncio.run(pool.fetch_tickers(["BTC/USDT", "ETH/USDT", "BNB/USDT", "MX/USDT"]))
+
+    assert {s: t["venue"] for s, t in tickers.items()} == {
+        "BTC/USDT": "binance", "ETH/USDT": "binance", "BNB/USDT": "binance", "MX/USDT": "mexc",
+    }
+    assert binance.calls == [('fetch_tickers', ("BTC/USDT", "ETH/USDT", "BNB/USDT"))]
+    assert mexc.calls == [('fetch_tickers', ("MX/USDT",))]
+
+def test_failed_ticker_batch_is_regrouped_on_the_next_venue(clock):
+    binance = StubClient("binance", ["BTC/USDT", "ETH/USDT", "BNB/USDT"], down=True)
+    mexc = StubClient("mexc", ["BTC/USDT", "ETH/USDT", "MX/USDT"])
+    pool = make_pool(binance, mexc, latencies=[0.05, 0.5])
+    tickers = asyncio.run(pool.fetch_tickers(["BTC/USDT", "ETH/USDT", "BNB/USDT", "MX/USDT"]))
+
+    # BNB is only on the failed venue: it is the only symbol left out
+    assert {s: t["venue"] for s, t in tickers.items()} == {
+        "BTC/USDT": "mexc", "ETH/USDT": "mexc", "MX/USDT": "mexc",
+    }
+    assert sorted(mexc.calls) == [('fetch_tickers', ("BTC/USDT", "ETH/USDT")), ('fetch_tickers', ("MX/USDT",))]
+
+    mexc.down = True
+    with pytest.raises(DataSourceUnavailable):
+        asyncio.run(pool.fetch_tickers(["BTC/USDT"]))
+
+def test_fastest_venue_metadata_wins(clock):
+    binance = StubClient("binance", ["BTC/USDT"])
+    mexc = StubClient("mexc", ["BTC/USDT", "MX/USDT"])
+    binance.markets["BTC/USDT"]["venue"] = "binance"
+    mexc.markets["BTC/USDT"]["venue"] = "mexc"
+    pool = make_pool(binance, mexc, latencies=[0.05, None])
+    markets = asyncio.run(pool.load_markets())
+    assert markets["BTC/USDT"]["venue"] == "binance"
+    assert set(markets) == {"BTC/USDT", "MX/USDT"}
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,100 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from indicators import IndicatorEngine
+
+HOUR_MS = 3_600_000
+COLUMNS = ('EMA_20', 'EMA_50', 'EMA_200', 'RSI', 'ADX_14', 'DMP_14', 'DMN_14', 'ATR')
+
+def make_candles(count: int, seed: int = 7):
+    """
+    Random-walk 1h candles: (timestamps_ms, high, low, close).
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    high = close * (1 + rng.uniform(0, 0.01, count))
+    low = close * (1 - rng.uniform(0, 0.01, count))
+    timestamps = 1_700_000_000_000 - 1_700_000_000_000 % HOUR_MS + np.arange(count, dtype=np.int64) * HOUR_MS
+    return timestamps, high, low, close
+
+def rma(series: pd.Series, length: int):
+    return series.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+def pandas_indicators(high, low, close, length: int = 14):
+    """
+    Last-row values of pandas_ta 0.3.14b0's ema/rsi/adx/atr, written with pandas ewm.
+    """
+    high, low, close = pd.Series(high), pd.Series(low), pd.Series(close)
+    values = {}
+    for span in (20, 50, 200):
+        seeded = close.copy()
+        seeded.iloc[:span - 1] = np.nan
+        seeded.iloc[span - 1] = close.iloc[:span].mean()
+        values[f'EMA_{span}'] = seeded.ewm(span=span, adjust=False).mean().iloc[-1]
+
+    change = close.diff()
+    gain = rma(change.clip(lower=0), length)
+    loss = rma(-change.clip(upper=0), length)
+    values['RSI'] = (100 * gain / (gain + loss)).iloc[-1]
+
+    prev_close = close.shift(1)
+    true_range = pd.concat([high - low, (high - prev_close).abs(), (prev_close - low).abs()], axis=1).max(axis=1)
+    true_range[prev_close.isna()] = np.nan
+    atr = rma(true_range, length)
+    up = high - high.shift(1)
+    down = low.shift(1) - low
+    plus_dm = ((up > down) & (up > 0)) * up
+    minus_dm = ((down > up) & (down > 0)) * down
+    dmp = 100 * rma(plus_dm, length) / atr
+    dmn = 100 * rma(minus_dm, length) / atr
+    dx = 100 * (dmp - dmn).abs() / (dmp + dmn)
+    values.update({
+        'ADX_14': rma(dx, length).iloc[-1],
+        'DMP_14': dmp.iloc[-1],
+        'DMN_14': dmn.iloc[-1],
+        'ATR': atr.iloc[-1],
+    })
+    return values
+
+def assert_matches(values: dict, expected: dict, rel_tol: float):
+    for column in COLUMNS:
+        assert math.isclose(values[column], expected[column], rel_tol=rel_tol), \
+            f"{column}: {values[column]} != {expected[column]}"
+
+def test_cold_start_matches_pandas():
+    timestamps, high, low, close = make_candles(500)
+    values = IndicatorEngine().latest('BTC/USDT', timestamps, high, low, close)
+    assert_matches(values, pandas_indicators(high, low, close), rel_tol=1e-9)
+
+def test_growing_history_matches_pandas():
+    timestamps, high, low, close = make_candles(520)
+    engine = IndicatorEngine()
+    for end in range(500, 521, 4):
+        values = engine.latest('BTC/USDT', timestamps[:end], high[:end], low[:end], close[:end])
+        assert_matches(values, pandas_indicators(high[:end], low[:end], close[:end]), rel_tol=1e-9)
+
+def test_sliding_window_matches_pandas():
+    # A scan window of 500 candles moving forward: the state keeps older candles than the window
+    timestamps, high, low, close = make_candles(800)
+    engine = IndicatorEngine()
+    for start in range(0, 301, 3):
+        window = slice(start, start + 500)
+        values = engine.latest('BTC/USDT', timestamps[window], high[window], low[window], close[window])
+        assert_matches(values, pandas_indicators(high[window], low[window], close[window]), rel_tol=1e-6)
+
+def test_forming_candle_is_not_committed():
+    timestamps, high, low, close = make_candles(501)
+    engine = IndicatorEngine()
+    moved = close.copy()
+    moved[-1] *= 1.05
+    engine.latest('BTC/USDT', timestamps, high, low, moved)
+    values = engine.latest('BTC/USDT', timestamps, high, low, close)
+    assert_matches(values, pandas_indicators(high, low, close), rel_tol=1e-9)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
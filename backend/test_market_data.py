@@ -0,0 +1,101 @@
+import asyncio
+import zlib
+
+import numpy as np
+import pytest
+
+import market_data
+from analysis import analyze_candles, indicator_engine
+from candles import CandleView
+from exchange_adapters import SyntheticExchange
+
+HOUR_MS = 3_600_000
+CLOSE_DELAY_MS = 10_000 # the scheduler scans 10s after the close
+
+def make_view(count: int, opened_ms: int, seed: int = 3):
+    """
+    Random-walk 1h candles whose newest one opened at `opened_ms`.
+    The candle before it (the one that just closed) has 4x the usual volume;
+    the newest one has only traded for a few seconds.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.01, count)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * 1.002
+    low = np.minimum(open_, close) * 0.998
+    volume = rng.uniform(100, 120, count)
+    volume[-2] *= 4
+    volume[-1] = 0.5
+    timestamps = opened_ms - np.arange(count - 1, -1, -1, dtype=np.int64) * HOUR_MS
+    return CandleView(timestamps, np.vstack([open_, high, low, close, volume]))
+
+def with_clock(monkeypatch, now_ms: int):
+    exchange = SyntheticExchange()
+    exchange.now_ms = now_ms
+    monkeypatch.setattr(market_data, "exchange", exchange)
+
+def test_forming_candle_is_dropped(monkeypatch):
+    opened = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+    candles = make_view(300, opened)
+    with_clock(monkeypatch, opened + CLOSE_DELAY_MS)
+    closed = market_data.closed_candles(candles)
+    assert len(closed) == len(candles) - 1
+    assert closed.timestamp[-1] == opened - HOUR_MS
+
+    # Once the newest candle has closed too, nothing is dropped
+    with_clock(monkeypatch, opened + HOUR_MS)
+    assert len(market_data.closed_candles(candles)) == len(candles)
+
+def test_volume_spike_on_just_closed_candle_is_detected(monkeypatch):
+    opened = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+    candles = make_view(300, opened)
+    with_clock(monkeypatch, opened + CLOSE_DELAY_MS)
+    indicator_engine.reset()
+    result = analyze_candles('BTC/USDT', market_data.closed_candles(candles))
+    assert "High Volume Spike" in result['reasons']
+    assert result['timestamp'].value // 1_000_000 == opened - HOUR_MS
+
+    # Scoring the forming candle instead would miss it
+    indicator_engine.reset()
+    assert "High Volume Spike" not in analyze_candles('BTC/USDT', candles)['reasons']
+
+class CappedExchange:
+    """
+    Serves `rows` with at most `cap` candles per request, whatever the limit asked for.
+    """
+    def __init__(self, rows, cap: int):
+        self.rows = rows
+        self.cap = cap
+        self.calls = 0
+
+    async def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None):
+        self.calls += 1
+        return [row for row in self.rows if row[0] >= since][:min(limit, self.cap)]
+
+def test_download_history_follows_short_pages(monkeypatch):
+    rows = [[i * HOUR_MS, 1.0, 1.0, 1.0, 1.0, 1.0] for i in range(1200)]
+    exchange = CappedExchange(rows, cap=500)
+    monkeypatch.setattr(market_data, "exchange", exchange)
+    downloaded = asyncio.run(market_data.download_history('BTC/USDT', '1h', since=0, page_limit=1000))
+    assert downloaded == rows
+    assert exchange.calls == 4 # 500 + 500 + 200, then an empty page
+
+def test_mock_data_follows_the_original_walk():
+    # The pre-vectorization loop, fed the same normal draws
+    seed, symbol, limit = 7, 'ETH/USDT', 300
+    rng = np.random.default_rng([seed, zlib.crc32(symbol.encode())])
+    draws = rng.normal(loc=0.0001, scale=0.005, size=limit)
+    price = market_data.MOCK_PRICES[symbol]
+    expected = []
+    for r in draws:
+        change = r * price # normal(loc=0.0001 * price, scale=0.005 * price)
+        price = max(0.000001, price + change)
+        expected.append(price)
+    expected[-1] = expected[-2] * 1.002
+
+    df = market_data.generate_mock_data(symbol, limit, seed=seed)
+    np.testing.assert_allclose(df['close'].values, expected, rtol=1e-12)
+    np.testing.assert_allclose(df['high'].values, np.array(expected) * 1.005, rtol=1e-12)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
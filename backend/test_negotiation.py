@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+
+# Keep the store and leader lock of the tests out of the working directory
+_state_dir = tempfile.mkdtemp()
+os.environ.setdefault("SIGNALS_DB_PATH", os.path.join(_state_dir, "signals.db"))
+os.environ.setdefault("LEADER_LOCK_PATH", os.path.join(_state_dir, "scan-leader.lock"))
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import negotiation
+import snapshots
+from test_snapshots import live_signal
+
+client = TestClient(main.app) # no startup: nothing scans or takes the leader lock
+
+NOW = 1_700_000_000.0
+SYMBOLS = ["BTC/USDT", "ETH/USDT", "SOL/USDT", "XRP/USDT", "CRV/USDT", "ADA/USDT", "DOGE/USDT", "LINK/USDT"]
+
+# (path, Accept, media type served)
+REPRESENTATIONS = [
+    ("/signals", "application/json", "application/json"),
+    ("/android/signals", "application/json", "application/json"),
+    ("/android/signals", "*/*", "application/json"),
+    ("/android/signals", "application/x-msgpack", "application/x-msgpack"),
+    ("/android/signals", "application/msgpack, application/json;q=0.5", "application/x-msgpack"),
+    ("/android/signals", "application/x-msgpack;q=0.5, application/json", "application/json"),
+]
+
+# (Accept-Encoding, Content-Encoding served)
+ENCODINGS = [
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "br" if negotiation.brotli is not None else "gzip"),
+    ("gzip, br", "br" if negotiation.brotli is not None else "gzip"),
+    ("br", "br" if negotiation.brotli is not None else None),
+]
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    """
+    A current snapshot big enough to be compressed, with the Android JSON
+    minute pinned so its ETag can't change between two requests.
+    """
+    android_body = snapshots.SignalSnapshot.android_body
+    monkeypatch.setattr(snapshots.SignalSnapshot, "android_body", lambda self, now=None: android_body(self, now or NOW))
+    snapshot = snapshots.SignalSnapshot(5, [live_signal(s, 100.0 + i) for i, s in enumerate(SYMBOLS)])
+    monkeypatch.setattr(snapshots, "current", snapshot)
+    assert len(snapshot.signals_body) >= negotiation.COMPRESS_MIN_SIZE
+    assert len(snapshot.android_compact_body()[1]) >= negotiation.COMPRESS_MIN_SIZE
+    return snapshot
+
+def get(path, accept, accept_encoding, etag=None):
+    headers = {"Accept": accept, "Accept-Encoding": accept_encoding}
+    if etag:
+        headers["If-None-Match"] = etag
+    return client.get(path, headers=headers)
+
+def expected_body(snapshot, path, media_type):
+    if path == "/signals":
+        return snapshot.signals_body
+    if media_type == "application/x-msgpack":
+        return snapshot.android_compact_body()[1]
+    return snapshot.android_body()[1]
+
+@pytest.mark.parametrize("accept_encoding, encoding", ENCODINGS)
+@pytest.mark.parametrize("path, accept, media_type", REPRESENTATIONS)
+def test_negotiated_representation(snapshot, path, accept, media_type, accept_encoding, encoding):
+    response = get(path, accept, accept_encoding)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == media_type
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    # The client undoes the Content-Encoding
+    assert response.content == expected_body(snapshot, path, media_type)
+    if media_type == "application/x-msgpack":
+        assert msgpack.unpackb(response.content)["v"] == snapshots.ANDROID_COMPACT_VERSION
+    else:
+        assert len(json.loads(response.content)["data" if path != "/signals" else "signals"]) == len(SYMBOLS)
+
+@pytest.mark.parametrize("accept_encoding, encoding", ENCODINGS)
+@pytest.mark.parametrize("path, accept, media_type", REPRESENTATIONS)
+def test_every_representation_revalidates(snapshot, path, accept, media_type, accept_encoding, encoding):
+    etag = get(path, accept, accept_encoding).headers["etag"]
+    response = get(path, accept, accept_encoding, etag=etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert get(path, accept, accept_encoding, etag=f"W/{etag}").status_code == 304
+
+    # A new snapshot changes every ETag
+    snapshots.publish(snapshot.signals)
+    assert get(path, accept, accept_encoding, etag=etag).status_code == 200
+
+def test_each_representation_has_its_own_etag(snapshot):
+    etags = {}
+    for path, accept, media_type in REPRESENTATIONS:
+        for accept_encoding, encoding in ENCODINGS:
+            etag = get(path, accept, accept_encoding).headers["etag"]
+            etags.setdefault(etag, set()).add((path, media_type, encoding))
+    # One ETag per (body, Content-Encoding), never shared between two of them
+    assert all(len(representations) == 1 for representations in etags.values())
+    assert len(etags) == len({(path, media_type) for path, _, media_type in REPRESENTATIONS}) * len(
+        {encoding for _, encoding in ENCODINGS})
+
+    # An ETag from one encoding doesn't revalidate another
+    gzip_etag = get("/signals", "application/json", "gzip").headers["etag"]
+    assert get("/signals", "application/json", "identity", etag=gzip_etag).status_code == 200
+
+def test_small_bodies_are_not_compressed(snapshot, monkeypatch):
+    monkeypatch.setattr(negotiation, "COMPRESS_MIN_SIZE", len(snapshot.signals_body) + 1)
+    response = get("/signals", "application/json", "gzip")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == snapshot.signals_etag
+    assert get("/signals", "application/json", "gzip", etag=snapshot.signals_etag).status_code == 304
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,99 @@
+from notification_planner import NotificationPlanner
+
+NOW = 1_700_000_000.0
+
+def texts(title: str):
+    return {"en": (title, f"{title} body"), "ar": (f"{title} ar", f"{title} body ar")}
+
+def make_planner(**options):
+    """
+    A planner recording what it sends: [(topic, title, body), ...]. No event
+    loop runs in these tests, so messages held back by the topic interval
+    wait for the next flush.
+    """
+    sent = []
+    planner = NotificationPlanner(lambda topic, title, body: sent.append((topic, title, body)), **options)
+    return planner, sent
+
+def titles(sent, topic: str = "signals_en"):
+    return [title for t, title, _ in sent if t == topic]
+
+def test_latest_event_per_symbol_and_kind_wins():
+    planner, sent = make_planner(topic_interval=0)
+    planner.add("BTC/USDT", "update", texts("BTC +3%"))
+    planner.add("BTC/USDT", "update", texts("BTC +5%"))
+    planner.flush(NOW)
+    assert sent == [("signals_en", "BTC +5%", "BTC +5% body"), ("signals_ar", "BTC +5% ar", "BTC +5% body ar")]
+
+def test_update_is_dropped_when_the_symbol_hit_a_target():
+    planner, sent = make_planner(topic_interval=0)
+    with planner.collect():
+        planner.add("BTC/USDT", "update", texts("BTC +3%"))
+        planner.add("BTC/USDT", "tp1", texts("BTC TP1"))
+        planner.add("ETH/USDT", "update", texts("ETH +4%"))
+        assert sent == [] # held until the scan ends
+    assert titles(sent) == ["BTC TP1", "ETH +4%"]
+
+def test_signals_and_updates_are_rate_limited_per_symbol():
+    planner, sent = make_planner(symbol_cooldown=900, topic_interval=0)
+    planner.add("BTC/USDT", "signal", texts("BTC BUY"))
+    planner.flush(NOW)
+    planner.add("BTC/USDT", "update", texts("BTC +3%"))
+    planner.add("ETH/USDT", "signal", texts("ETH BUY"))
+    planner.flush(NOW + 899)
+    planner.add("BTC/USDT", "update", texts("BTC +6%"))
+    planner.flush(NOW + 900)
+    assert titles(sent) == ["BTC BUY", "ETH BUY", "BTC +6%"]
+
+def test_targets_and_exits_always_go_out():
+    planner, sent = make_planner(symbol_cooldown=900, topic_interval=60)
+    planner.add("BTC/USDT", "signal", texts("BTC BUY"))
+    planner.flush(NOW)
+    # Within the symbol cooldown and the topic interval: sent right away
+    planner.add("BTC/USDT", "tp1", texts("BTC TP1"))
+    planner.flush(NOW + 10)
+    planner.add("BTC/USDT", "tp2", texts("BTC TP2"))
+    planner.add("ETH/USDT", "exit", texts("ETH exit"))
+    planner.flush(NOW + 20)
+    assert titles(sent) == ["BTC BUY", "BTC TP1", "📬 2 Crypto Signal updates"]
+    assert sent[-2][2] == "BTC TP2\nETH exit"
+
+def test_signal_right_after_an_exit_is_pushed():
+    planner, sent = make_planner(symbol_cooldown=900, topic_interval=0)
+    planner.add("BTC/USDT", "exit", texts("BTC exit"))
+    planner.flush(NOW)
+    # The trade closed; a new one opens on the next scan
+    planner.add("BTC/USDT", "signal", texts("BTC BUY"))
+    planner.flush(NOW + 60)
+    assert titles(sent) == ["BTC exit", "BTC BUY"]
+    # The signal itself starts the cooldown
+    planner.add("BTC/USDT", "update", texts("BTC +3%"))
+    planner.flush(NOW + 120)
+    assert titles(sent) == ["BTC exit", "BTC BUY"]
+
+def test_topic_interval_holds_events_for_one_digest():
+    planner, sent = make_planner(symbol_cooldown=0, topic_interval=60, digest_lines=2)
+    planner.add("BTC/USDT", "signal", texts("BTC BUY"))
+    planner.flush(NOW)
+    for symbol in ("ETH/USDT", "SOL/USDT", "XRP/USDT"):
+        planner.add(symbol, "signal", texts(f"{symbol[:3]} BUY"))
+        planner.flush(NOW + 10)
+    assert titles(sent) == ["BTC BUY"]
+
+    planner.flush(NOW + 60)
+    assert titles(sent) == ["BTC BUY", "📬 3 Crypto Signal updates"]
+    assert sent[-2][2] == "ETH BUY\nSOL BUY\n+1 more"
+    assert sent[-1] == ("signals_ar", "📬 3 تحديثات للعملات", "ETH BUY ar\nSOL BUY ar\n+1 أخرى")
+    assert planner.waiting == {}
+
+def test_symbol_topics():
+    planner, sent = make_planner(topic_interval=0, symbol_topics=True)
+    planner.add("BTC/USDT", "signal", texts("BTC BUY"))
+    planner.flush(NOW)
+    assert sorted(topic for topic, _, _ in sent) == ["signals_ar", "signals_ar_BTC", "signals_en", "signals_en_BTC"]
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,117 @@
+import asyncio
+
+from scan_scheduler import ScanScheduler, next_close_ms
+
+HOUR_MS = 3_600_000
+
+class GatedScans:
+    """
+    A `run` for the scheduler: records each scan and holds it until `finish()`.
+    """
+    def __init__(self):
+        self.scans = []
+        self.gate = asyncio.Event()
+
+    async def __call__(self, request):
+        self.scans.append(request)
+        await self.gate.wait()
+        self.gate.clear()
+
+    async def finish(self):
+        self.gate.set()
+        await asyncio.sleep(0) # let the drain loop pick up the next scan
+        await asyncio.sleep(0)
+
+def test_covered_requests_join_the_running_scan():
+    async def scenario():
+        scans = GatedScans()
+        scheduler = ScanScheduler(scans, timeframes=[])
+        running = scheduler.request(["BTC/USDT", "ETH/USDT"], reason="rescan")
+        await asyncio.sleep(0)
+        assert scheduler.running is running
+
+        assert scheduler.request(["BTC/USDT"]) is running
+        assert scheduler.request(["ETH/USDT"], reason="rescan") is running
+        assert scheduler.pending is None
+        assert running.requests == 3 and running.reasons == ["rescan", "manual"]
+
+        await scans.finish()
+        assert running.done.is_set()
+        assert scans.scans == [running]
+        assert scheduler.running is None and scheduler.runner is None
+    asyncio.run(scenario())
+
+def test_uncovered_requests_merge_into_one_pending_scan():
+    async def scenario():
+        scans = GatedScans()
+        scheduler = ScanScheduler(scans, timeframes=[])
+        first = scheduler.request(["BTC/USDT"])
+        await asyncio.sleep(0)
+
+        pending = scheduler.request(["SOL/USDT"], reason="rescan")
+        assert pending is not first
+        assert scheduler.request(["XRP/USDT", "BTC/USDT"], reason="rescan") is pending
+        assert pending.symbols == {"SOL/USDT", "XRP/USDT", "BTC/USDT"}
+        # A full scan absorbs the partial ones
+        assert scheduler.request() is pending
+        assert pending.symbols is None and pending.requests == 3
+
+        await scans.finish()
+        assert first.done.is_set() and not pending.done.is_set()
+        assert scheduler.running is pending
+        await scans.finish()
+        assert pending.done.is_set()
+        assert scans.scans == [first, pending]
+    asyncio.run(scenario())
+
+def test_candle_close_and_profiled_requests_always_queue():
+    async def scenario():
+        scans = GatedScans()
+        scheduler = ScanScheduler(scans, timeframes=[])
+        full = scheduler.request()
+        await asyncio.sleep(0)
+
+        # The running scan started before this close, and isn't profiled
+        after_close = scheduler.request(reason="candle_close")
+        assert after_close is not full and after_close is scheduler.pending
+        assert scheduler.request(profile_id="abc") is after_close
+        assert after_close.profile_id == "abc"
+        assert after_close.reasons == ["candle_close", "manual"]
+
+        await scans.finish()
+        await scans.finish()
+        assert scans.scans == [full, after_close]
+        assert after_close.done.is_set()
+    asyncio.run(scenario())
+
+def test_failed_scan_does_not_stall_the_queue():
+    async def scenario():
+        scans = []
+
+        async def run(request):
+            scans.append(request)
+            if len(scans) == 1:
+                raise RuntimeError("exchange down")
+
+        scheduler = ScanScheduler(run, timeframes=[])
+        first = scheduler.request()
+        second = scheduler.request(reason="candle_close")
+        await asyncio.wait_for(second.done.wait(), 1)
+        # Nothing ran yet when the second request came in: it merged
+        assert second is first and scans == [first]
+        third = scheduler.request()
+        await asyncio.wait_for(third.done.wait(), 1)
+        assert scans == [first, third]
+    asyncio.run(scenario())
+
+def test_next_close_is_shared_by_timeframes():
+    now = 1_700_000_000_000 // (4 * HOUR_MS) * (4 * HOUR_MS) + 10_000
+    assert next_close_ms(now, ["1h"]) == now - 10_000 + HOUR_MS
+    assert next_close_ms(now, ["4h"]) == now - 10_000 + 4 * HOUR_MS
+    assert next_close_ms(now, ["1h", "4h"]) == now - 10_000 + HOUR_MS
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
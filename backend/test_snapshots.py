@@ -0,0 +1,62 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import snapshots
+
+def live_signal(symbol: str = 'CRV/USDT', price: float = 0.5123):
+    """
+    A signal as the scan emits it: pd.Timestamp and NumPy floats.
+    """
+    close = np.float64(price)
+    return {
+        "symbol": symbol,
+        "price": close,
+        "score": 70,
+        "status": "MEDIUM",
+        "rsi": np.float64(55.2),
+        "adx": np.float64(27.9),
+        "reasons": ["Healthy Momentum (RSI: 55.2)"],
+        "timestamp": pd.Timestamp(1_699_995_600_000, unit='ms'),
+        "trade_setup": {
+            "entry_zone": f"{close:.4f} - {close * 1.002:.4f}",
+            "stop_loss": close * np.float64(0.96),
+            "target_1": close * np.float64(1.03),
+            "target_2": close * np.float64(1.06),
+            "risk_reward_ratio": "1:1.5",
+        },
+    }
+
+def stored(signals):
+    """
+    The same signals after a round trip through the store (what install() gets).
+    """
+    return json.loads(snapshots.dumps(signals))
+
+def test_installed_snapshot_encodes_like_live_one():
+    signals = [live_signal(), live_signal('BTC/USDT', 36512.37)]
+    live = snapshots.SignalSnapshot(7, signals)
+    previous, snapshots.current = snapshots.current, snapshots.SignalSnapshot(0, [])
+    try:
+        installed = snapshots.install(7, stored(signals))
+    finally:
+        snapshots.current = previous
+    assert installed is not live
+
+    now = 1_700_000_000
+    assert installed.signals_body == live.signals_body
+    assert installed.android_body(now) == live.android_body(now)
+    assert installed.android_compact_body() == live.android_compact_body()
+
+def test_signal_id_is_stable():
+    signal = live_signal()
+    assert snapshots.signal_id(signal) == 'CRV/USDT-1699995600000'
+    assert snapshots.signal_id(stored(signal)) == snapshots.signal_id(signal)
+    assert snapshots.format_android_signal(signal)['id'] == snapshots.signal_id(signal)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,111 @@
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from storage import SignalStore, parse_time
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SYMBOLS = ('BTC/USDT', 'ETH/USDT', 'SOL/USDT')
+STATUSES = ('STRONG', 'MEDIUM', 'WEAK')
+
+def make_store(count: int = 30, cache_size: int = 10):
+    """
+    A store in a temporary file with `count` signals, one per hour, written in one flush.
+    Returns (store, signals) with the signals in insertion order.
+    """
+    path = os.path.join(tempfile.mkdtemp(), "signals.db")
+    store = SignalStore(path, cache_size=cache_size)
+    signals = []
+    for i in range(count):
+        signal = {
+            "symbol": SYMBOLS[i % 3],
+            "status": STATUSES[i % 2], # STRONG/MEDIUM only, so WEAK matches nothing
+            "score": 50 + i,
+            "timestamp": (START + timedelta(hours=i)).replace(tzinfo=None).isoformat(),
+        }
+        store.add_signal(signal)
+        signals.append(signal)
+    store.flush()
+    return store, signals
+
+def all_pages(store, limit: int, **filters):
+    """
+    Follows next_cursor from the newest page to the oldest; returns the scores oldest first.
+    """
+    pages = []
+    cursor = None
+    while True:
+        items, cursor = store.history(limit=limit, cursor=cursor, **filters)
+        assert len(items) <= limit
+        pages.insert(0, [item['score'] for item in items])
+        if cursor is None:
+            return [score for page in pages for score in page]
+
+def test_latest_page_comes_from_the_cache():
+    store, signals = make_store()
+    items, cursor = store.history(limit=4)
+    assert [item['score'] for item in items] == [s['score'] for s in signals[-4:]]
+    assert [item['id'] for item in items] == [27, 28, 29, 30]
+    assert cursor == 27
+    store.close()
+
+def test_cursor_pagination_crosses_the_cache_boundary():
+    store, signals = make_store(count=30, cache_size=10)
+    expected = [s['score'] for s in signals]
+    # 4 doesn't divide the 10 cached rows: one page is half cache, half older rows
+    assert all_pages(store, limit=4) == expected
+    # Larger than the cache: straight from the database
+    assert all_pages(store, limit=12) == expected
+    assert all_pages(store, limit=30) == expected
+    store.close()
+
+def test_cache_is_rebuilt_on_reopen():
+    store, signals = make_store(count=30, cache_size=10)
+    path = store.conn.execute("PRAGMA database_list").fetchone()[2]
+    store.close()
+    reopened = SignalStore(path, cache_size=10)
+    assert reopened.total == 30
+    assert [item['score'] for item in reopened.recent] == [s['score'] for s in signals[-10:]]
+    assert all_pages(reopened, limit=7) == [s['score'] for s in signals]
+    reopened.close()
+
+def test_filters():
+    store, signals = make_store()
+    since = parse_time((START + timedelta(hours=6)).isoformat())
+    until = parse_time(str((START + timedelta(hours=20)).timestamp()))
+    cases = [
+        ({"symbol": "ETH/USDT"}, lambda i, s: s['symbol'] == "ETH/USDT"),
+        ({"status": "STRONG"}, lambda i, s: s['status'] == "STRONG"),
+        ({"status": "WEAK"}, lambda i, s: False),
+        ({"since": since}, lambda i, s: i >= 6),
+        ({"until": until}, lambda i, s: i < 20),
+        ({"since": since, "until": until}, lambda i, s: 6 <= i < 20),
+        ({"symbol": "BTC/USDT", "status": "MEDIUM"}, lambda i, s: s['symbol'] == "BTC/USDT" and s['status'] == "MEDIUM"),
+        ({"symbol": "SOL/USDT", "status": "STRONG", "since": since, "until": until},
+         lambda i, s: s['symbol'] == "SOL/USDT" and s['status'] == "STRONG" and 6 <= i < 20),
+    ]
+    for filters, keep in cases:
+        expected = [s['score'] for i, s in enumerate(signals) if keep(i, s)]
+        assert all_pages(store, limit=3, **filters) == expected, filters
+        assert store.count(**filters) == len(expected), filters
+    assert store.count() == 30
+    store.close()
+
+def test_parse_time():
+    assert parse_time(None) is None
+    assert parse_time("") is None
+    assert parse_time("1704067200") == 1704067200.0
+    assert parse_time("2024-01-01T00:00:00") == 1704067200.0
+    assert parse_time("2024-01-01T02:00:00+02:00") == 1704067200.0
+    try:
+        parse_time("notadate")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
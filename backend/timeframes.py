@@ -0,0 +1,60 @@
+"""
+Higher-timeframe candles built locally from the base (1h) series.
+
+Instead of fetching 4h/1d candles separately, the base candles are grouped
+into buckets aligned like the exchange's own candles (UTC midnight for 1d,
+Monday for 1w). A leading bucket that is missing its first base candles is
+dropped; the last bucket is usually still forming, just like the last base
+candle. Indicator state per (symbol, timeframe) lives in the same streaming
+IndicatorEngine, so each closed bucket is only processed once.
+"""
+import numpy as np
+
+UNIT_MS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+WEEK_OFFSET_MS = 4 * 86_400_000 # 1970-01-01 was a Thursday; weeks start on Monday
+
+def timeframe_ms(timeframe: str):
+    return int(timeframe[:-1]) * UNIT_MS[timeframe[-1]]
+
+def resample(timestamps_ms, high, low, close, volume, timeframe: str):
+    """
+    Aggregates base candles into `timeframe` buckets.
+    Returns (bucket_start_ms, high, low, close, volume) arrays.
+    """
+    timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64)
+    size = timeframe_ms(timeframe)
+    offset = WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+    buckets = timestamps_ms - (timestamps_ms - offset) % size
+
+    if len(buckets) and timestamps_ms[0] != buckets[0]:
+        # History begins mid-bucket: that bucket is incomplete
+        first = int(np.searchsorted(buckets, buckets[0], side='right'))
+        timestamps_ms, buckets = timestamps_ms[first:], buckets[first:]
+        high, low, close, volume = (np.asarray(a)[first:] for a in (high, low, close, volume))
+    if len(buckets) == 0:
+        return buckets, *(np.asarray(a, dtype=float) for a in (high, low, close, volume))
+
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    return (
+        buckets[starts],
+        np.maximum.reduceat(np.asarray(high, dtype=float), starts),
+        np.minimum.reduceat(np.asarray(low, dtype=float), starts),
+        np.asarray(close, dtype=float)[ends],
+        np.add.reduceat(np.asarray(volume, dtype=float), starts),
+    )
+
+def higher_timeframe_indicators(engine, symbol: str, timestamps_ms, high, low, close, volume, timeframes):
+    """
+    Indicator values of the latest (forming) bucket for each timeframe.
+    Returns {timeframe: {column: value}}; timeframes without data are left out.
+    """
+    values = {}
+    for timeframe in timeframes:
+        bucket_ts, bucket_high, bucket_low, bucket_close, _ = resample(
+            timestamps_ms, high, low, close, volume, timeframe
+        )
+        if len(bucket_ts):
+            values[timeframe] = engine.latest(f"{symbol}@{timeframe}", bucket_ts, bucket_high, bucket_low, bucket_close)
+    return values